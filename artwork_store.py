@@ -0,0 +1,268 @@
+"""Content-addressed store of album artwork, with an alias index and an in-memory cache of image bytes.
+Images are normalized once as they're stored (real format detected, and optionally downscaled / recompressed).
+"""
+
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from os.path import isfile, join
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import ARTWORK_CACHE_SIZE, ARTWORK_MAX_SIZE, ARTWORK_QUALITY, IMG_DIR, IS_DEBUG
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, without it images are stored as they are
+    Image = None
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+if Image is None and (ARTWORK_MAX_SIZE or ARTWORK_QUALITY):
+    logger.warning("Pillow is not installed, album artwork will be stored without downscaling / recompressing it")
+
+
+# Magic bytes of image formats, and the extension images of the format are stored with
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+)
+# Extension of images of unknown format (which is what all artwork used to be saved as)
+DEFAULT_EXTENSION = "png"
+DEFAULT_JPEG_QUALITY = 90
+
+
+def detect_image_format(data: bytes) -> Optional[str]:
+    """Detects the format of an image from its magic bytes
+
+    Returns:
+        Optional[str]: The extension of the format (such as "jpg"), or None if the format is unknown
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def process_artwork(data: bytes, max_size: int = ARTWORK_MAX_SIZE, quality: int = ARTWORK_QUALITY) -> bytes:
+    """Downscales an image so its longer side is at most max_size pixels, and / or recompresses it as JPEG.
+    The image is returned unchanged if Pillow isn't installed, if it can't be decoded,
+    or if it doesn't need to be downscaled and recompressing it doesn't make it smaller.
+
+    Args:
+        data (bytes): The image.
+        max_size (int, optional): Maximal width and height, 0 to keep the size. Defaults to ARTWORK_MAX_SIZE.
+        quality (int, optional): JPEG quality to recompress with, 0 to recompress only downscaled images.
+                                 Defaults to ARTWORK_QUALITY.
+
+    Returns:
+        bytes: The processed image
+    """
+    if Image is None or not (max_size or quality):
+        return data
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            is_oversized = bool(max_size) and max(image.size) > max_size
+            if not (is_oversized or quality):
+                return data
+            if is_oversized:
+                logger.debug("Downscaling %dx%d artwork to %d", image.size[0], image.size[1], max_size)
+                image.thumbnail((max_size, max_size))
+            output = io.BytesIO()
+            image.convert("RGB").save(output, format="JPEG", quality=quality or DEFAULT_JPEG_QUALITY, optimize=True)
+    except (OSError, ValueError) as err:
+        logger.warning("Failed to process artwork, storing it as is: %s", err)
+        return data
+
+    processed = output.getvalue()
+    if not is_oversized and len(processed) >= len(data):
+        return data
+    return processed
+
+
+def artwork_alias(artist: str, name: str) -> str:
+    """Returns the alias of the artwork of an album (or a song, if it has no album) of an artist"""
+    return f"{' '.join(artist.split()).lower()} - {' '.join(name.split()).lower()}"
+
+
+def release_group_alias(release_group_id: str) -> str:
+    """Returns the alias of the artwork of a MusicBrainz release group"""
+    return f"release-group:{release_group_id}"
+
+
+class StoredArtwork:
+    """Image bytes of an artwork, and their SHA-1 digest"""
+
+    def __init__(self, data: bytes, digest: bytes) -> None:
+        self.data = data
+        self.digest = digest
+
+
+class ArtworkStore:
+    """Stores each distinct image once, named by the SHA-1 of its content (after it's processed).
+    Aliases (such as artist and album) map to the stored images, and recently read images are kept in memory.
+    """
+
+    def __init__(  # pylint: disable=R0917
+        self,
+        directory: str,
+        index_path: str,
+        cache_size: int = ARTWORK_CACHE_SIZE,
+        max_size: int = ARTWORK_MAX_SIZE,
+        quality: int = ARTWORK_QUALITY,
+    ) -> None:
+        self.directory = directory
+        self.index_path = index_path
+        self.cache_size = cache_size
+        self.max_size = max_size
+        self.quality = quality
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[str, int, int], StoredArtwork]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, file_name TEXT NOT NULL)"
+            )
+            # Stored image of each source image (and processing settings), so every image is processed once
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS processed (source TEXT PRIMARY KEY, file_name TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get_path(self, file_name: str) -> str:
+        """Returns the path of a stored image"""
+        return join(self.directory, file_name)
+
+    def put(self, data: bytes, aliases: Iterable[str] = ()) -> str:
+        """Processes and stores an image (unless it was already stored), and points the aliases to it
+
+        Args:
+            data (bytes): The image.
+            aliases (Iterable[str], optional): Aliases of the image. Defaults to ().
+
+        Returns:
+            str: The path of the stored image
+        """
+        source = f"{hashlib.sha1(data, usedforsecurity=False).hexdigest()}:{self.max_size}:{self.quality}"
+        with self._lock:
+            row = self._connect().execute("SELECT file_name FROM processed WHERE source = ?", (source,)).fetchone()
+
+        if row and isfile(self.get_path(row[0])):
+            logger.debug("Artwork %s is already stored", row[0])
+            file_name = row[0]
+        else:
+            processed = process_artwork(data, self.max_size, self.quality)
+            extension = detect_image_format(processed) or DEFAULT_EXTENSION
+            file_name = f"{hashlib.sha1(processed, usedforsecurity=False).hexdigest()}.{extension}"
+            path = self.get_path(file_name)
+            with self._lock:
+                if not isfile(path):
+                    temp_path = f"{path}.{threading.get_ident()}.tmp"
+                    with open(temp_path, "wb") as file:
+                        file.write(processed)
+                    os.replace(temp_path, path)
+                connection = self._connect()
+                connection.execute("INSERT OR REPLACE INTO processed VALUES (?, ?)", (source, file_name))
+                connection.commit()
+
+        self.add_aliases(file_name, aliases)
+        return self.get_path(file_name)
+
+    def put_file(self, file_path: str, aliases: Iterable[str] = (), remove_source: bool = False) -> str:
+        """Stores the image in a file, see `put`
+
+        Args:
+            file_path (str): Path of the image.
+            aliases (Iterable[str], optional): Aliases of the image. Defaults to ().
+            remove_source (bool, optional): Remove the file once it's stored. Defaults to False.
+
+        Returns:
+            str: The path of the stored image
+        """
+        with open(file_path, "rb") as file:
+            data = file.read()
+        path = self.put(data, aliases)
+        if remove_source:
+            os.remove(file_path)
+        return path
+
+    def add_aliases(self, file_name: str, aliases: Iterable[str]):
+        """Points aliases to a stored image"""
+        rows = [(alias, file_name) for alias in aliases]
+        if not rows:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.executemany("INSERT OR REPLACE INTO aliases VALUES (?, ?)", rows)
+            connection.commit()
+
+    def get_path_by_alias(self, *aliases: str) -> Optional[str]:
+        """Returns the path of the image of the first alias that's in the store, or None if none of them is"""
+        with self._lock:
+            connection = self._connect()
+            for alias in aliases:
+                row = connection.execute("SELECT file_name FROM aliases WHERE alias = ?", (alias,)).fetchone()
+                if row and isfile(self.get_path(row[0])):
+                    return self.get_path(row[0])
+        return None
+
+    def read(self, path: str) -> Optional[StoredArtwork]:
+        """Reads an image (stored or not), using the in-memory cache.
+
+        Returns:
+            Optional[StoredArtwork]: The image and its digest, or None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            artwork = self._cache.get(key)
+            if artwork is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return artwork
+            self.misses += 1
+
+        with open(path, "rb") as file:
+            data = file.read()
+        artwork = StoredArtwork(data, hashlib.sha1(data, usedforsecurity=False).digest())
+        with self._lock:
+            self._cache[key] = artwork
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return artwork
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters of the in-memory cache"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache)}
+
+    def close(self):
+        """Closes the alias index"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+artwork_store = ArtworkStore(join(IMG_DIR, "by-hash"), join(IMG_DIR, "artwork_index.sqlite3"))
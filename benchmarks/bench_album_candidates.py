@@ -0,0 +1,91 @@
+"""Benchmarks get_album_candidates over the recorded MusicBrainz responses (tests/outputs/json),
+scaled up to responses with thousands of releases.
+Scaled responses repeat each recording, with some releases unchanged (duplicates) and some renamed or redated.
+The candidates of the recorded responses are checked against those of the previous implementation (tests/outputs).
+
+Usage: python benchmarks/bench_album_candidates.py [--scale N] [--repeat N]
+"""
+
+import argparse
+import copy
+import glob
+import json
+import sys
+import timeit
+from os.path import abspath, basename, dirname, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from music_api import get_album_candidates  # noqa: E402
+
+OUTPUTS_DIR = join(dirname(dirname(abspath(__file__))), "tests", "outputs")
+RESPONSES_DIR = join(OUTPUTS_DIR, "json")
+
+
+def load_responses():
+    """Loads the recorded responses, as (artist, title, response) tuples"""
+    responses = []
+    for path in sorted(glob.glob(join(RESPONSES_DIR, "*.json"))):
+        artist, title = basename(path)[: -len(".json")].split(" - ", 1)
+        with open(path, "r", encoding="utf-8") as file:
+            responses.append((artist, title, json.load(file)))
+    return responses
+
+
+def scale_response(response, scale):
+    """Returns a response with `scale` copies of each recording.
+    A third of the copied releases are kept as they are, the rest are renamed or moved to another year.
+    """
+    recordings = []
+    for copy_index in range(scale):
+        for recording in response["recordings"]:
+            recording = copy.deepcopy(recording)
+            for release_index, release in enumerate(recording.get("releases", [])):
+                variant = (copy_index + release_index) % 3
+                if variant == 1 and release.get("title"):
+                    release["title"] = f"{release['title']} (Edition {copy_index % 50})"
+                elif variant == 2 and release.get("date"):
+                    release["date"] = str(1950 + copy_index % 70) + release["date"][4:]
+            recordings.append(recording)
+    return {**response, "count": len(recordings), "recordings": recordings}
+
+
+def describe(recordings):
+    """Returns the ranking (album, year, track), and all the attributes of the candidates, as in the expected outputs"""
+    ranking = [[recording.album, recording.year, recording.track] for recording in recordings]
+    attributes = sorted(
+        [str(recording), recording.type, recording.title, recording.status, recording.release_group_id]
+        for recording in recordings
+    )
+    return {"ranking": ranking, "candidates": attributes}
+
+
+def main():
+    """Checks the candidates of the recorded responses, and prints the throughput over the scaled responses"""
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scale", type=int, default=60, help="Number of copies of each recording")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Number of passes over the responses")
+    args = arg_parser.parse_args()
+
+    with open(join(OUTPUTS_DIR, "album_candidates.json"), "r", encoding="utf-8") as file:
+        expected = json.load(file)
+    mismatches = 0
+    for artist, title, data in load_responses():
+        if describe(get_album_candidates(data, artist, title)) != expected[f"{artist} - {title}"]:
+            print(f"MISMATCH {artist} - {title}")
+            mismatches += 1
+
+    responses = [(artist, title, scale_response(data, args.scale)) for artist, title, data in load_responses()]
+    releases = sum(len(recording.get("releases", [])) for _, _, data in responses for recording in data["recordings"])
+    print(f"{len(responses)} responses, {releases:,} releases, {mismatches} mismatches")
+
+    elapsed = timeit.timeit(
+        lambda: [get_album_candidates(data, artist, title) for artist, title, data in responses], number=args.repeat
+    )
+    print(f"get_album_candidates: {releases * args.repeat / elapsed:>12,.0f} releases/s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
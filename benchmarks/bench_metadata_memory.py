@@ -0,0 +1,106 @@
+"""Measures the memory it takes to hold a library's resolved metadata (MP3MetaData per file),
+and the album candidates of the recorded MusicBrainz responses (a ReleaseRecording per release, scaled up).
+Strings are created separately for every object, as when they're read from tags or parsed from responses.
+
+Usage: python benchmarks/bench_metadata_memory.py [--tracks N] [--scale N]
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bench_album_candidates import load_responses, scale_response  # noqa: E402
+
+from mp3_metadata import MP3MetaData  # noqa: E402
+from music_api import ReleaseRecording  # noqa: E402
+
+TRACKS_PER_ALBUM = 10
+ALBUMS_PER_ARTIST = 10
+GENRES = ["Rock", "Metal", "Pop", "J-Pop", "Alternative"]
+
+
+def build_library(metadata_class, tracks):
+    """Returns the metadata of a synthetic library with the given number of tracks"""
+    library = []
+    for index in range(tracks):
+        album_index, track = divmod(index, TRACKS_PER_ALBUM)
+        artist_index = album_index // ALBUMS_PER_ARTIST
+        band = "Artist " + str(artist_index)
+        album = "Album " + str(album_index)
+        song = "Song " + str(index)
+        library.append(
+            metadata_class(
+                band=band,
+                song=song,
+                album=album,
+                year=1970 + album_index % 50,
+                track=track + 1,
+                genre=GENRES[artist_index % len(GENRES)],
+                file_name=band + " - " + song + ".mp3",
+                art_path="/img/" + band + " - " + album + ".png",
+                art_configured=True,
+                release_group_id="release-group-" + str(album_index),
+            )
+        )
+    return library
+
+
+def build_recordings(recording_class, responses):
+    """Returns a recording per release of the responses"""
+    recordings = []
+    for data in responses:
+        for recording in data["recordings"]:
+            received_artist = recording.get("artist-credit", [{}])[0].get("artist", {}).get("name", "Unknown")
+            for release in recording.get("releases", []):
+                release_group = release.get("release-group", {})
+                recordings.append(
+                    recording_class(
+                        release.get("title", ""),
+                        int(release.get("date", "0").split("-")[0] or 0),
+                        artist=received_artist,
+                        track=int(release.get("media", [{}])[0].get("track-offset", 0)) + 1,
+                        r_type=release_group.get("primary-type", ""),
+                        title=recording.get("title", ""),
+                        status=release.get("status", ""),
+                        release_group_id=release_group.get("id", ""),
+                    )
+                )
+    return recordings
+
+
+def measure(build):
+    """Returns the number of objects built, and the memory (in bytes) that they hold"""
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(objects), size
+
+
+def main():
+    """Prints the memory held by the metadata of the library and by the album candidates"""
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--tracks", type=int, default=200000, help="Number of tracks in the library")
+    arg_parser.add_argument("--scale", type=int, default=20, help="Number of copies of each recording")
+    args = arg_parser.parse_args()
+
+    # Responses are parsed separately, so every release has its own strings
+    serialized = [json.dumps(scale_response(data, args.scale)) for _, _, data in load_responses()]
+
+    for name, build in (
+        ("MP3MetaData", lambda: build_library(MP3MetaData, args.tracks)),
+        ("ReleaseRecording", lambda: build_recordings(ReleaseRecording, [json.loads(data) for data in serialized])),
+    ):
+        count, size = measure(build)
+        print(f"{count:>9,} {name:<17} {size / 2**20:>8.1f} MiB ({size / count:,.0f} bytes each)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmarks get_suggested_recording over the album candidates of the recorded MusicBrainz responses
+(tests/outputs/json), scaled up (see bench_album_candidates).
+Candidates are sorted as in library_pipeline, so each song is ranked from hundreds of candidates.
+The suggestions for the recorded responses are checked against those of the previous implementation (tests/outputs).
+
+Usage: python benchmarks/bench_suggested_recording.py [--scale N] [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from bench_album_candidates import OUTPUTS_DIR, load_responses, scale_response  # noqa: E402
+
+from mp3_metadata import _get_album_skip_reason, get_suggested_recording  # noqa: E402
+from music_api import get_album_candidates  # noqa: E402
+
+
+def load_candidates(scale=0):
+    """Returns the name ("<artist> - <title>") and the sorted album candidates of each recorded response,
+    scaled up if `scale` is given
+    """
+    songs = []
+    for artist, title, data in load_responses():
+        recordings = get_album_candidates(scale_response(data, scale) if scale else data, artist, title)
+        recordings.sort(key=lambda recording: (recording.year, len(recording.album)))
+        songs.append((f"{artist} - {title}", recordings))
+    return songs
+
+
+def main():
+    """Checks the suggestions for the recorded responses, and prints the time it takes to rank a song"""
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--scale", type=int, default=20, help="Number of copies of each recording")
+    arg_parser.add_argument("--repeat", type=int, default=10, help="Number of passes over the songs, after the first")
+    args = arg_parser.parse_args()
+
+    with open(join(OUTPUTS_DIR, "suggested_recordings.json"), "r", encoding="utf-8") as file:
+        expected = json.load(file)
+    mismatches = 0
+    for name, recordings in load_candidates():
+        actual = get_suggested_recording(recordings)
+        if expected[name]["all"] != actual:
+            print(f"MISMATCH {name}: {expected[name]['all']} != {actual}")
+            mismatches += 1
+
+    songs = [recordings for _, recordings in load_candidates(args.scale)]
+    candidates = sum(len(recordings) for recordings in songs)
+    print(f"{len(songs)} songs, {candidates:,} candidates, {mismatches} mismatches")
+
+    # Candidates are ranked in the worst case: every candidate is scored (no album to stop at).
+    # The first pass is cold (album names are checked for the first time), the next passes reuse the cached checks
+    worst_case = [[recording for recording in recordings if recording.type in ("single", "ep")] for recordings in songs]
+    _get_album_skip_reason.cache_clear()
+    cold = timeit.timeit(lambda: [get_suggested_recording(recordings) for recordings in worst_case], number=1)
+    warm = timeit.timeit(lambda: [get_suggested_recording(recordings) for recordings in worst_case], number=args.repeat)
+    cold_per_song = cold / len(songs) * 1e6
+    warm_per_song = warm / (len(songs) * args.repeat) * 1e6
+    print(f"get_suggested_recording {cold_per_song:>10,.1f} us/song (first pass), {warm_per_song:>10,.1f} us/song")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
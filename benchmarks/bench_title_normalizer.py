@@ -0,0 +1,50 @@
+"""Benchmarks title_normalizer.suggest_titles over a corpus of real video titles (and their channels),
+and checks its output against the titles suggested by the previous implementation (tests/outputs).
+
+Usage: python benchmarks/bench_title_normalizer.py [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from title_normalizer import suggest_titles  # noqa: E402
+
+CORPUS_PATH = join(dirname(dirname(abspath(__file__))), "tests", "outputs", "title_suggestions.json")
+
+
+def load_corpus():
+    """Loads the (title, channel) pairs of the corpus, and the (band, song) suggested for each"""
+    with open(CORPUS_PATH, "r", encoding="utf-8") as file:
+        entries = json.load(file)
+    return [(entry["title"], entry["channel"]) for entry in entries], [
+        (entry["band"], entry["song"]) for entry in entries
+    ]
+
+
+def main():
+    """Checks the suggestions for the corpus, and prints the throughput"""
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=200, help="Number of passes over the corpus")
+    args = arg_parser.parse_args()
+
+    corpus, expected = load_corpus()
+    actual = suggest_titles(corpus)
+    mismatches = [(entry, old, new) for entry, old, new in zip(corpus, expected, actual) if old != new]
+    for entry, old, new in mismatches:
+        print(f"MISMATCH {entry}: {old} != {new}")
+    print(f"{len(corpus)} titles, {len(mismatches)} mismatches")
+
+    titles = len(corpus) * args.repeat
+    elapsed = timeit.timeit(lambda: suggest_titles(corpus), number=args.repeat)
+    print(f"suggest_titles: {titles / elapsed:>10,.0f} titles/s")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,8 +17,50 @@ MP3_DIR = str(config("MP3_DIR", cast=str, default=join(home, "xp3", "mp3")))
 MP4_DIR = str(config("MP4_DIR", cast=str, default=join(home, "xp3", "mp4")))
 IMG_DIR = str(config("IMG_DIR", cast=str, default=join(home, "xp3", "img")))
 TMP_DIR = str(config("TMP_DIR", cast=str, default=join(home, "xp3", "tmp")))
+CACHE_DIR = str(config("CACHE_DIR", cast=str, default=join(home, "xp3", "cache")))
 
-XP3_DIRS = (MP3_DIR, MP4_DIR, IMG_DIR, TMP_DIR)
+XP3_DIRS = (MP3_DIR, MP4_DIR, IMG_DIR, TMP_DIR, CACHE_DIR)
+
+# Persistent cache of MusicBrainz responses (see response_cache.py)
+RESPONSE_CACHE_ENABLED = config("RESPONSE_CACHE_ENABLED", default=True, cast=bool)
+RESPONSE_CACHE_MAX_ENTRIES = config("RESPONSE_CACHE_MAX_ENTRIES", default=100000, cast=int)
+RESPONSE_CACHE_MAX_MB = config("RESPONSE_CACHE_MAX_MB", default=512, cast=int)
+# Lookups that found nothing are retried sooner than cached responses expire
+NEGATIVE_CACHE_TTL_HOURS = config("NEGATIVE_CACHE_TTL_HOURS", default=72, cast=float)
+
+# Connection pooling of the HTTP session used for API requests (see music_api.get_session)
+HTTP_POOL_CONNECTIONS = config("HTTP_POOL_CONNECTIONS", default=4, cast=int)
+HTTP_POOL_MAXSIZE = config("HTTP_POOL_MAXSIZE", default=8, cast=int)
+HTTP_TIMEOUT = config("HTTP_TIMEOUT", default=3, cast=float)
+
+# MusicBrainz allows about one request per second per client (shared by all processes on the host)
+MUSICBRAINZ_RATE_LIMIT = config("MUSICBRAINZ_RATE_LIMIT", default=1.0, cast=float)
+MUSICBRAINZ_BURST = config("MUSICBRAINZ_BURST", default=1, cast=int)
+# Results per page of MusicBrainz searches (at most 100), and the number of pages searched for an acceptable result.
+# Further pages are only requested when the previous ones had no acceptable result
+MUSICBRAINZ_SEARCH_LIMIT = config("MUSICBRAINZ_SEARCH_LIMIT", default=25, cast=int)
+MUSICBRAINZ_SEARCH_MAX_PAGES = config("MUSICBRAINZ_SEARCH_MAX_PAGES", default=3, cast=int)
+
+# Padding reserved in ID3 tags when a file has to be rewritten, so later tag edits can be done in place
+ID3_PADDING_KB = config("ID3_PADDING_KB", default=16, cast=int)
+
+# Number of album artworks kept in memory, so tagging an album reads (and hashes) its artwork once
+ARTWORK_CACHE_SIZE = config("ARTWORK_CACHE_SIZE", default=32, cast=int)
+# Stored artwork is downscaled to at most ARTWORK_MAX_SIZE pixels (0 to keep the size),
+# and recompressed as JPEG with ARTWORK_QUALITY (0 to recompress only downscaled artwork). Requires Pillow.
+ARTWORK_MAX_SIZE = config("ARTWORK_MAX_SIZE", default=600, cast=int)
+ARTWORK_QUALITY = config("ARTWORK_QUALITY", default=0, cast=int)
+
+# Playlist downloads fetch DOWNLOAD_FETCH_WORKERS songs at a time (network bound), and transcode them with
+# DOWNLOAD_TRANSCODE_WORKERS ffmpeg processes (CPU bound, 0 for one per core).
+# At most DOWNLOAD_QUEUE_SIZE fetched songs wait to be transcoded, so fetching can't run far ahead of transcoding
+DOWNLOAD_FETCH_WORKERS = config("DOWNLOAD_FETCH_WORKERS", default=4, cast=int)
+DOWNLOAD_TRANSCODE_WORKERS = config("DOWNLOAD_TRANSCODE_WORKERS", default=0, cast=int)
+DOWNLOAD_QUEUE_SIZE = config("DOWNLOAD_QUEUE_SIZE", default=8, cast=int)
+# With DOWNLOAD_EMBED_TAGS, tags and artwork are written by ffmpeg while transcoding, instead of rewriting the mp3.
+# With DOWNLOAD_KEEP_CODEC, audio that's already mp3 is copied as is rather than re-encoded
+DOWNLOAD_EMBED_TAGS = config("DOWNLOAD_EMBED_TAGS", default=False, cast=bool)
+DOWNLOAD_KEEP_CODEC = config("DOWNLOAD_KEEP_CODEC", default=True, cast=bool)
 
 DEFAULT_PLAYLIST = str(
     config(
@@ -0,0 +1,129 @@
+"""Persistent memory of decisions made interactively (title fixes and album choices),
+so processing the same songs again replays them without asking again (or querying MusicBrainz)
+"""
+
+import logging
+from os.path import join
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CACHE_DIR, IS_DEBUG
+from kv_store import KeyValueStore
+from music_api import ReleaseRecording, track_key
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+TITLE_DECISION = "title"
+RECORDING_DECISION = "recording"
+
+
+def _recording_to_dict(recording: ReleaseRecording) -> Dict[str, Any]:
+    return {
+        "album": recording.album,
+        "year": recording.year,
+        "artist": recording.artist,
+        "track": recording.track,
+        "type": recording.type,
+        "title": recording.title,
+        "status": recording.status,
+        "release_group_id": recording.release_group_id,
+    }
+
+
+def _recording_from_dict(data: Dict[str, Any]) -> ReleaseRecording:
+    return ReleaseRecording(
+        data["album"],
+        data["year"],
+        data["artist"],
+        data["track"],
+        data["type"],
+        title=data["title"],
+        status=data["status"],
+        release_group_id=data["release_group_id"],
+    )
+
+
+class DecisionStore(KeyValueStore):
+    """Decisions keyed by the original title and channel (title fixes), or by artist and song (album choices)"""
+
+    def __init__(self, db_path: str, enabled: bool = True) -> None:
+        super().__init__(db_path)
+        self.enabled = enabled
+
+    @staticmethod
+    def title_key(title: str, channel: str = "") -> str:
+        """Returns the key of the decision about a title"""
+        return f"{TITLE_DECISION}\0{title}\0{channel}"
+
+    @staticmethod
+    def recording_key(artist: str, song: str) -> str:
+        """Returns the key of the decision about the album of a song"""
+        return f"{RECORDING_DECISION}\0{track_key(artist, song)}"
+
+    def get_title(self, title: str, channel: str = "") -> Optional[str]:
+        """Returns the title that was decided for a title (and channel), or None if there's no decision"""
+        if not self.enabled:
+            return None
+        decision = self.get(self.title_key(title, channel))
+        return decision["decided_title"] if decision else None
+
+    def set_title(self, title: str, channel: str, decided_title: str):
+        """Remembers the title that was decided for a title (and channel)"""
+        if self.enabled:
+            self.set(
+                self.title_key(title, channel), {"title": title, "channel": channel, "decided_title": decided_title}
+            )
+
+    def get_recording(self, artist: str, song: str) -> Tuple[bool, Optional[ReleaseRecording]]:
+        """Returns the recording that was chosen for a song
+
+        Returns:
+            Tuple[bool, Optional[ReleaseRecording]]: Whether there's a decision, and the chosen recording
+                                                     (None if it was decided to skip the album metadata)
+        """
+        if not self.enabled:
+            return False, None
+        decision = self.get(self.recording_key(artist, song))
+        if decision is None:
+            return False, None
+        return True, _recording_from_dict(decision["recording"]) if decision["recording"] else None
+
+    def set_recording(self, artist: str, song: str, recording: Optional[ReleaseRecording]):
+        """Remembers the recording that was chosen for a song (None if it was decided to skip the album metadata).
+        Nothing is remembered for songs without an artist or a name, since they can't be told apart.
+        """
+        if not (artist.strip() and song.strip()):
+            logger.warning("Not remembering a decision for '%s - %s', it has no artist or song", artist, song)
+            return
+        if self.enabled:
+            self.set(
+                self.recording_key(artist, song),
+                {"artist": artist, "song": song, "recording": _recording_to_dict(recording) if recording else None},
+            )
+
+    def review(self) -> List[Tuple[str, str]]:
+        """Returns all the decisions, as (key, description) pairs. Keys can be passed to `revoke`"""
+        descriptions = []
+        for key, decision in self.items():
+            if key.startswith(TITLE_DECISION + "\0"):
+                channel = f" (channel: {decision['channel']})" if decision["channel"] else ""
+                description = f"Title: {decision['title']}{channel} -> {decision['decided_title']}"
+            else:
+                recording = decision["recording"]
+                chosen = f"{recording['album']}:{recording['track']} ({recording['year']})" if recording else "skip"
+                description = f"Album: {decision['artist']} - {decision['song']} -> {chosen}"
+            descriptions.append((key, description))
+        return descriptions
+
+    def revoke(self, key: str) -> bool:
+        """Forgets a decision (see `review`), so it's asked again next time
+
+        Returns:
+            bool: Whether there was such a decision
+        """
+        return self.delete(key)
+
+
+decisions = DecisionStore(join(CACHE_DIR, "decisions.sqlite3"))
@@ -0,0 +1,183 @@
+"""Fast reader of the ID3v2 tags used by XP3, which only reads the tag header and the relevant text frames.
+Other frames (most notably embedded artwork) are skipped without reading them.
+"""
+
+import logging
+import re
+from typing import BinaryIO, Dict, Optional
+
+from config import IS_DEBUG
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+# Text frames that are read, by the field they're used for
+TITLE_FRAMES = ("TIT2",)
+ARTIST_FRAMES = ("TPE1",)
+ALBUM_FRAMES = ("TALB",)
+# Same order of precedence as music_tag
+YEAR_FRAMES = ("TDOR", "TORY", "TYER", "TDRC")
+TRACK_FRAMES = ("TRCK",)
+TEXT_FRAMES = frozenset(TITLE_FRAMES + ARTIST_FRAMES + ALBUM_FRAMES + YEAR_FRAMES + TRACK_FRAMES)
+ARTWORK_FRAME = "APIC"
+
+ID3V1_TAG_SIZE = 128
+
+TEXT_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+# Header flags
+FLAG_UNSYNCHRONISATION = 0x80
+FLAG_EXTENDED_HEADER = 0x40
+# Frame format flags (the second flags byte) that change how the frame's data is stored
+V23_FRAME_FLAGS_UNSUPPORTED = 0x80 | 0x40  # Compression, encryption
+V24_FRAME_FLAGS_UNSUPPORTED = 0x08 | 0x04 | 0x02 | 0x01  # Compression, encryption, unsynchronisation, data length
+
+
+class ID3Tags:
+    """The tags XP3 uses, as read from the ID3v2 tag of a file"""
+
+    def __init__(  # pylint: disable=R0917
+        self,
+        title: str = "",
+        artist: str = "",
+        album: str = "",
+        year: int = 0,
+        track: int = 0,
+        has_artwork: bool = False,
+    ) -> None:
+        self.title = title
+        self.artist = artist
+        self.album = album
+        self.year = year
+        self.track = track
+        self.has_artwork = has_artwork
+
+    def __repr__(self):
+        return f"{self.artist} - {self.title} ({self.album}:{self.track}, {self.year}, artwork: {self.has_artwork})"
+
+
+class UnsupportedTagError(Exception):
+    """Raised when the tag uses a feature the fast reader doesn't support"""
+
+
+def _syncsafe_int(data: bytes) -> int:
+    if any(byte & 0x80 for byte in data):
+        raise UnsupportedTagError("Invalid syncsafe integer")
+    value = 0
+    for byte in data:
+        value = (value << 7) | byte
+    return value
+
+
+def _decode_text(data: bytes) -> str:
+    if not data:
+        return ""
+    encoding = TEXT_ENCODINGS.get(data[0])
+    if encoding is None:
+        raise UnsupportedTagError(f"Unknown text encoding {data[0]}")
+    text = data[1:].decode(encoding, errors="replace")
+    # Multiple values are separated by null characters, only the first one is used
+    return text.split("\0")[0].strip()
+
+
+def _parse_year(text: str) -> int:
+    year_match = re.match(r"\s*(\d{4})", text)
+    return int(year_match.group(1)) if year_match else 0
+
+
+def _parse_track(text: str) -> int:
+    track = text.split("/")[0].strip()
+    return int(track) if track.isdigit() else 0
+
+
+def _read_frames(file: BinaryIO, major_version: int, tag_end: int) -> Dict[str, str]:
+    """Reads the relevant text frames, and notes an artwork frame with an empty value"""
+    frames: Dict[str, str] = {}
+    while file.tell() + 10 <= tag_end:
+        frame_header = file.read(10)
+        if len(frame_header) < 10 or frame_header[0] == 0:
+            break  # Padding
+        frame_id = frame_header[:4].decode("latin-1")
+        if major_version == 4:
+            frame_size = _syncsafe_int(frame_header[4:8])
+            unsupported_flags = frame_header[9] & V24_FRAME_FLAGS_UNSUPPORTED
+        else:
+            frame_size = int.from_bytes(frame_header[4:8], "big")
+            unsupported_flags = frame_header[9] & V23_FRAME_FLAGS_UNSUPPORTED
+        if file.tell() + frame_size > tag_end:
+            raise UnsupportedTagError(f"Frame {frame_id} exceeds the tag")
+
+        if frame_id in TEXT_FRAMES and frame_id not in frames:
+            if unsupported_flags:
+                raise UnsupportedTagError(f"Frame {frame_id} has unsupported flags")
+            frames[frame_id] = _decode_text(file.read(frame_size))
+        else:
+            if frame_id == ARTWORK_FRAME:
+                frames[frame_id] = ""
+            file.seek(frame_size, 1)
+    return frames
+
+
+def _first(frames: Dict[str, str], frame_ids) -> str:
+    for frame_id in frame_ids:
+        if frames.get(frame_id):
+            return frames[frame_id]
+    return ""
+
+
+def _has_id3v1_tag(file: BinaryIO) -> bool:
+    file.seek(0, 2)
+    if file.tell() < ID3V1_TAG_SIZE:
+        return False
+    file.seek(-ID3V1_TAG_SIZE, 2)
+    return file.read(3) == b"TAG"
+
+
+def read_id3_tags(file_path: str) -> Optional[ID3Tags]:
+    """Reads the tags of an mp3 file from its ID3v2.3 / ID3v2.4 tag, without reading the artwork.
+
+    Args:
+        file_path (str): Path of the mp3 file.
+
+    Returns:
+        Optional[ID3Tags]: The tags, or None if the file doesn't have an ID3v2 tag, if the tag uses features
+                           that aren't supported, or if some fields are missing from it but the file also has an
+                           ID3v1 tag (which a full reader such as music_tag merges, and should be used instead).
+    """
+    try:
+        with open(file_path, "rb") as file:
+            header = file.read(10)
+            if len(header) < 10 or header[:3] != b"ID3":
+                return None
+            major_version, flags = header[3], header[5]
+            if major_version not in (3, 4):
+                raise UnsupportedTagError(f"ID3v2.{major_version}")
+            if flags & FLAG_UNSYNCHRONISATION:
+                raise UnsupportedTagError("Unsynchronisation")
+            tag_end = 10 + _syncsafe_int(header[6:10])
+
+            if flags & FLAG_EXTENDED_HEADER:
+                extended_header_size = file.read(4)
+                if major_version == 4:  # Size includes itself
+                    file.seek(_syncsafe_int(extended_header_size) - 4, 1)
+                else:
+                    file.seek(int.from_bytes(extended_header_size, "big"), 1)
+
+            frames = _read_frames(file, major_version, tag_end)
+            frame_groups = (TITLE_FRAMES, ARTIST_FRAMES, ALBUM_FRAMES, YEAR_FRAMES, TRACK_FRAMES)
+            if not all(_first(frames, frame_ids) for frame_ids in frame_groups) and _has_id3v1_tag(file):
+                raise UnsupportedTagError("Missing ID3v2 fields might be in the ID3v1 tag")
+    except (OSError, UnsupportedTagError, UnicodeDecodeError) as err:
+        logger.debug("Can't read tags of %s quickly: %s", file_path, err)
+        return None
+
+    return ID3Tags(
+        title=_first(frames, TITLE_FRAMES),
+        artist=_first(frames, ARTIST_FRAMES),
+        album=_first(frames, ALBUM_FRAMES),
+        year=_parse_year(_first(frames, YEAR_FRAMES)),
+        track=_parse_track(_first(frames, TRACK_FRAMES)),
+        has_artwork=ARTWORK_FRAME in frames,
+    )
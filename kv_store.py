@@ -0,0 +1,149 @@
+"""Persistent key-value store (SQLite backed, JSON values), used to remember lookups across runs"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import IS_DEBUG
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+class KeyLocks:
+    """A lock per key, so work on the same key (such as a lookup or a download) is done by one thread at a time"""
+
+    def __init__(self) -> None:
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+class KeyValueStore:
+    """Maps string keys to JSON serializable values. Values are kept in memory once read or written."""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._memory: Dict[str, Any] = {}
+        self._key_locks = KeyLocks()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns the value of a key, or the default if it isn't in the store"""
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+            row = self._connect().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            self._memory[key] = json.loads(row[0])
+            return self._memory[key]
+
+    def set(self, key: str, value: Any):
+        """Sets the value of a key"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+            connection.commit()
+            self._memory[key] = value
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Returns the value of a key, computing (and storing) it if it isn't in the store.
+        Concurrent calls with the same key compute it once. None values aren't stored, so they're computed again.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._key_locks(key):
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self.set(key, value)
+        return value
+
+    def delete(self, key: str) -> bool:
+        """Removes a key from the store
+
+        Returns:
+            bool: Whether the key was in the store
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+            connection = self._connect()
+            cursor = connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            connection.commit()
+            return cursor.rowcount > 0
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Returns all the keys and values in the store, ordered by key"""
+        with self._lock:
+            rows = self._connect().execute("SELECT key, value FROM entries ORDER BY key").fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def clear(self) -> int:
+        """Removes all the keys from the store
+
+        Returns:
+            int: Number of removed keys
+        """
+        with self._lock:
+            self._memory.clear()
+            connection = self._connect()
+            cursor = connection.execute("DELETE FROM entries")
+            connection.commit()
+            return cursor.rowcount
+
+    def export(self, file_path: str) -> int:
+        """Exports the store to a JSON file
+
+        Returns:
+            int: Number of exported keys
+        """
+        entries = dict(self.items())
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(entries, file, indent=2, ensure_ascii=False)
+        return len(entries)
+
+    def load(self, file_path: str) -> int:
+        """Loads keys from a JSON file (as written by `export`), overwriting keys that are already in the store
+
+        Returns:
+            int: Number of loaded keys
+        """
+        with open(file_path, "r", encoding="utf-8") as file:
+            entries = json.load(file)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now) for key, value in entries.items()],
+            )
+            connection.commit()
+            self._memory.update(entries)
+        return len(entries)
+
+    def close(self):
+        """Closes the underlying database connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,172 @@
+"""Persistent manifest of processed mp3 files, used to skip unchanged files on re-runs"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from os.path import join
+from typing import Any, Callable, Optional
+
+from config import CACHE_DIR, IS_DEBUG
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+def run_options(**options: Any) -> str:
+    """Returns the options of a run (that affect how files are processed), as they're recorded in the manifest"""
+    return json.dumps(options, sort_keys=True)
+
+
+class ManifestEntry:
+    """What's known about a file from the last time it was processed"""
+
+    def __init__(  # pylint: disable=R0917
+        self,
+        path: str,
+        size: int,
+        mtime_ns: int,
+        tag_digest: str,
+        release_group_id: str,
+        updated: float,
+        options: str = "",
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.tag_digest = tag_digest
+        self.release_group_id = release_group_id
+        self.updated = updated
+        self.options = options
+
+    def __repr__(self):
+        return f"{self.path} ({self.size} bytes, tags {self.tag_digest[:8]}, release group {self.release_group_id})"
+
+
+class LibraryManifest:
+    """SQLite backed manifest of files that were processed successfully (resolved), and the options they were
+    processed with. A file is considered unchanged if it was processed with the same options, and its size and
+    modification time (or otherwise, its tags) are the same as when it was recorded.
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    tag_digest TEXT NOT NULL,
+                    release_group_id TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    options TEXT NOT NULL DEFAULT ''
+                )""")
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(files)")]
+            if "options" not in columns:
+                # Manifests from before options were recorded, their files are processed again
+                self._connection.execute("ALTER TABLE files ADD COLUMN options TEXT NOT NULL DEFAULT ''")
+            self._connection.commit()
+        return self._connection
+
+    def get(self, file_path: str) -> Optional[ManifestEntry]:
+        """Returns the entry of a file, or None if it was never recorded"""
+        with self._lock:
+            cursor = self._connect().execute("SELECT * FROM files WHERE path = ?", (os.path.abspath(file_path),))
+            row = cursor.fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def is_unchanged(
+        self, file_path: str, options: str = "", read_tag_digest: Optional[Callable[[str], str]] = None
+    ) -> bool:
+        """Returns true if and only if the file was recorded with the same options, and hasn't changed since
+
+        Args:
+            file_path (str): Path of the file.
+            options (str, optional): Options of the current run (see `run_options`). Defaults to "".
+            read_tag_digest (Callable[[str], str], optional): Reads the tag digest of a file. If given, a file whose
+                                                              size or modification time changed is still unchanged
+                                                              if its tags are the same as recorded (and its entry
+                                                              is updated). Defaults to None.
+        """
+        entry = self.get(file_path)
+        if entry is None or entry.options != options:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns:
+            return True
+        if read_tag_digest is None or read_tag_digest(file_path) != entry.tag_digest:
+            return False
+
+        logger.debug("Tags of %s are unchanged since last run", file_path)
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                (stat.st_size, stat.st_mtime_ns, entry.path),
+            )
+            connection.commit()
+        return True
+
+    def record(self, file_path: str, tag_digest: str, release_group_id: str = "", options: str = ""):
+        """Records the current state of a file, after it was processed successfully
+
+        Args:
+            file_path (str): Path of the file.
+            tag_digest (str): Digest of the tags of the file (see MP3MetaData.tag_digest).
+            release_group_id (str, optional): The release group the file was resolved to. Defaults to "".
+            options (str, optional): Options of the run that processed the file (see `run_options`). Defaults to "".
+        """
+        stat = os.stat(file_path)
+        row = (
+            os.path.abspath(file_path),
+            stat.st_size,
+            stat.st_mtime_ns,
+            tag_digest,
+            release_group_id,
+            time.time(),
+            options,
+        )
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, tag_digest, release_group_id, updated, options) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            connection.commit()
+
+    def forget(self, file_path: Optional[str] = None) -> int:
+        """Removes a file from the manifest (so it's processed on the next run), or all files if no path is given
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            connection = self._connect()
+            if file_path is None:
+                cursor = connection.execute("DELETE FROM files")
+            else:
+                cursor = connection.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(file_path),))
+            connection.commit()
+            return cursor.rowcount
+
+    def close(self):
+        """Closes the underlying database connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+library_manifest = LibraryManifest(join(CACHE_DIR, "manifest.sqlite3"))
@@ -0,0 +1,265 @@
+"""Staged metadata update of an mp3 library: scan tags, resolve candidates, review ambiguous files, apply tags.
+
+Unlike update_metadata_for_directory, the network is never waited on by a human (and vice versa).
+Files are scanned and resolved concurrently, files with a confident suggestion are updated without a human,
+and all the files that need a decision are reviewed together in a single session at the end.
+"""
+
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+from config import IS_DEBUG
+from decision_store import decisions
+from library_manifest import library_manifest, run_options
+from mp3_metadata import (
+    FileUpdateResult,
+    MP3MetaData,
+    get_suggested_recording,
+    is_suggestion_ambiguous,
+    read_tag_digest,
+)
+from music_api import ReleaseRecording, get_track_info
+from user_interaction import choose_recording, print_suggestions
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+class LibraryItem:
+    """State of a single file as it goes through the stages of the pipeline"""
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.metadata: Optional[MP3MetaData] = None
+        self.recordings: List[ReleaseRecording] = []
+        self.suggested_recording_index = -1
+        self.needs_review = False
+        self.skipped = False
+        self.error: Optional[Exception] = None
+
+    def __repr__(self):
+        return f"{self.file_path}: {self.metadata}{' (needs review)' if self.needs_review else ''}"
+
+
+def _run_stage(stage: Callable[[LibraryItem], None], items: List[LibraryItem], jobs: int):
+    """Runs a stage on all the items (that weren't skipped and haven't failed yet), recording failures on the items"""
+
+    def run(item: LibraryItem):
+        if item.error is not None or item.skipped:
+            return
+        try:
+            stage(item)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.error("Failed to process %s: %s", item.file_path, err)
+            item.error = err
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        list(executor.map(run, items))
+
+
+def scan_files(file_paths: List[str], jobs: int = 4, full_pass: bool = False, options: str = "") -> List[LibraryItem]:
+    """Scan stage - reads the metadata of all the files.
+    Titles are inferred without user input. Files whose title has no artist and song aren't looked up
+    (see `resolve_candidates`), fix their names or tags and run again.
+
+    Args:
+        file_paths (List[str]): Paths of the mp3 files.
+        jobs (int, optional): Number of files to read in parallel. Defaults to 4.
+        full_pass (bool, optional): Scan files that haven't changed since they were last processed
+                                    (otherwise they're skipped). Defaults to False.
+        options (str, optional): Options of the run (see `run_options`), files that were processed with other
+                                 options aren't skipped. Defaults to "".
+
+    Returns:
+        List[LibraryItem]: An item per file, in the same order
+    """
+
+    def scan(item: LibraryItem):
+        if not full_pass and library_manifest.is_unchanged(item.file_path, options, read_tag_digest):
+            item.skipped = True
+            return
+        item.metadata = MP3MetaData.from_file(item.file_path)
+
+    items = [LibraryItem(file_path) for file_path in file_paths]
+    _run_stage(scan, items, jobs)
+    return items
+
+
+def resolve_candidates(
+    items: List[LibraryItem], interactive: bool = True, keep_current_metadata: bool = False, jobs: int = 4
+):
+    """Resolve stage - fetches candidate recordings concurrently and updates the files with a confident suggestion.
+    Files with an ambiguous suggestion, or whose album metadata is already set (and differs from the suggestion),
+    are marked for review (in interactive mode), or get the best suggestion (otherwise, as in
+    MP3MetaData.update_missing_fields).
+    Files without an artist and song, or without any recording, are left as they are.
+
+    Args:
+        items (List[LibraryItem]): Scanned items.
+        interactive (bool, optional): Whether ambiguous files will be reviewed by a human. Defaults to True.
+        keep_current_metadata (bool, optional): Doesn't look up files that have full metadata. Defaults to False.
+        jobs (int, optional): Number of files to resolve in parallel. Defaults to 4.
+    """
+
+    def resolve(item: LibraryItem):
+        metadata = item.metadata
+        assert metadata is not None
+        if not (metadata.band and metadata.song):
+            logger.info("Skipping %s, its title has no artist and song", item.file_path)
+            return
+        if keep_current_metadata and metadata.album and metadata.year and metadata.track:
+            logger.debug("Keeping current metadata for %s", metadata.title)
+            return
+
+        has_decision, decided_recording = decisions.get_recording(metadata.band, metadata.song)
+        if has_decision:
+            logger.debug("Using earlier decision for %s: %s", metadata.title, decided_recording)
+            metadata.update_fields_from_recording(decided_recording, False)
+            return
+
+        recordings = get_track_info(metadata.band, metadata.song)
+        # Sort by release year (main), and by length of album (secondary)
+        recordings.sort(key=lambda recording: (recording.year, len(recording.album)))
+        if not recordings:
+            logger.info("Skipping %s, no recordings found for %s", item.file_path, metadata.title)
+            return
+        item.recordings = recordings
+        item.suggested_recording_index = get_suggested_recording(recordings, metadata)
+
+        if interactive and _needs_review(metadata, recordings, item.suggested_recording_index):
+            item.needs_review = True
+            return
+        metadata.update_fields_from_recording(
+            recordings[max(item.suggested_recording_index, 0)], full_update=not interactive
+        )
+
+    _run_stage(resolve, items, jobs)
+
+
+def _needs_review(metadata: MP3MetaData, recordings: List[ReleaseRecording], suggested_recording_index: int) -> bool:
+    """Returns true if a human should choose the recording of a file - the suggestion is ambiguous,
+    or it would replace album metadata that's already set (as the "Metadata already set" prompt of
+    MP3MetaData.update_missing_fields asks)
+    """
+    # The suggestion is the metadata that's already set on the file
+    if suggested_recording_index >= 0:
+        suggested = recordings[suggested_recording_index]
+        if (metadata.album, metadata.year, metadata.track) == (suggested.album, suggested.year, suggested.track):
+            return False
+    return metadata.is_resolved() or is_suggestion_ambiguous(recordings, suggested_recording_index)
+
+
+def review_ambiguous(items: List[LibraryItem]):
+    """Review stage - lets the user choose the recording of every file marked for review, in a single session"""
+    items_to_review = [item for item in items if item.needs_review and item.error is None]
+    if not items_to_review:
+        return
+
+    print(f"\n{len(items_to_review)} files need review")
+    for index, item in enumerate(items_to_review):
+        metadata = item.metadata
+        assert metadata is not None
+        print(f"\n({index + 1}/{len(items_to_review)}) {item.file_path}")
+        if metadata.is_resolved():
+            print(f"Metadata already set (skip to keep it): {metadata.album}:{metadata.track} ({metadata.year})")
+        print_suggestions(item.recordings, metadata.band, metadata.song, item.suggested_recording_index)
+        chosen_recording = choose_recording(item.recordings, item.suggested_recording_index, metadata.song)
+        decisions.set_recording(metadata.band, metadata.song, chosen_recording)
+        if chosen_recording is not None:
+            metadata.update_fields_from_recording(chosen_recording, False)
+        item.needs_review = False
+
+
+def apply_all(  # pylint: disable=R0917
+    items: List[LibraryItem],
+    update_album_art: bool = False,
+    force_download_album_art: bool = False,
+    jobs: int = 4,
+    options: str = "",
+) -> List[FileUpdateResult]:
+    """Apply stage - writes the metadata (and album art) of all the files.
+
+    Args:
+        items (List[LibraryItem]): Resolved (and reviewed) items.
+        update_album_art (bool, optional): Should update the album art of the files. Defaults to False.
+        force_download_album_art (bool, optional): Downloads album art even if already exists. Defaults to False.
+        jobs (int, optional): Number of files to write in parallel. Defaults to 4.
+        options (str, optional): Options of the run (see `run_options`), recorded in the manifest. Defaults to "".
+
+    Returns:
+        List[FileUpdateResult]: Result per file, in the order of the items
+    """
+
+    # Album art that failed to download isn't retried by the other files of the run
+    failed_release_groups: Set[str] = set()
+
+    def apply(item: LibraryItem):
+        metadata = item.metadata
+        assert metadata is not None
+        if update_album_art:
+            metadata.update_album_art(
+                force_download=force_download_album_art, failed_release_groups=failed_release_groups
+            )
+        metadata.apply_on_file(item.file_path)
+        # Files that weren't resolved are processed again on the next run
+        if metadata.is_resolved(with_album_art=update_album_art):
+            library_manifest.record(item.file_path, metadata.tag_digest(), metadata.release_group_id, options)
+
+    _run_stage(apply, items, jobs)
+    return [
+        FileUpdateResult(item.file_path, metadata=item.metadata, error=item.error, skipped=item.skipped)
+        for item in items
+    ]
+
+
+def update_library(  # pylint: disable=R0917
+    base_path: str,
+    interactive: bool = True,
+    update_album_art: bool = False,
+    recursive: bool = False,
+    force_download_album_art: bool = False,
+    keep_current_metadata: bool = False,
+    jobs: int = 4,
+    full_pass: bool = False,
+) -> List[FileUpdateResult]:
+    """Updates mp3 metadata of files in a directory, in stages (scan, resolve, review and apply).
+    Takes the same arguments as update_metadata_for_directory.
+
+    Returns:
+        List[FileUpdateResult]: Result per file, in the order the files were found
+    """
+    if not os.path.isdir(base_path):
+        logger.error("Provided base path %s is not an existing directory", base_path)
+        sys.exit(1)
+
+    paths = Path(base_path).rglob("*.mp3") if recursive else Path(base_path).glob("*.mp3")
+    file_paths = [str(path.absolute()) for path in paths]
+    options = run_options(
+        interactive=interactive,
+        keep_current_metadata=keep_current_metadata,
+        update_album_art=update_album_art,
+        force_download_album_art=force_download_album_art,
+        by_album=False,
+    )
+
+    logger.info("Scanning %d files", len(file_paths))
+    items = scan_files(file_paths, jobs, full_pass, options)
+    logger.info("Resolving candidates")
+    resolve_candidates(items, interactive, keep_current_metadata, jobs)
+    if interactive:
+        review_ambiguous(items)
+    logger.info("Applying metadata")
+    results = apply_all(items, update_album_art, force_download_album_art, jobs, options)
+
+    logger.info(
+        "Updated metadata for %d/%d files (%d unchanged)",
+        sum(1 for result in results if result.succeeded and not result.skipped),
+        len(results),
+        sum(1 for result in results if result.skipped),
+    )
+    return results
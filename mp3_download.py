@@ -1,13 +1,30 @@
 """Functions used to get data related to mp3 files and download them"""
 
 import logging
-from os.path import join
-from typing import List, Optional, Tuple
+import os
+import queue
+import shutil
+import threading
+from os.path import isfile, join, splitext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urlparse
 
 import yt_dlp as youtube_dl
+from yt_dlp.postprocessor.ffmpeg import FFmpegExtractAudioPP, FFmpegPostProcessorError
+from yt_dlp.utils import PostProcessingError, prepend_extension
 
-from config import DEFAULT_PLAYLIST, IS_DEBUG, MP3_DIR
+from artwork_store import detect_image_format
+from config import (
+    DEFAULT_PLAYLIST,
+    DOWNLOAD_EMBED_TAGS,
+    DOWNLOAD_FETCH_WORKERS,
+    DOWNLOAD_KEEP_CODEC,
+    DOWNLOAD_QUEUE_SIZE,
+    DOWNLOAD_TRANSCODE_WORKERS,
+    IS_DEBUG,
+    MP3_DIR,
+    TMP_DIR,
+)
 from mp3_metadata import MP3MetaData
 
 logging.basicConfig()
@@ -15,15 +32,33 @@ logger = logging.getLogger("XP3")
 logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
 
 
-def get_playlist_songs(
+MP3_QUALITY = "192"
+# ffmpeg (ID3) names of the tags that MP3MetaData.get_tags returns
+FFMPEG_TAG_NAMES = {
+    "title": "title",
+    "artist": "artist",
+    "albumartist": "album_artist",
+    "year": "date",
+    "album": "album",
+    "tracknumber": "track",
+}
+
+
+def is_valid_url(url: str) -> bool:
+    """Returns true if and only if the string is an absolute URL"""
+    parsed = urlparse(url)
+    return all([parsed.scheme, parsed.netloc])
+
+
+def iter_playlist_songs(
     playlist_url: str = DEFAULT_PLAYLIST,
     start_index: int = 1,
     end_index: int = 999999,
     interactive: bool = True,
     update_album: bool = True,
-) -> List[Tuple[MP3MetaData, str]]:
-    """Given a YouTube playlist URL, returns a list of mp3 data
-       of the songs in that playlist and the associated URL.
+) -> Iterator[Tuple[MP3MetaData, str]]:
+    """Given a YouTube playlist URL, yields the mp3 data of each song in that playlist and the associated URL,
+       as soon as the song's metadata is resolved (so songs can be downloaded while the next ones are looked up).
 
     Args:
         playlist_url (str, optional): The URL of the playlist. Defaults to DEFAULT_PLAYLIST (from config).
@@ -33,8 +68,8 @@ def get_playlist_songs(
                                       Defaults to True.
         update_album (bool, optional): Should update album metadata. Defaults to True.
 
-    Returns:
-        List[Tuple[MP3MetaData, str]]: List of tuples - metadata regarding the song, and the song's URL.
+    Yields:
+        Tuple[MP3MetaData, str]: Metadata regarding the song, and the song's URL.
     """
     ydl_opts = {
         "quiet": True,
@@ -49,17 +84,411 @@ def get_playlist_songs(
     end_index = min(end_index, len(playlist_dict["entries"])) - 1
     logger.debug("Start: %d, End: %d", start_index, end_index)
 
-    songs = []
+    failed_release_groups: Set[str] = set()
     for index in range(start_index, end_index + 1):
         logger.debug(" > Processing song (%d/%d)", index, end_index)
         entry = playlist_dict["entries"][index]
         metadata = MP3MetaData.from_video(title=entry["title"], channel=entry["uploader"], interactive=interactive)
         if update_album:
             metadata.update_missing_fields(interactive=interactive)
-            metadata.update_album_art()
-        songs.append((metadata, entry["url"]))
+            metadata.update_album_art(failed_release_groups=failed_release_groups)
+        yield metadata, entry["url"]
+
+
+def get_playlist_songs(
+    playlist_url: str = DEFAULT_PLAYLIST,
+    start_index: int = 1,
+    end_index: int = 999999,
+    interactive: bool = True,
+    update_album: bool = True,
+) -> List[Tuple[MP3MetaData, str]]:
+    """Given a YouTube playlist URL, returns a list of mp3 data
+       of the songs in that playlist and the associated URL (see `iter_playlist_songs`).
+
+    Args:
+        playlist_url (str, optional): The URL of the playlist. Defaults to DEFAULT_PLAYLIST (from config).
+        start_index (int, optional): The index of the first song from the playlist. Defaults to 1.
+        end_index (int, optional): The index of the last song from the playlist. Defaults to 999999.
+        interactive (bool, optional): Should run in interactive mode and ask user for input regarding title conversion.
+                                      Defaults to True.
+        update_album (bool, optional): Should update album metadata. Defaults to True.
+
+    Returns:
+        List[Tuple[MP3MetaData, str]]: List of tuples - metadata regarding the song, and the song's URL.
+    """
+    return list(
+        iter_playlist_songs(
+            playlist_url=playlist_url,
+            start_index=start_index,
+            end_index=end_index,
+            interactive=interactive,
+            update_album=update_album,
+        )
+    )
+
+
+class DownloadResult:
+    """Result of downloading a single song (see SongDownloader.download_many)"""
+
+    def __init__(
+        self,
+        url: str,
+        metadata: MP3MetaData,
+        file_path: str = "",
+        error: Optional[Exception] = None,
+    ):
+        self.url = url
+        self.metadata = metadata
+        self.file_path = file_path
+        self.error = error
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the song was downloaded (and tagged) successfully"""
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"{self.url}: failed ({self.error})"
+        return f"{self.url}: {self.file_path}"
 
-    return songs
+
+# Formats of album art that are embedded in mp3 files as they are, and the bytes needed to detect the format
+EMBEDDED_IMAGE_FORMATS = ("jpg", "png")
+ARTWORK_HEADER_SIZE = 16
+
+
+class FFmpegExtractTaggedAudioPP(FFmpegExtractAudioPP):
+    """FFmpegExtractAudio postprocessor (to mp3), that also writes the tags and artwork of a song in the same ffmpeg
+    run, so the mp3 is written once. Audio that's already mp3 is copied as is (with `keep_codec`) or re-encoded.
+    """
+
+    def __init__(
+        self,
+        metadata: Optional[MP3MetaData] = None,
+        preferredquality: str = MP3_QUALITY,
+        keep_codec: bool = True,
+    ):
+        super().__init__(preferredcodec="mp3", preferredquality=preferredquality)
+        self.metadata = metadata
+        self.keep_codec = keep_codec
+
+    def _metadata_args(self) -> Tuple[List[str], List[str]]:
+        """Returns additional ffmpeg inputs (the artwork), and the options that map them and write the tags"""
+        if self.metadata is None:
+            return [], []
+        options = ["-map_metadata", "-1"]
+        for key, value in self.metadata.get_tags().items():
+            options += ["-metadata", f"{FFMPEG_TAG_NAMES[key]}={value}"]
+        options += ["-id3v2_version", "3"]
+
+        art_path = self.metadata.art_path
+        if not (art_path and isfile(art_path)):
+            return [], options
+        with open(art_path, "rb") as art_file:
+            image_format = detect_image_format(art_file.read(ARTWORK_HEADER_SIZE))
+        if image_format is None:
+            logger.warning("Unknown format of album art %s, not embedding it", art_path)
+            return [], options
+        # Same as the artwork music_tag embeds: a front cover (APIC type 3). JPEG and PNG are embedded as they are,
+        # other formats (that ID3 readers don't support) are converted to PNG
+        codec = "copy" if image_format in EMBEDDED_IMAGE_FORMATS else "png"
+        artwork_options = ["-map", "1:0", "-c:v", codec, "-disposition:v", "attached_pic"]
+        artwork_options += ["-metadata:s:v", "title=Album cover", "-metadata:s:v", "comment=Cover (front)"]
+        return [art_path], artwork_options + options
+
+    def run_ffmpeg(self, path, out_path, codec, more_opts):
+        artwork_paths, metadata_options = self._metadata_args()
+        codec_options = [] if codec is None else ["-acodec", codec]
+        options = ["-map", "0:a", *codec_options, *more_opts, *metadata_options]
+        try:
+            self.run_ffmpeg_multiple_files([path, *artwork_paths], out_path, options)
+        except FFmpegPostProcessorError as err:
+            raise PostProcessingError(f"audio conversion failed: {err.msg}") from err
+
+    def run(self, information):
+        path = information["filepath"]
+        if information["ext"] != "mp3":
+            return super().run(information)
+
+        # FFmpegExtractAudio leaves mp3 files as they are, but they're still tagged (or re-encoded)
+        temp_path = prepend_extension(path, "temp")
+        if self.keep_codec:
+            self.run_ffmpeg(path, temp_path, "copy", [])
+        else:
+            self.run_ffmpeg(path, temp_path, "libmp3lame", self._quality_args("libmp3lame"))
+        os.replace(temp_path, path)
+        return [], information
+
+
+def transcode_to_mp3(
+    audio_path: str,
+    mp3_path: str,
+    quality: str = MP3_QUALITY,
+    metadata: Optional[MP3MetaData] = None,
+    keep_codec: bool = True,
+):
+    """Transcodes an audio file to mp3 (with yt-dlp's FFmpegExtractAudio postprocessor), and removes the audio file.
+
+    Args:
+        audio_path (str): The audio file, as downloaded by `SongDownloader.fetch`
+        mp3_path (str): Path of the mp3 file
+        quality (str, optional): Bitrate (in kbps) or VBR quality (0-10) of the mp3. Defaults to MP3_QUALITY.
+        metadata (MP3MetaData, optional): Metadata to write to the mp3 while transcoding. Defaults to None.
+        keep_codec (bool, optional): Whether to copy audio that's already mp3 instead of re-encoding it.
+                                     Defaults to True.
+    """
+    postprocessor = FFmpegExtractTaggedAudioPP(metadata, preferredquality=quality, keep_codec=keep_codec)
+    files_to_delete, info = postprocessor.run({"filepath": audio_path, "ext": splitext(audio_path)[1][1:]})
+    shutil.move(info["filepath"], mp3_path)
+    for file_path in files_to_delete:
+        if isfile(file_path):
+            os.remove(file_path)
+
+
+class SongDownloader:
+    """Downloads songs into a directory (`out_path`), and tags them with their metadata.
+    Audio of format `audio_format` is fetched into `fetch_path`, and transcoded to mp3 of `quality` (kbps or VBR 0-10).
+    With `embed_tags`, tags and artwork are written while transcoding, rather than by rewriting the mp3 afterwards.
+    With `keep_codec`, audio that's already mp3 is copied rather than re-encoded.
+    Each thread that downloads with the downloader creates one YoutubeDL (YoutubeDL isn't thread safe),
+    and reuses it for all its songs.
+    """
+
+    def __init__(
+        self,
+        out_path: str = MP3_DIR,
+        *,
+        audio_format: str = "bestaudio",
+        quality: str = MP3_QUALITY,
+        fetch_path: str = TMP_DIR,
+        embed_tags: bool = DOWNLOAD_EMBED_TAGS,
+        keep_codec: bool = DOWNLOAD_KEEP_CODEC,
+    ):
+        self.out_path = out_path
+        self.audio_format = audio_format
+        self.quality = quality
+        self.fetch_path = fetch_path
+        self.embed_tags = embed_tags
+        self.keep_codec = keep_codec
+        self._local = threading.local()
+        self._ydls: List[youtube_dl.YoutubeDL] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Closes the YoutubeDL instances of the downloader"""
+        with self._lock:
+            ydls, self._ydls = self._ydls, []
+        for ydl in ydls:
+            ydl.close()
+        self._local = threading.local()
+
+    def _get_ydl(self) -> youtube_dl.YoutubeDL:
+        """Returns the YoutubeDL of the current thread"""
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl_opts = {
+                "format": self.audio_format,
+                # Unique per thread, in case the same song is fetched concurrently
+                "outtmpl": join(self.fetch_path, f"%(id)s.{threading.get_ident()}.%(ext)s"),
+                "quiet": True,
+                "noplaylist": True,
+            }
+            ydl = self._local.ydl = youtube_dl.YoutubeDL(ydl_opts)
+            with self._lock:
+                self._ydls.append(ydl)
+        return ydl
+
+    def fetch(self, song_url: str) -> Tuple[str, Dict[str, Any]]:
+        """Downloads the audio of a song as is, without transcoding it
+
+        Args:
+            song_url (str): The URL of the song
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: Path to the downloaded audio file, and the info of the video
+        """
+        ydl = self._get_ydl()
+        info_dict = ydl.extract_info(song_url, download=True)
+        return ydl.prepare_filename(info_dict), info_dict
+
+    def transcode(self, audio_path: str, metadata: MP3MetaData, mp3_path: Optional[str] = None) -> str:
+        """Transcodes fetched audio into an mp3 in the output directory, tags it, and removes the audio
+
+        Args:
+            audio_path (str): The audio file, as downloaded by `fetch`
+            metadata (MP3MetaData): The metadata of the song
+            mp3_path (str, optional): Path of the mp3 file.
+                                      Defaults to the title of the song (see MP3MetaData.to_file_name).
+
+        Returns:
+            str: Path to the mp3 file
+        """
+        if mp3_path is None:
+            mp3_path = join(self.out_path, f"{MP3MetaData.to_file_name(metadata.title)}.mp3")
+        try:
+            transcode_to_mp3(
+                audio_path,
+                mp3_path,
+                self.quality,
+                metadata=metadata if self.embed_tags else None,
+                keep_codec=self.keep_codec,
+            )
+        finally:
+            if isfile(audio_path):
+                os.remove(audio_path)
+        if not self.embed_tags:
+            metadata.apply_on_file(mp3_path)
+        logger.debug(" >> Updated metadata for %s", mp3_path)
+        return mp3_path
+
+    def download(
+        self,
+        song_url: str,
+        metadata: Optional[MP3MetaData] = None,
+        update_album: bool = True,
+        interactive: bool = True,
+    ) -> str:
+        """Downloads a single song and updates its metadata
+
+        Args:
+            song_url (str): The URL of the song
+            metadata (MP3MetaData, optional): The metadata of the song.
+                                              Defaults to None, in which case it's taken from the video.
+            update_album (bool, optional): Whether to update album metadata or not.
+                                           Ignored if `metadata` is not None. Defaults to True.
+            interactive (bool, optional): Whether to run metadata updates in interactive mode. Defaults to True.
+
+        Returns:
+            str: Path to the downloaded mp3 file.
+        """
+        if not is_valid_url(song_url):
+            logger.error("Invalid URL: %s", song_url)
+            raise ValueError(f"Invalid URL: {song_url}")
+
+        audio_path, info_dict = self.fetch(song_url)
+        mp3_path = None
+        if metadata is None:
+            # Named after the video title, as YoutubeDL names files (%(title)s)
+            mp3_path = self._get_ydl().prepare_filename(info_dict, outtmpl=join(self.out_path, "%(title)s.mp3"))
+            metadata = MP3MetaData.from_video(
+                title=info_dict["title"], channel=info_dict["uploader"], interactive=interactive
+            )
+            if update_album:
+                metadata.update_missing_fields(interactive=interactive)
+                metadata.update_album_art()
+        return self.transcode(audio_path, metadata, mp3_path)
+
+    def download_many(
+        self,
+        songs: Iterable[Tuple[MP3MetaData, str]],
+        fetch_workers: int = DOWNLOAD_FETCH_WORKERS,
+        transcode_workers: int = DOWNLOAD_TRANSCODE_WORKERS,
+        queue_size: int = DOWNLOAD_QUEUE_SIZE,
+    ) -> List[DownloadResult]:
+        """Downloads songs concurrently, and tags them with their metadata.
+        Fetch workers download the audio of the songs (network bound), and pass it through a bounded queue
+        to transcode workers, which transcode it to mp3 with ffmpeg and tag it (CPU bound).
+        Songs are taken from `songs` only as fetch workers become free, so it can be a (slow) generator,
+        as long as it doesn't prompt the user (its prompts would be interleaved with the logs of the workers).
+
+        Args:
+            songs (Iterable[Tuple[MP3MetaData, str]]): Metadata of each song, and the song's URL.
+            fetch_workers (int, optional): Number of songs fetched at a time. Defaults to DOWNLOAD_FETCH_WORKERS.
+            transcode_workers (int, optional): Number of songs transcoded at a time, 0 for one per core.
+                                               Defaults to DOWNLOAD_TRANSCODE_WORKERS.
+            queue_size (int, optional): Maximal number of fetched songs that wait to be transcoded.
+                                        Defaults to DOWNLOAD_QUEUE_SIZE.
+
+        Returns:
+            List[DownloadResult]: Result per song, in the order of the songs
+        """
+        fetch_workers = max(fetch_workers, 1)
+        transcode_workers = transcode_workers or os.cpu_count() or 1
+        results: Dict[int, DownloadResult] = {}
+        songs_queue: "queue.Queue[Optional[Tuple[int, MP3MetaData, str]]]" = queue.Queue(maxsize=fetch_workers)
+        fetched_queue: "queue.Queue[Optional[Tuple[int, MP3MetaData, str, str]]]" = queue.Queue(
+            maxsize=max(queue_size, 1)
+        )
+
+        fetchers = [
+            threading.Thread(target=self._fetch_worker, args=(songs_queue, fetched_queue, results), daemon=True)
+            for _ in range(fetch_workers)
+        ]
+        transcoders = [
+            threading.Thread(target=self._transcode_worker, args=(fetched_queue, results), daemon=True)
+            for _ in range(transcode_workers)
+        ]
+        for thread in fetchers + transcoders:
+            thread.start()
+
+        songs_count = 0
+        try:
+            for metadata, url in songs:
+                if not is_valid_url(url):
+                    error = ValueError(f"Invalid URL: {url}")
+                    self._set_result(results, songs_count, DownloadResult(url, metadata, error=error))
+                else:
+                    songs_queue.put((songs_count, metadata, url))
+                songs_count += 1
+        finally:
+            # Let the workers finish the songs they already took
+            for _ in fetchers:
+                songs_queue.put(None)
+            for thread in fetchers:
+                thread.join()
+            for _ in transcoders:
+                fetched_queue.put(None)
+            for thread in transcoders:
+                thread.join()
+
+        logger.info("Downloaded %d/%d songs", sum(1 for result in results.values() if result.succeeded), len(results))
+        return [results[index] for index in range(songs_count)]
+
+    @staticmethod
+    def _set_result(results: Dict[int, DownloadResult], index: int, result: DownloadResult):
+        """Logs the result of a song of download_many, and sets it"""
+        if result.succeeded:
+            logger.debug(" >> Downloaded %s to %s", result.metadata.title, result.file_path)
+        else:
+            logger.error("Failed to download %s from %s: %s", result.metadata.title, result.url, result.error)
+        results[index] = result
+
+    def _fetch_worker(
+        self,
+        songs_queue: "queue.Queue[Optional[Tuple[int, MP3MetaData, str]]]",
+        fetched_queue: "queue.Queue[Optional[Tuple[int, MP3MetaData, str, str]]]",
+        results: Dict[int, DownloadResult],
+    ):
+        """Fetches the songs of songs_queue into fetched_queue, until it gets None (see download_many)"""
+        while (song := songs_queue.get()) is not None:
+            index, metadata, url = song
+            logger.debug(" > Downloading %s, from %s", metadata.title, url)
+            try:
+                audio_path, _ = self.fetch(url)
+                fetched_queue.put((index, metadata, url, audio_path))
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                self._set_result(results, index, DownloadResult(url, metadata, error=err))
+
+    def _transcode_worker(
+        self,
+        fetched_queue: "queue.Queue[Optional[Tuple[int, MP3MetaData, str, str]]]",
+        results: Dict[int, DownloadResult],
+    ):
+        """Transcodes the songs of fetched_queue, until it gets None (see download_many)"""
+        while (fetched := fetched_queue.get()) is not None:
+            index, metadata, url, audio_path = fetched
+            try:
+                result = DownloadResult(url, metadata, file_path=self.transcode(audio_path, metadata))
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                result = DownloadResult(url, metadata, error=err)
+            self._set_result(results, index, result)
 
 
 def download_song(
@@ -69,7 +498,7 @@ def download_song(
     update_album: bool = True,
     interactive: bool = True,
 ) -> Optional[str]:
-    """Downloads a single song and updates its metadata
+    """Downloads a single song and updates its metadata (see `SongDownloader` for downloading many songs)
 
     Args:
         song_url (str): The URL of the song
@@ -82,45 +511,35 @@ def download_song(
     Returns:
         Optional[str]: Path to the downloaded mp3 file.
     """
+    with SongDownloader(out_path) as downloader:
+        return downloader.download(song_url, metadata=metadata, update_album=update_album, interactive=interactive)
 
-    def is_valid_url(url: str) -> bool:  # TODO - find a place for this
-        parsed = urlparse(url)
-        return all([parsed.scheme, parsed.netloc])
 
-    if not is_valid_url(song_url):
-        logger.error("Invalid URL: %s", song_url)
-        raise ValueError(f"Invalid URL: {song_url}")
+def download_songs(  # pylint: disable=R0917
+    songs: Iterable[Tuple[MP3MetaData, str]],
+    out_path: str = MP3_DIR,
+    fetch_workers: int = DOWNLOAD_FETCH_WORKERS,
+    transcode_workers: int = DOWNLOAD_TRANSCODE_WORKERS,
+    queue_size: int = DOWNLOAD_QUEUE_SIZE,
+) -> List[DownloadResult]:
+    """Downloads songs concurrently, and tags them with their metadata (see `SongDownloader.download_many`)
 
-    title = metadata.title if metadata else None
-    ydl_opts = {
-        "format": "bestaudio",
-        "outtmpl": (
-            join(out_path, f"{title}.%(ext)s") if title else join(out_path, "%(title)s.%(ext)s")
-        ),  # %(title) is the video title, as described in https://github.com/ytdl-org/youtube-dl#output-template
-        "quiet": True,
-        "noplaylist": True,
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ],
-    }
-    with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(song_url, download=True)
+    Args:
+        songs (Iterable[Tuple[MP3MetaData, str]]): Metadata of each song, and the song's URL.
+        out_path (str, optional): The directory to save the downloaded songs. Defaults to MP3_DIR.
+        fetch_workers (int, optional): Number of songs fetched at a time. Defaults to DOWNLOAD_FETCH_WORKERS.
+        transcode_workers (int, optional): Number of songs transcoded at a time, 0 for one per core.
+                                           Defaults to DOWNLOAD_TRANSCODE_WORKERS.
+        queue_size (int, optional): Maximal number of fetched songs that wait to be transcoded.
+                                    Defaults to DOWNLOAD_QUEUE_SIZE.
 
-    mp3_path = join(out_path, f"{title}.mp3") if title else join(out_path, f"{info_dict['title']}.mp3")
-    if metadata is None:
-        metadata = MP3MetaData.from_video(
-            title=info_dict["title"], channel=info_dict["uploader"], interactive=interactive
+    Returns:
+        List[DownloadResult]: Result per song, in the order of the songs
+    """
+    with SongDownloader(out_path) as downloader:
+        return downloader.download_many(
+            songs, fetch_workers=fetch_workers, transcode_workers=transcode_workers, queue_size=queue_size
         )
-        if update_album:
-            metadata.update_missing_fields(interactive=interactive)
-            metadata.update_album_art()
-    metadata.apply_on_file(mp3_path)
-    logger.debug(" >> Updated metadata for %s", mp3_path)
-    return mp3_path
 
 
 def download_xprimental(
@@ -130,6 +549,8 @@ def download_xprimental(
     interactive: bool = True,
 ):
     """Downloads songs from a playlist.
+    Songs are downloaded while the metadata of the next songs is looked up. In interactive mode, the metadata
+    of all the songs is resolved before the downloads start, so prompts aren't interleaved with download logs.
 
     Args:
         playlist_url (str, optional): The URL of the playlist. Defaults to DEFAULT_PLAYLIST.
@@ -137,10 +558,13 @@ def download_xprimental(
         end_index (int, optional): The index of the last song to download. Defaults to 99999.
         interactive (bool, optional): Should run in interactive mode and ask user for input regarding title conversion.
                                       Defaults to True.
+
+    Returns:
+        List[DownloadResult]: Result per song, in the order of the playlist
     """
-    songs = get_playlist_songs(
+    songs = iter_playlist_songs(
         playlist_url=playlist_url, start_index=start_index, end_index=end_index, interactive=interactive
     )
-    for metadata, url in songs:
-        logger.debug(" > Downloading %s, from %s", metadata.title, url)
-        download_song(url, out_path=MP3_DIR, metadata=metadata, update_album=True, interactive=interactive)
+    if interactive:
+        songs = list(songs)
+    return download_songs(songs, out_path=MP3_DIR)
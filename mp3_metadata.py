@@ -1,27 +1,44 @@
 """Module providing a class to work with mp3 metadata (MP3MetaData) and related utilities"""
 
+# pylint: disable=too-many-lines
+
 import datetime
+import functools
+import hashlib
 import logging
 import os
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from os.path import basename, dirname, isfile
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import music_tag
 from colorama import Back, Fore
 from dateutil import parser
 from dateutil.parser import ParserError
+from mutagen import PaddingInfo
 
-from config import IS_DEBUG, PATTERN_ILLEGAL_CHARS
+from artwork_store import artwork_alias, artwork_store, release_group_alias
+from config import ID3_PADDING_KB, IS_DEBUG, PATTERN_ILLEGAL_CHARS, TMP_DIR
+from decision_store import decisions
 from file_operations import get_album_artwork_path
+from id3_reader import read_id3_tags
+from kv_store import KeyLocks
+from library_manifest import library_manifest, run_options
 from music_api import (
     ReleaseRecording,
+    _clean_title,
     download_album_artwork,
     download_album_artwork_from_release_id,
+    get_album_tracks,
+    get_release_group_id,
     get_track_info,
+    intern_string,
 )
+from title_normalizer import normalize_title, split_title
 from user_interaction import choose_recording, get_user_input, print_suggestions
 
 
@@ -36,11 +53,47 @@ logger = logging.getLogger("XP3")
 logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
 
 
-STRINGS_TO_REMOVE = ["with Lyrics", "Lyrics", "720p", "1080p", "Video", "LYRICS"]
+# Album artwork is downloaded once per release group, even when songs of the album are updated concurrently
+_artwork_download_locks = KeyLocks()
+
+
+# Names of months and weekdays (e.g. "jan", "january"), which dateutil parses as dates even without digits
+DATE_WORDS = frozenset(
+    name.lower() for names in parser.parserinfo.MONTHS + parser.parserinfo.WEEKDAYS for name in names
+)
+PATTERN_NON_LETTERS = re.compile(r"[^a-z]+")
+# Recordings of albums with these words in their name are skipped (e.g. compilations and live albums)
+SKIPPED_ALBUM_WORDS = ("hits", "live", "best")
+ALBUM_SKIP_REASONS_CACHE_SIZE = 4096
+
+# Scores of recordings, see score_recording
+SKIPPED_RECORDING_SCORE = 0
+SINGLE_RECORDING_SCORE = 1
+ALBUM_RECORDING_SCORE = 2
+
+
+def _get_id3_padding(info: PaddingInfo) -> int:
+    """Padding policy for saving tags - keeps the existing padding if the tags fit in place
+    (so the audio isn't rewritten), otherwise reserves ID3_PADDING_KB for future edits.
+    """
+    if info.padding >= 0:
+        return info.padding
+    return ID3_PADDING_KB * 1024
+
+
+def _may_contain_date(string: str) -> bool:
+    """Returns false if the string surely has no date in it (as parsed by dateutil, fuzzily), which is the case
+    when it has no digits and no names of months or weekdays. Checking that is much cheaper than parsing.
+    """
+    if any(char.isdigit() for char in string):
+        return True
+    return not DATE_WORDS.isdisjoint(PATTERN_NON_LETTERS.split(string.lower()))
 
 
 def extract_date_from_string(string: str) -> Optional[datetime.datetime]:
     """Returns a date written in a string if exists. Otherwise returns None."""
+    if not _may_contain_date(string):
+        return None
     try:
         date = parser.parse(string, fuzzy=True)
         return date
@@ -70,46 +123,12 @@ def get_title_suggestion(
     if band and song:
         title = band + " - " + song
 
-    suggested_title = title
-
-    # Swap colon (:) with hyphen (-)
-    if "-" not in suggested_title and ":" in suggested_title:
-        suggested_title = suggested_title.replace(":", "-")
-
-    # Remove illegal characters
-    suggested_title = " ".join(re.sub(PATTERN_ILLEGAL_CHARS, "", suggested_title).split()).strip()
-
-    # Remove parentheses (and content)
-    pattern1 = r"\([^)]*\)"
-    pattern2 = r"\[[^]]*\]"
-    suggested_title = " ".join(re.sub(pattern1, "", suggested_title).split()).strip()
-    suggested_title = " ".join(re.sub(pattern2, "", suggested_title).split()).strip()
-
-    # Dash whitespace
-    if suggested_title.find("-") >= 0:
-        pattern3 = r"\s?-\s?"
-        suggested_title = " ".join(re.sub(pattern3, " - ", suggested_title).split()).strip()
-
-    # Attempt to patch with channel name if possible
-    elif channel:
-        channel = channel.replace(" - Topic", "").replace(" official YouTube channel", "").replace(" Official YouTube Channel", "").replace(" YouTube Channel","").replace(" Official", "")
-        if channel == "IPrevailBand":
-            channel = "I Prevail"
-        elif channel == "starsetonline":
-            channel = "Starset"
-        elif channel == "ReoNa official YouTube channel":
-            channel = "ReoNa"
-        elif channel == "Aimer YouTube Channel":
-            channel = "Aimer"
-        elif channel == "EGOIST Official YouTube Channel":
-            channel = "EGOIST"
-        elif channel == "Ayase / YOASOBI":
-            channel = "YOASOBI"
-        suggested_title = channel + " - " + suggested_title
-
-    for s in STRINGS_TO_REMOVE:
-        suggested_title = suggested_title.replace(s, "")
-    suggested_title = suggested_title.strip()
+    decided_title = decisions.get_title(title, channel)
+    if decided_title is not None:
+        logger.debug("Using earlier decision for title %s: %s", title, decided_title)
+        return split_title(decided_title)
+
+    suggested_title = normalize_title(title, channel)
 
     should_update_title = True
     if interactive:  # and suggested_title != title:
@@ -130,19 +149,9 @@ def get_title_suggestion(
         assert isinstance(title_from_user, str)
         suggested_title = title_from_user
 
-    # Update fields
-    title = suggested_title
-    if suggested_title.count(" - ") == 1:
-        band, song = suggested_title.split(" - ")
-    elif suggested_title.count(" - ") >= 1:
-        band, *rest = suggested_title.split(" - ")
-        song = " - ".join(rest)
-    else:
-        band, song = "", ""
-
-    band = band.strip()
-    song = song.strip()
-    return band, song
+    if interactive:
+        decisions.set_title(title, channel, suggested_title)
+    return split_title(suggested_title)
 
 
 def get_title_from_path(file_path: str) -> str:
@@ -203,6 +212,22 @@ def get_suggested_recording_from_partial_metadata(
     return -1
 
 
+@functools.lru_cache(maxsize=ALBUM_SKIP_REASONS_CACHE_SIZE)
+def _get_album_skip_reason(album: str) -> str:
+    """Returns why recordings of an album should be skipped judging by its name, or an empty string if they shouldn't.
+    Cached, since the same albums come up for many songs.
+    """
+    album_lower = album.lower()
+    for word in SKIPPED_ALBUM_WORDS:
+        if word in album_lower:
+            return f"it contains {word}"
+
+    date_from_album = extract_date_from_string(album_lower)
+    if date_from_album:
+        return f"it contains date: {date_from_album}"
+    return ""
+
+
 def should_skip_recording(recording: ReleaseRecording) -> bool:
     """
     Returns true if and only if shouls skip the recording,
@@ -211,23 +236,10 @@ def should_skip_recording(recording: ReleaseRecording) -> bool:
     if recording.year == 0:
         logger.debug("Skipping %s because year == 0", recording.album)
         return True
-    if "hits" in recording.album.lower():
-        logger.debug("Skipping %s because it contains hits", recording.album)
-        return True
-    if "live" in recording.album.lower():
-        logger.debug("Skipping %s because it contains live", recording.album)
-        return True
-    if "best" in recording.album.lower():
-        logger.debug("Skipping %s because it contains best", recording.album)
-        return True
 
-    date_from_album = extract_date_from_string(recording.album.lower())
-    if date_from_album:
-        logger.debug(
-            "Skipping %s because it contains date: %s",
-            recording.album,
-            str(date_from_album),
-        )
+    skip_reason = _get_album_skip_reason(recording.album)
+    if skip_reason:
+        logger.debug("Skipping %s because %s", recording.album, skip_reason)
         return True
     if "promotion" in recording.status:
         logger.debug("Skipping %s because the status is promotional", recording.album)
@@ -236,8 +248,22 @@ def should_skip_recording(recording: ReleaseRecording) -> bool:
     return False
 
 
+def score_recording(recording: ReleaseRecording) -> int:
+    """Scores how likely a recording is to be the right one, regardless of the other recordings:
+    albums (ALBUM_RECORDING_SCORE) over singles and EPs (SINGLE_RECORDING_SCORE),
+    over recordings that should be skipped (SKIPPED_RECORDING_SCORE).
+    """
+    if should_skip_recording(recording):
+        return SKIPPED_RECORDING_SCORE
+    if recording.type in ("single", "ep"):
+        return SINGLE_RECORDING_SCORE
+    return ALBUM_RECORDING_SCORE
+
+
 def get_suggested_recording(recordings: List[ReleaseRecording], partial_metadata: Optional[MP3MetaData] = None) -> int:
     """Returns the index of a likely correct recording out of the recordings list using heurestics.
+    That's the first album, unless there's an earlier single (or EP) that was released at least 2 years before it.
+    If there's no album, that's the first single.
 
     Args:
         recordings (List[ReleaseRecording]): A sorted list (by year) of recordings to get suggestion from.
@@ -246,50 +272,89 @@ def get_suggested_recording(recordings: List[ReleaseRecording], partial_metadata
     Returns:
         int: Index of suggested recording, or -1 if there's no suggestion
     """
-    # TODO - Instead of linear scan, run 'min' with a function, give score according to heuristics
-    # e.g., year > 0 is worth 1000 points
-    #       title contains forbidden works (hits, best), negative 200 points
-    #       single, negative 10 points
-
     # Try to find an album that fits the existing partial metadata
     if partial_metadata:
         suggested_recording_index = get_suggested_recording_from_partial_metadata(recordings, partial_metadata)
         if suggested_recording_index >= 0:
             return suggested_recording_index
 
-    suggested_recording_index = -1
+    # Each recording is scored once, and the scan stops at the first album
     potential_single_index = -1
     for recording_index, recording in enumerate(recordings):
-        if should_skip_recording(recording):
-            continue
-
-        if recording.type in ("single", "ep"):
+        score = score_recording(recording)
+        if score == SINGLE_RECORDING_SCORE:
             logger.debug("Skipping %s because it's single/ep", recording.album)
             if potential_single_index == -1:
                 logger.debug("But remembering it in case there's no good album")
                 potential_single_index = recording_index
-            continue
-        # It's not uncommon for a song to be released as a single, labeled as album for some reason,
-        # and later that year to be released in a proper album.
-        # if (
-        #     recording.title.lower() in recording.album.lower()
-        #     and recording_index + 1 < len(recordings)
-        #     and recordings[recording_index + 1].year == recording.year
-        # ):
-        #     continue
-
-        if recording.year > 0:
+        elif score == ALBUM_RECORDING_SCORE:
+            # It's not uncommon for a song to be released as a single, labeled as album for some reason,
+            # and later that year to be released in a proper album.
+            # if (
+            #     recording.title.lower() in recording.album.lower()
+            #     and recording_index + 1 < len(recordings)
+            #     and recordings[recording_index + 1].year == recording.year
+            # ):
+            #     continue
+
             # Large gap between single and album release, likely that it's more well known as a single
             if potential_single_index >= 0 and recording.year - recordings[potential_single_index].year >= 2:
-                suggested_recording_index = potential_single_index
-            else:
-                suggested_recording_index = recording_index
-            break
-    return suggested_recording_index if suggested_recording_index >= 0 else potential_single_index
+                return potential_single_index
+            return recording_index
+    return potential_single_index
+
+
+def match_album_track(tracks: List[ReleaseRecording], title: str) -> Optional[ReleaseRecording]:
+    """Returns the track of an album (see music_api.get_album_tracks) with the given title, if exists"""
+    clean_title = _clean_title(title)
+    for track in tracks:
+        if _clean_title(track.title) == clean_title:
+            return track
+    return None
+
+
+def is_suggestion_ambiguous(recordings: List[ReleaseRecording], suggested_recording_index: int) -> bool:
+    """Returns true if and only if the suggested recording should be reviewed by a human.
+    That's the case when there's no suggestion, or when another (non-skipped) candidate
+    of the same type and year belongs to a different album.
+
+    Args:
+        recordings (List[ReleaseRecording]): The recordings the suggestion was made from.
+        suggested_recording_index (int): Index of the suggested recording, as returned from get_suggested_recording.
+    """
+    if not 0 <= suggested_recording_index < len(recordings):
+        return True
+
+    suggested = recordings[suggested_recording_index]
+    for recording in recordings:
+        if (
+            recording.album != suggested.album
+            and recording.year == suggested.year
+            and recording.type == suggested.type
+            and not should_skip_recording(recording)
+        ):
+            logger.debug("Suggestion %s is ambiguous with %s", suggested, recording)
+            return True
+    return False
 
 
 class MP3MetaData:  # pylint: disable=E0102,R0917
-    """Class that represents mp3 metadata."""
+    """Class that represents mp3 metadata.
+    Slotted, and strings that repeat across the files of a library (artist, album, genre and artwork) are interned.
+    """
+
+    __slots__ = (
+        "band",
+        "song",
+        "album",
+        "year",
+        "track",
+        "genre",
+        "file_name",
+        "art_path",
+        "art_configured",
+        "release_group_id",
+    )
 
     def __init__(
         self,
@@ -304,16 +369,16 @@ class MP3MetaData:  # pylint: disable=E0102,R0917
         art_configured: bool = False,
         release_group_id: str = "",
     ):
-        self.band = band
+        self.band = intern_string(band)
         self.song = song
-        self.album = album
+        self.album = intern_string(album)
         self.year = year
         self.track = track
-        self.genre = genre
+        self.genre = intern_string(genre)
         self.file_name = file_name
-        self.art_path = art_path
+        self.art_path = intern_string(art_path)
         self.art_configured = art_configured
-        self.release_group_id = release_group_id
+        self.release_group_id = intern_string(release_group_id)
 
     @classmethod
     def from_file(cls, file_path: str, interactive: bool = False, extract_image: bool = False):
@@ -330,34 +395,8 @@ class MP3MetaData:  # pylint: disable=E0102,R0917
         assert file_path.endswith(".mp3")
         assert isfile(file_path), f"File not found: {file_path}"
 
-        try:
-            mp3_file = music_tag.load_file(file_path)
-        except Exception:  # pylint: disable=broad-exception-caught
-            mp3_file = dict()
-
         album_artwork_path = ""
-        if not mp3_file or mp3_file is None:
-            song, band, album, year, track, album_art, art_configured = (
-                "",
-                "",
-                "",
-                0,
-                0,
-                "",
-                False,
-            )
-        else:
-            song = cls.mp3_file_get_as_str(mp3_file, "title").strip()
-            band = cls.mp3_file_get_as_str(mp3_file, "artist").strip()
-            album = cls.mp3_file_get_as_str(mp3_file, "album").strip()
-            year = int(cls.mp3_file_get_as_str(mp3_file, "year"))
-            track = int(cls.mp3_file_get_as_str(mp3_file, "tracknumber"))
-
-            try:
-                album_art = mp3_file.get("artwork")
-            except Exception:
-                album_art = None
-            art_configured = bool(album_art)
+        song, band, album, year, track, album_art, art_configured = cls._read_tags(file_path, extract_image)
 
         # Patch band and song
         if not (song and band):
@@ -373,7 +412,10 @@ class MP3MetaData:  # pylint: disable=E0102,R0917
 
         # Attempt patching album art
         if album_art:
-            album_artwork_path, _ = get_album_artwork_path(band, song, album)
+            album_artwork_path, name_for_art = get_album_artwork_path(band, song, album)
+            album_artwork_path = (
+                artwork_store.get_path_by_alias(artwork_alias(band, name_for_art)) or album_artwork_path
+            )
 
             # Extract image if it's not in the IMG DIR
             if extract_image and not isfile(album_artwork_path) and isinstance(album_art, music_tag.file.MetadataItem):
@@ -424,6 +466,20 @@ class MP3MetaData:  # pylint: disable=E0102,R0917
         """Get title (band - song)"""
         return self.band + " - " + self.song
 
+    def tag_digest(self) -> str:
+        """Returns a digest of the metadata fields that are written as tags (used to detect changes in tags)"""
+        has_art = bool(self.art_configured or self.art_path)
+        fields = (self.band, self.song, self.album, str(self.year), str(self.track), self.genre, str(has_art))
+        return hashlib.sha1("\0".join(fields).encode("utf-8"), usedforsecurity=False).hexdigest()
+
+    def is_resolved(self, with_album_art: bool = False) -> bool:
+        """Returns true if the album metadata (album, year and track) is set,
+        and if `with_album_art` is set to True, the album art as well
+        """
+        if not (self.album and self.year and self.track):
+            return False
+        return not with_album_art or bool(self.art_configured or self.art_path)
+
     def update_fields_from_recording(self, recording: Optional[ReleaseRecording] = None, full_update: bool = True):
         """
         If recording is given, updates year, album, track from it.
@@ -476,8 +532,14 @@ Skip?""",
             if should_use_existing_metadata:
                 return
 
-        # Get recording candidates
         artist, title = self.band, self.song
+        has_decision, decided_recording = decisions.get_recording(artist, title)
+        if has_decision:
+            logger.debug("Using earlier decision for %s: %s", self.title, decided_recording)
+            self.update_fields_from_recording(decided_recording, False)
+            return
+
+        # Get recording candidates
         recordings = get_track_info(artist, title)
 
         # Sort by release year (main), and by length of album (secondary)
@@ -493,19 +555,29 @@ Skip?""",
             return
         print_suggestions(recordings, artist, title, suggested_album_index)
         chosen_recording = choose_recording(recordings, suggested_album_index, title)
+        decisions.set_recording(artist, title, chosen_recording)
         if chosen_recording is not None:
             self.update_fields_from_recording(chosen_recording, False)
 
         logger.debug("Album: %s, year: %d, track: %d", self.album, self.year, self.track)
 
-    def update_album_art(self, album_artwork_path: Optional[str] = None, force_download: bool = False):
+    def update_album_art(
+        self,
+        album_artwork_path: Optional[str] = None,
+        force_download: bool = False,
+        *,
+        failed_release_groups: Optional[Set[str]] = None,
+    ):
         """
         Updates album artwork path. Downloads the artwork if necessary.
-        The album_artwork_path is infered from the artist and song/album, unless provided explicitly.
-        The default path is <IMG DIR>/<artist> - <album/song>.png
+        Unless album_artwork_path is provided explicitly, the artwork is kept in the artwork store
+        (<IMG DIR>/by-hash/<sha1>.<format>), so each distinct image is downloaded and stored once.
         Args:
             album_artwork_path (str, optional): The path of the album artwork. Defaults to None.
             force_download (bool, optional): Download the album artwork even if it exists. Defaults to False.
+            failed_release_groups (Set[str], optional): Release groups whose artwork failed to download during the
+                                                        current run, which aren't retried unless force_download is
+                                                        set. Shared by the files of a run. Defaults to None.
         """
         logger.debug("[update_album_art] Called with album name %s, band name %s", self.album, self.band)
         if not self.band:
@@ -515,17 +587,85 @@ Skip?""",
         if not (self.album or self.song):
             logger.debug("[update_album_art] no album and no song, returning")
             return
-        if album_artwork_path is None:
-            album_artwork_path, name_for_art = get_album_artwork_path(self.band, self.song, self.album)
-            logger.debug("Generated album artwork path: %s. Name for art: %s", album_artwork_path, name_for_art)
 
+        default_artwork_path, name_for_art = get_album_artwork_path(self.band, self.song, self.album)
+        if album_artwork_path is not None:
+            self._download_album_art(album_artwork_path, name_for_art, force_download)
+            return
+
+        # The artwork is kept in the artwork store, under aliases of the album and its release group
+        aliases = [artwork_alias(self.band, name_for_art)]
+        release_group_id = self.release_group_id
+        if release_group_id:
+            aliases.insert(0, release_group_alias(release_group_id))
+
+        if not force_download and self._use_stored_album_art(default_artwork_path, aliases):
+            return
+
+        if not release_group_id:
+            release_group_id = get_release_group_id(self.band, name_for_art)
+            if release_group_id is None:
+                logger.debug("Couldn't find release group for '%s - %s'", self.band, name_for_art)
+                return
+            aliases.insert(0, release_group_alias(release_group_id))
+
+        self._download_release_group_art(release_group_id, aliases, force_download, failed_release_groups)
+
+    def _use_stored_album_art(self, default_artwork_path: str, aliases: List[str]) -> bool:
+        """Sets the art path to the stored artwork of any of the aliases, if there's one.
+        Artwork that was downloaded to default_artwork_path before the artwork store existed is moved into it.
+
+        Returns:
+            bool: Whether the art path was set
+        """
+        stored_path = artwork_store.get_path_by_alias(*aliases)
+        if stored_path is None and isfile(default_artwork_path):
+            stored_path = artwork_store.put_file(default_artwork_path, aliases)
+        if stored_path is None:
+            return False
+
+        logger.debug("Using stored album art %s", stored_path)
+        self.art_path = stored_path
+        return True
+
+    def _download_release_group_art(
+        self,
+        release_group_id: str,
+        aliases: List[str],
+        force_download: bool,
+        failed_release_groups: Optional[Set[str]],
+    ):
+        """Downloads the artwork of a release group into the artwork store (under the aliases), and sets the art path.
+        Songs of the same album share the download of its artwork, unless force_download is set.
+        """
+        with _artwork_download_locks(release_group_id):
+            if not force_download:
+                stored_path = artwork_store.get_path_by_alias(aliases[0])
+                if stored_path is not None:
+                    logger.debug("Using stored album art %s", stored_path)
+                    artwork_store.add_aliases(basename(stored_path), aliases[1:])
+                    self.art_path = stored_path
+                    return
+                if failed_release_groups is not None and release_group_id in failed_release_groups:
+                    logger.debug("Album art of release group %s failed to download, not retrying", release_group_id)
+                    return
+
+            download_path = os.path.join(TMP_DIR, f"{release_group_id}.{threading.get_ident()}.png")
+            download_album_artwork_from_release_id(release_group_id, download_path)
+            if isfile(download_path):
+                self.art_path = artwork_store.put_file(download_path, aliases, remove_source=True)
+            elif failed_release_groups is not None:
+                failed_release_groups.add(release_group_id)
+
+    def _download_album_art(self, album_artwork_path: str, name_for_art: str, force_download: bool):
+        """Downloads the album artwork to the given path (unless it exists), and sets the art path if it succeeded"""
         if not isfile(album_artwork_path) or force_download:
             if not isfile(album_artwork_path):
                 logger.debug("Album art %s not found. downloading", album_artwork_path)
             if force_download:
                 logger.debug("Force downloading %s", album_artwork_path)
 
-            if hasattr(self, "release_group_id") and self.release_group_id:
+            if self.release_group_id:
                 download_album_artwork_from_release_id(self.release_group_id, album_artwork_path)
             elif name_for_art:
                 download_album_artwork(self.band, name_for_art, filepath=album_artwork_path)
@@ -536,47 +676,71 @@ Skip?""",
         if isfile(album_artwork_path):
             self.art_path = album_artwork_path
 
-    def apply_on_file(self, file_path: str):
-        """Applies metadata on a file - updates metadata fields according to the class attributes
+    def get_tags(self) -> Dict[str, Union[str, int]]:
+        """Returns the tags that are written to files (by their music_tag names), for the fields that are set"""
+        tags: Dict[str, Union[str, int]] = {}
+        if self.song:
+            tags["title"] = self.song
+
+        if self.band:
+            tags["artist"] = self.band
+            tags["albumartist"] = self.band
+
+        if self.year:
+            tags["year"] = self.year
+
+        if self.album:
+            tags["album"] = self.album
+
+        if self.track:
+            tags["tracknumber"] = self.track
+        return tags
+
+    def apply_on_file(self, file_path: str) -> bool:
+        """Applies metadata on a file - updates metadata fields according to the class attributes.
+        The file is saved only if its tags (or artwork) are different from the class attributes.
 
         Args:
             file_path (str): The path to the file
+
+        Returns:
+            bool: Whether the file was saved
         """
         if not isfile(file_path):
             logger.error("File not found: %s", file_path)
-            return
+            return False
 
         mp3_file = music_tag.load_file(file_path)
         if not mp3_file:
             logger.error("Failed to load %s", file_path)
-            return
+            return False
 
         assert isinstance(mp3_file, music_tag.id3.Mp3File), "Expected music_tag.id3.Mp3File file, actually got" + str(
             type(mp3_file)
         )
 
-        if self.song:
-            mp3_file["title"] = self.song
-
-        if self.band:
-            mp3_file["artist"] = self.band
-            mp3_file["albumartist"] = self.band
-
-        if self.year:
-            mp3_file["year"] = self.year
-
-        if self.album:
-            mp3_file["album"] = self.album
-
-        if self.track:
-            mp3_file["tracknumber"] = self.track
-
-        if self.art_path:
-            with open(self.art_path, "rb") as img:
-                mp3_file["artwork"] = img.read()
+        tags = self.get_tags()
+        changed_tags = [key for key, value in tags.items() if self.mp3_file_get_as_str(mp3_file, key) != str(value)]
+        for key in changed_tags:
+            mp3_file[key] = tags[key]
+
+        is_artwork_changed = False
+        artwork = artwork_store.read(self.art_path) if self.art_path else None
+        if self.art_path and artwork is None:
+            logger.warning("Album artwork %s not found", self.art_path)
+        if artwork is not None:
+            if self.mp3_file_get_artwork_digest(mp3_file) != artwork.digest:
+                mp3_file["artwork"] = artwork.data
+                is_artwork_changed = True
                 logger.debug("Updated album artwork from %s", self.art_path)
 
-        mp3_file.save()
+        if not (changed_tags or is_artwork_changed):
+            logger.debug("Metadata of %s is up to date", file_path)
+            return False
+
+        logger.debug("Saving %s, changed: %s", file_path, changed_tags + (["artwork"] if is_artwork_changed else []))
+        mp3_file.save(padding=_get_id3_padding)
+        return True
 
     def __repr__(self):
         if self.song and self.band:
@@ -588,6 +752,45 @@ Skip?""",
             return self.band + " - " + self.song
         return "Bad song"
 
+    @classmethod
+    def _read_tags(cls, file_path: str, extract_image: bool = False) -> tuple:
+        """Reads the tags of a file with the fast ID3 reader, falling back to music_tag.
+
+        Args:
+            file_path (str): The path of the file.
+            extract_image (bool, optional): Whether the artwork will be extracted, which requires music_tag.
+                                            Defaults to False.
+
+        Returns:
+            tuple: The song, band, album, year, track, album art and whether the album art is configured.
+        """
+        # The fast reader doesn't load the artwork, so it can't be used to extract it
+        tags = None if extract_image else read_id3_tags(file_path)
+        if tags is not None:
+            return tags.title, tags.artist, tags.album, tags.year, tags.track, tags.has_artwork, tags.has_artwork
+
+        try:
+            mp3_file = music_tag.load_file(file_path)
+        except Exception:  # pylint: disable=broad-exception-caught
+            mp3_file = dict()
+
+        if not mp3_file or mp3_file is None:
+            return "", "", "", 0, 0, "", False
+
+        try:
+            album_art = mp3_file.get("artwork")
+        except Exception:
+            album_art = None
+        return (
+            cls.mp3_file_get_as_str(mp3_file, "title").strip(),
+            cls.mp3_file_get_as_str(mp3_file, "artist").strip(),
+            cls.mp3_file_get_as_str(mp3_file, "album").strip(),
+            int(cls.mp3_file_get_as_str(mp3_file, "year")),
+            int(cls.mp3_file_get_as_str(mp3_file, "tracknumber")),
+            album_art,
+            bool(album_art),
+        )
+
     @staticmethod
     def mp3_file_get_as_str(mp3_file: dict, key: str) -> str:
         """type checker on dict for mp3_file library"""
@@ -597,6 +800,17 @@ Skip?""",
 
         return str(value.value)
 
+    @staticmethod
+    def mp3_file_get_artwork_digest(mp3_file: dict) -> Optional[bytes]:
+        """Returns the SHA-1 digest of the artwork embedded in mp3_file, or None if there's no artwork"""
+        try:
+            artworks = mp3_file.get("artwork").values
+        except Exception:  # pylint: disable=broad-exception-caught
+            return None
+        if not artworks:
+            return None
+        return hashlib.sha1(artworks[0].raw, usedforsecurity=False).digest()
+
     @staticmethod
     def extract_album_info_from_path(file_path: str) -> Optional[Tuple[str, str, int]]:
         """Tries to get album info from a path to a file.
@@ -615,7 +829,7 @@ Skip?""",
         if not path_match:
             return None
 
-        grandparent_directory = basename(dirname(parent_directory))
+        grandparent_directory = basename(dirname(parent_directory_path))
         return (
             grandparent_directory,
             path_match.group("album"),
@@ -639,6 +853,123 @@ Skip?""",
 # TODO - use this to load metadata if exists, and process song name (DECO)
 
 
+class FileUpdateResult:
+    """Result of updating the metadata of a single file (see update_metadata_for_directory)"""
+
+    def __init__(
+        self,
+        file_path: str,
+        metadata: Optional[MP3MetaData] = None,
+        error: Optional[Exception] = None,
+        skipped: bool = False,
+    ):
+        self.file_path = file_path
+        self.metadata = metadata
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the metadata was updated successfully"""
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is not None:
+            return f"{self.file_path}: failed ({self.error})"
+        if self.skipped:
+            return f"{self.file_path}: unchanged since last run"
+        return f"{self.file_path}: {self.metadata}"
+
+
+def read_tag_digest(file_path: str) -> str:
+    """Returns the tag digest of an mp3 file, as it's currently tagged (see MP3MetaData.tag_digest)"""
+    return MP3MetaData.from_file(file_path).tag_digest()
+
+
+class _DirectoryUpdate:
+    """Options and shared state of a single update_metadata_for_directory run"""
+
+    def __init__(  # pylint: disable=R0917
+        self,
+        interactive: bool,
+        keep_current_metadata: bool,
+        update_album_art: bool,
+        force_download_album_art: bool,
+        full_pass: bool,
+        by_album: bool,
+    ) -> None:
+        self.interactive = interactive
+        self.keep_current_metadata = keep_current_metadata
+        self.update_album_art = update_album_art
+        self.force_download_album_art = force_download_album_art
+        self.full_pass = full_pass
+        self.by_album = by_album
+        self.options = run_options(
+            interactive=interactive,
+            keep_current_metadata=keep_current_metadata,
+            update_album_art=update_album_art,
+            force_download_album_art=force_download_album_art,
+            by_album=by_album,
+        )
+        self._album_tracks: Dict[str, List[ReleaseRecording]] = {}
+        self._album_locks = KeyLocks()
+        self._failed_release_groups: Set[str] = set()
+
+    def get_album_tracks(self, file_path: str) -> Optional[List[ReleaseRecording]]:
+        """Returns the track list of the album of the file's directory (resolved once per directory)"""
+        album_info = MP3MetaData.extract_album_info_from_path(file_path)
+        if not (self.by_album and album_info and album_info[0]):
+            return None
+        directory = dirname(file_path)
+        with self._album_locks(directory):
+            if directory not in self._album_tracks:
+                self._album_tracks[directory] = get_album_tracks(*album_info)
+        return self._album_tracks[directory]
+
+    def update_file(self, file_path: str) -> FileUpdateResult:
+        """Updates a file, unless it hasn't changed since it was last processed (see library_manifest)"""
+        try:
+            if not self.full_pass and library_manifest.is_unchanged(file_path, self.options, read_tag_digest):
+                return FileUpdateResult(file_path, skipped=True)
+            metadata = update_metadata_for_file(
+                file_path,
+                self.interactive,
+                self.keep_current_metadata,
+                self.update_album_art,
+                self.force_download_album_art,
+                album_tracks=self.get_album_tracks(file_path),
+                failed_release_groups=self._failed_release_groups,
+            )
+            # Files that weren't resolved are processed again on the next run
+            if metadata.is_resolved(with_album_art=self.update_album_art):
+                library_manifest.record(file_path, metadata.tag_digest(), metadata.release_group_id, self.options)
+            return FileUpdateResult(file_path, metadata=metadata)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            return FileUpdateResult(file_path, error=err)
+
+
+def _map_in_order(
+    function: Callable[[str], FileUpdateResult], file_paths: List[str], jobs: int
+) -> Iterator[FileUpdateResult]:
+    """Yields the result of the function on each file, in the order of the files.
+    With a single job, files are processed on the calling thread (so interactive prompts are too).
+    """
+    if jobs <= 1:
+        yield from map(function, file_paths)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(function, file_paths)
+
+
+def _log_update_result(result: FileUpdateResult):
+    if result.skipped:
+        logger.debug("Skipping %s, unchanged since last run", result.file_path)
+    elif result.succeeded:
+        logger.debug("Updated metadata for %s (%s)", result.file_path, result.metadata)
+    else:
+        logger.error("Failed to update metadata for %s: %s", result.file_path, result.error)
+
+
 def update_metadata_for_directory(  # pylint: disable=R0917
     base_path: str,
     interactive: bool = True,
@@ -646,7 +977,10 @@ def update_metadata_for_directory(  # pylint: disable=R0917
     recursive: bool = False,
     force_download_album_art: bool = False,
     keep_current_metadata: bool = False,
-):
+    jobs: int = 1,
+    full_pass: bool = False,
+    by_album: bool = False,
+) -> List[FileUpdateResult]:
     """Updates mp3 metadata of files in a directory.
 
     Args:
@@ -657,17 +991,45 @@ def update_metadata_for_directory(  # pylint: disable=R0917
         force_download_album_art (bool, optional): Downloads album art even if already exists. Defaults to False.
                                                    Relevant only if `update_album_art` is set to True
         keep_current_metadata (bool, optional): Doesn't overwrite metadata if exists. Defaults to False
+        jobs (int, optional): Number of files to process in parallel. Only supported in non-interactive mode
+                              (in interactive mode, files are processed one by one on the calling thread).
+                              Defaults to 1.
+        full_pass (bool, optional): Process all files, including files that haven't changed since they were last
+                                    processed (according to the library manifest). Defaults to False.
+        by_album (bool, optional): Resolve album directories (`<ARTIST>/<ALBUM> (<YEAR>)/`) once, using the track
+                                   list of the album, instead of looking up each file on its own.
+                                   Files that aren't on the track list are looked up as usual. Defaults to False.
+
+    Returns:
+        List[FileUpdateResult]: Result per file, in the order the files were found
     """
     if not os.path.isdir(base_path):
         logger.error("Provided base path %s is not an existing directory", base_path)
         sys.exit(1)
 
-    paths = Path(base_path).rglob("*.mp3") if recursive else Path(base_path).glob("*.mp3")
+    if interactive and jobs > 1:
+        logger.warning("Parallel processing isn't supported in interactive mode, processing files one by one")
+        jobs = 1
 
-    for path in paths:
-        update_metadata_for_file(
-            str(path.absolute()), interactive, keep_current_metadata, update_album_art, force_download_album_art
-        )
+    paths = Path(base_path).rglob("*.mp3") if recursive else Path(base_path).glob("*.mp3")
+    file_paths = [str(path.absolute()) for path in paths]
+    run = _DirectoryUpdate(
+        interactive, keep_current_metadata, update_album_art, force_download_album_art, full_pass, by_album
+    )
+
+    results = []
+    # Results (and their logs) are handled in the order of the files, regardless of which finishes first
+    for result in _map_in_order(run.update_file, file_paths, jobs):
+        _log_update_result(result)
+        results.append(result)
+
+    logger.info(
+        "Updated metadata for %d/%d files (%d unchanged)",
+        sum(1 for result in results if result.succeeded and not result.skipped),
+        len(results),
+        sum(1 for result in results if result.skipped),
+    )
+    return results
 
 
 def update_metadata_for_file(
@@ -676,18 +1038,35 @@ def update_metadata_for_file(
     keep_current_metadata: bool = False,
     update_album_art: bool = False,
     force_download_album_art: bool = False,
-):
+    *,
+    album_tracks: Optional[List[ReleaseRecording]] = None,
+    failed_release_groups: Optional[Set[str]] = None,
+) -> MP3MetaData:
     """
     Updates metadata for a single file.
-    Intended to run on file that has full metadata fields set, with the only exception being the album art
+    Intended to run on file that has full metadata fields set, with the only exception being the album art.
+    If the track list of the file's album is given (see music_api.get_album_tracks), and the file is on it,
+    the album, year and track are taken from it without looking up the file.
+    Release groups whose album art failed to download (see MP3MetaData.update_album_art) are added to
+    failed_release_groups, if it's given, and the files of a run share it so the download isn't retried.
+
+    Returns:
+        MP3MetaData: The metadata that was applied on the file
     """
     logger.debug("Getting metadata from %s", file_path)
     metadata = MP3MetaData.from_file(file_path, interactive)
-    metadata.update_missing_fields(interactive, keep_current_metadata)
+    album_track = match_album_track(album_tracks, metadata.song) if album_tracks else None
+    has_full_metadata = metadata.album and metadata.year and metadata.track
+    if album_track is not None and not (keep_current_metadata and has_full_metadata):
+        logger.debug("Found %s on the track list of %s", metadata.song, album_track.album)
+        metadata.update_fields_from_recording(album_track, full_update=False)
+    else:
+        metadata.update_missing_fields(interactive, keep_current_metadata)
     if update_album_art:
-        metadata.update_album_art(force_download=force_download_album_art)
+        metadata.update_album_art(force_download=force_download_album_art, failed_release_groups=failed_release_groups)
         logger.debug("Album art path: %s", metadata.art_path)
     metadata.apply_on_file(file_path)
+    return metadata
 
 
 def update_image_for_file(file_path: str, interactive: bool = False):
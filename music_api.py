@@ -1,16 +1,40 @@
 """Funtions to extract data from the musicbrainz API, such as an album given a song and a band"""
 
+import functools
 import logging
 import re
 import sys
+import threading
 import time
-from collections import Counter
-from typing import Any, List, Optional
+from os.path import join
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
 
 import requests
-
-from config import EMAIL_ADDRESS, ENABLE_STRICT_FILTER, IS_DEBUG, TEST_DOWNLOAD_PATH
+from requests.adapters import HTTPAdapter
+
+from config import (
+    CACHE_DIR,
+    EMAIL_ADDRESS,
+    ENABLE_STRICT_FILTER,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_TIMEOUT,
+    IS_DEBUG,
+    MUSICBRAINZ_BURST,
+    MUSICBRAINZ_RATE_LIMIT,
+    MUSICBRAINZ_SEARCH_LIMIT,
+    MUSICBRAINZ_SEARCH_MAX_PAGES,
+    NEGATIVE_CACHE_TTL_HOURS,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_MB,
+    TEST_DOWNLOAD_PATH,
+)
 from file_operations import save_response_as_json
+from kv_store import KeyValueStore
+from request_scheduler import RequestScheduler, TokenBucket
+from response_cache import MissEntry, NegativeCache, ResponseCache
 
 logging.basicConfig()
 logger = logging.getLogger("XP3")
@@ -23,36 +47,111 @@ if EMAIL_ADDRESS == "your-mail@mail.com":
 
 headers = {"User-Agent": f"XPrimental/0.0.1 ( {EMAIL_ADDRESS} )"}
 
+response_cache = ResponseCache(
+    join(CACHE_DIR, "responses.sqlite3"),
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+    enabled=RESPONSE_CACHE_ENABLED,
+    negative_ttl=NEGATIVE_CACHE_TTL_HOURS * 60 * 60,
+)
+# Tracks (and artists) that weren't found, so they aren't looked up again on every run
+negative_cache = NegativeCache(
+    join(CACHE_DIR, "misses.sqlite3"), ttl=NEGATIVE_CACHE_TTL_HOURS * 60 * 60, enabled=RESPONSE_CACHE_ENABLED
+)
+
+# Every request to MusicBrainz waits for its turn here, see request_scheduler.request_priority for priorities
+request_scheduler = RequestScheduler(
+    TokenBucket(MUSICBRAINZ_RATE_LIMIT, MUSICBRAINZ_BURST, db_path=join(CACHE_DIR, "rate_limit.sqlite3"))
+)
+RATE_LIMITED_HOSTS = ("musicbrainz.org",)
+
+# MusicBrainz ID of each artist name (as it's spelled in titles), filled by fallback searches.
+# Can be shared between libraries with artist_ids.export(...) and artist_ids.load(...)
+artist_ids = KeyValueStore(join(CACHE_DIR, "artist_ids.sqlite3"))
+
+# Release group of each (artist, album), so each album is looked up once
+release_group_ids = KeyValueStore(join(CACHE_DIR, "release_groups.sqlite3"))
+
+# The adapter holds the keep-alive connection pools (one per host), and is safe to share between threads.
+# Sessions aren't, so each thread gets its own session on top of the shared adapter.
+_http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+_thread_local = threading.local()
+
+
+def configure_session(pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE):
+    """Replaces the shared connection pools with pools of the given sizes.
+    Each thread switches to the new pools on its next request.
 
-def _get_request(url: str, max_retries: int = 3, initial_delay: float = 0.5):
-    """Performs GET request to a URL with retry logic for transient errors
+    Args:
+        pool_connections (int): Number of hosts to keep connection pools for.
+        pool_maxsize (int): Maximum number of connections kept alive per host.
+    """
+    global _http_adapter  # pylint: disable=global-statement
+    _http_adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+
+def get_session() -> requests.Session:
+    """Returns the HTTP session of the current thread, which uses the shared connection pools"""
+    session = getattr(_thread_local, "session", None)
+    if session is None or getattr(_thread_local, "adapter", None) is not _http_adapter:
+        session = requests.Session()
+        session.headers.update(headers)
+        session.mount("https://", _http_adapter)
+        session.mount("http://", _http_adapter)
+        _thread_local.session = session
+        _thread_local.adapter = _http_adapter
+    return session
+
+
+def _get_request(  # pylint: disable=R0917
+    url: str,
+    max_retries: int = 3,
+    initial_delay: float = 0.5,
+    use_cache: bool = True,
+    timeout: float = HTTP_TIMEOUT,
+):
+    """Performs GET request to a URL with retry logic for transient errors.
+    Successful responses are stored in (and served from) the persistent response cache.
+    Requests to MusicBrainz are rate limited by `request_scheduler`.
 
     Args:
         url (str): The URL to GET
         max_retries (int): Maximum number of retry attempts (default: 3)
         initial_delay (float): Initial delay in seconds before first retry (default: 0.5)
+        use_cache (bool): Whether to use the response cache. If False, the cache is bypassed (default: True)
+        timeout (float): Timeout in seconds of each attempt (default: HTTP_TIMEOUT from config)
 
     Returns: A JSON of the response
-    
+
     Raises:
         requests.exceptions.RequestException: If all retries fail
     """
+    if use_cache:
+        data = response_cache.get(url)
+        if data is not None:
+            return data
 
     # User-Agent header (because they requested nicely)
 
     # API request with retry logic
     logger.debug("Sending GET request to %s", url)
-    
+
+    is_rate_limited = urlsplit(url).hostname in RATE_LIMITED_HOSTS
     for attempt in range(max_retries + 1):
         try:
-            response = requests.get(url, headers=headers, timeout=3)
+            if is_rate_limited:
+                request_scheduler.acquire()
+            response = get_session().get(url, timeout=timeout)
+            if response.status_code == 503:
+                # MusicBrainz responds with 503 when it throttles the client
+                raise requests.exceptions.HTTPError(f"503 Service Unavailable for {url}", response=response)
             data = response.json()
+            if use_cache and response.status_code == 200:
+                response_cache.set(url, data)
             return data
-        except (requests.exceptions.ConnectionError, 
-                requests.exceptions.Timeout,
-                requests.exceptions.HTTPError) as e:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
             if attempt < max_retries:
-                delay = initial_delay * (2 ** attempt)  # Exponential backoff
+                delay = initial_delay * (2**attempt)  # Exponential backoff
                 logger.warning(
                     f"Request failed (attempt {attempt + 1}/{max_retries + 1}): {type(e).__name__}. "
                     f"Retrying in {delay:.1f}s..."
@@ -63,16 +162,41 @@ def _get_request(url: str, max_retries: int = 3, initial_delay: float = 0.5):
                 raise
 
 
+PATTERN_TITLE_CHARS_TO_REMOVE = re.compile(r'[\\/:*?"<>|\'’]')
+
+
 def _clean_title(title: str) -> str:
-    return " ".join(re.sub(r'[\\/:*?"<>|\'’]', "", title).split()).strip().lower()
+    return " ".join(PATTERN_TITLE_CHARS_TO_REMOVE.sub("", title).split()).lower()
 
 
 def _is_english(text):
     return all(ord(char) < 128 for char in text)  # ASCII range
 
 
+def intern_string(value: Any) -> Any:
+    """Interns a string, so equal strings share a single object. Other values (such as a boolean from
+    get_user_input) are returned as they are
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class ReleaseRecording:
-    """Class that represents a recording in MusicBrainz"""
+    """Class that represents a recording in MusicBrainz.
+    Slotted, and strings that repeat across recordings (such as artist, album, type and status) are interned,
+    since a search can have thousands of releases.
+    """
+
+    __slots__ = (
+        "album",
+        "year",
+        "artist",
+        "track",
+        "type",
+        "title",
+        "status",
+        "album_art_path",
+        "release_group_id",
+    )
 
     def __init__(  # pylint: disable=R0917
         self,
@@ -86,15 +210,15 @@ class ReleaseRecording:
         album_art_path: str = "",
         release_group_id: str = "",
     ) -> None:
-        self.album = album
+        self.album = intern_string(album)
         self.year = year
-        self.artist = artist
+        self.artist = intern_string(artist)
         self.track = track
-        self.type = r_type.lower()
-        self.title = title
-        self.status = status.lower()
+        self.type = intern_string(r_type.lower())
+        self.title = intern_string(title)
+        self.status = intern_string(status.lower())
         self.album_art_path = album_art_path
-        self.release_group_id = release_group_id
+        self.release_group_id = intern_string(release_group_id)
 
     def __eq__(self, other):
         return (
@@ -126,11 +250,15 @@ def get_album_candidates(json_data: Any, artist: str, title: str) -> List[Releas
     Returns:
         List[ReleaseRecording]: List of ReleaseRecording with possible candidates for album track info.
     """
-    albums = []
-
     if "recordings" not in json_data:
         return []
 
+    altered_title = _clean_title(title)
+    lower_artist = artist.lower()
+    # Distinct candidates (equal as in ReleaseRecording.__eq__), each with the number of releases it appeared in.
+    # Albums that appear more get more weight
+    candidates: Dict[Tuple[str, int, str, str, int], List[Any]] = {}
+
     recording_info = json_data["recordings"]
     logger.debug("Received %d recordings", len(recording_info))
     for recording in recording_info:
@@ -138,7 +266,6 @@ def get_album_candidates(json_data: Any, artist: str, title: str) -> List[Releas
         received_artist = recording.get("artist-credit", [{}])[0].get("artist", {}).get("name", "Unknown")
 
         altered_received_title = _clean_title(received_title)
-        altered_title = _clean_title(title)
 
         # TODO - check if strings are close instead
         if altered_received_title != altered_title:
@@ -147,7 +274,7 @@ def get_album_candidates(json_data: Any, artist: str, title: str) -> List[Releas
                 continue
 
         # TODO - check if strings are close instead
-        if received_artist.lower() != artist.lower():
+        if received_artist.lower() != lower_artist:
             if ENABLE_STRICT_FILTER or _is_english(received_artist):
                 logger.debug("Skipping because of artist mismatch (%s != %s)", artist, received_artist)
                 continue
@@ -157,27 +284,205 @@ def get_album_candidates(json_data: Any, artist: str, title: str) -> List[Releas
         release_list = recording.get("releases", [])
         logger.debug("Received %d releases", len(release_list))
         for release in release_list:
-            if not release.get("title"):
-                continue
+            _add_release_candidate(candidates, release, received_artist, received_title)
+
+    ranked = sorted(
+        candidates.values(),
+        key=lambda candidate: (-candidate[1], candidate[0].album, candidate[0].year, candidate[0].track),
+    )
+    return [release for release, _ in ranked]
+
+
+def lucene_phrase(value: str) -> str:
+    """Quotes a value as a Lucene phrase (e.g. `Wake Up` -> `"Wake Up"`), so it's matched as a whole.
+    Backslashes and quotes are escaped, other operators have no meaning within a phrase.
+    """
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def search_query(**fields: str) -> str:
+    """Builds a Lucene query that matches all the fields, each as a phrase (e.g. `artist:"Skillet" AND ...`)"""
+    return " AND ".join(f"{field}:{lucene_phrase(value)}" for field, value in fields.items())
+
+
+def _search_url(entity: str, query: str, limit: int = MUSICBRAINZ_SEARCH_LIMIT, offset: int = 0) -> str:
+    params = {"query": query, "limit": limit, "offset": offset, "fmt": "json"}
+    return f"https://musicbrainz.org/ws/2/{entity}/?{urlencode(params)}"
+
+
+def _recording_search_url(artist: str, title: str, limit: int = MUSICBRAINZ_SEARCH_LIMIT, offset: int = 0) -> str:
+    return _search_url("recording", search_query(artist=artist, recording=title), limit, offset)
+
+
+def _artist_search_url(artist: str) -> str:
+    # Only the best match is used
+    return _search_url("artist", search_query(artist=artist), limit=1)
+
+
+def _artist_recording_search_url(
+    artist_id: str, title: str, limit: int = MUSICBRAINZ_SEARCH_LIMIT, offset: int = 0
+) -> str:
+    return _search_url("recording", search_query(arid=artist_id, recording=title), limit, offset)
+
+
+def _release_search_url(artist: str, album: str, limit: int = MUSICBRAINZ_SEARCH_LIMIT, offset: int = 0) -> str:
+    return _search_url("release", search_query(artist=artist, release=album), limit, offset)
+
+
+def _get_pages(
+    get_url: Callable[[int, int], str],
+    limit: int = MUSICBRAINZ_SEARCH_LIMIT,
+    max_pages: int = MUSICBRAINZ_SEARCH_MAX_PAGES,
+) -> Iterator[Any]:
+    """Lazily requests the pages of a search, until there are no more results (or max_pages were requested).
+
+    Args:
+        get_url (Callable[[int, int], str]): Returns the URL of a page, given a limit and an offset.
+        limit (int, optional): Results per page. Defaults to MUSICBRAINZ_SEARCH_LIMIT.
+        max_pages (int, optional): Maximal number of pages. Defaults to MUSICBRAINZ_SEARCH_MAX_PAGES.
+
+    Yields:
+        Any: The response of each page
+    """
+    for page in range(max_pages):
+        data = _get_request(get_url(limit, page * limit))
+        yield data
+        if _is_last_page(data, page, limit):
+            return
+
+
+def _is_last_page(json_data: Any, page: int, limit: int) -> bool:
+    """Returns true if and only if there are no results after the given page of a search"""
+    return (page + 1) * limit >= json_data.get("count", 0)
+
+
+def _release_url(release_id: str) -> str:
+    return f"https://musicbrainz.org/ws/2/release/{release_id}?inc=recordings+release-groups+artist-credits&fmt=json"
+
+
+def _cover_art_url(release_group_id: str) -> str:
+    return f"https://coverartarchive.org/release-group/{release_group_id}/front-500"
+
+
+def _find_release_group_id(json_data: Any, album: str) -> Optional[str]:
+    """Returns the id of the release group named `album` in a response to a release search, if exists"""
+    for release in json_data.get("releases") or []:
+        if "release-group" in release and album.lower() == release["release-group"]["title"].lower():
+            logger.debug(" > Found release group")
+            return release["release-group"]["id"]
+
+    logger.debug(" > Haven't found release group")
+    return None
+
+
+def _get_year(date: str) -> int:
+    """Returns the year of a MusicBrainz date (e.g. "2008-10-07"), or 0 if it doesn't start with a year"""
+    year = date.split("-")[0]
+    return int(year) if year.isdigit() else 0
+
+
+def _find_album_release(json_data: Any, album: str, year: int = 0) -> Optional[str]:
+    """Returns the id of the release of `album` in a response to a release search, if exists.
+    Prefers releases from the given year, then official releases, then the earliest release.
+    """
+    releases = [
+        release for release in json_data.get("releases") or [] if release.get("title", "").lower() == album.lower()
+    ]
+    if not releases:
+        logger.debug(" > Haven't found release of %s", album)
+        return None
+
+    def release_rank(release: Any):
+        release_year = _get_year(release.get("date", ""))
+        return (
+            bool(year) and release_year != year,
+            release.get("status", "").lower() != "official",
+            release_year or sys.maxsize,
+        )
+
+    return min(releases, key=release_rank)["id"]
+
+
+def _get_release_tracks(json_data: Any, artist: str) -> List[ReleaseRecording]:
+    """Returns the tracks in a response to a release lookup (with recordings and release groups)"""
+    release_group = json_data.get("release-group", {})
+    artist_credit = json_data.get("artist-credit") or [{}]
+    release_artist = artist_credit[0].get("artist", {}).get("name", artist)
+    year = _get_year(json_data.get("date", ""))
 
-            year = int(release.get("date", "0").split("-")[0]) if release.get("date", "0").split("-")[0] else 0
-            release_group = release.get("release-group", {})
-            albums.append(
+    tracks = []
+    for medium in json_data.get("media", []):
+        for track in medium.get("tracks", []):
+            tracks.append(
                 ReleaseRecording(
-                    release.get("title"),
+                    json_data.get("title", ""),
                     year,
-                    artist=received_artist,
-                    track=int(release.get("media", [{}])[0].get("track-offset", 0)) + 1,
+                    artist=release_artist,
+                    track=int(track.get("position", 0)),
                     r_type=release_group.get("primary-type", ""),
-                    title=received_title,
-                    status=release.get("status", ""),
+                    title=track.get("title") or track.get("recording", {}).get("title", ""),
+                    status=json_data.get("status") or "",
                     release_group_id=release_group.get("id", ""),
                 )
             )
+    return tracks
 
-    # The complication below is to remove duplicates, while giving more weight to albums that appear more
-    counter = Counter(albums)
-    return sorted(set(albums), key=lambda release: (-counter[release], release.album, release.year, release.track))
+
+def artist_key(artist: str) -> str:
+    """Returns the key of an artist name (case and whitespace insensitive)"""
+    return " ".join(artist.split()).lower()
+
+
+def track_key(artist: str, title: str) -> str:
+    """Returns the key of a track in negative_cache"""
+    return f"{artist_key(artist)}\0{' '.join(title.split()).lower()}"
+
+
+def release_group_key(artist: str, album: str) -> str:
+    """Returns the key of an album in release_group_ids"""
+    return f"{' '.join(artist.split()).lower()}\0{' '.join(album.split()).lower()}"
+
+
+def _save_debug_response(json_data: Any, artist: str, title: str):
+    """Saves the response of a track search for later use in tests (only in debug mode)"""
+    # TODO - if env is dev / prod
+    if IS_DEBUG:
+        if json_data is not None and json_data.get("created"):
+            del json_data["created"]
+
+        save_response_as_json(json_data, artist, title)
+
+
+def _add_release_candidate(
+    candidates: Dict[Tuple[str, int, str, str, int], List[Any]], release: Any, artist: str, title: str
+):
+    """Counts a release of a recording in the candidates, and adds its ReleaseRecording if it's a new candidate"""
+    album = release.get("title")
+    if not album:
+        return
+
+    year = _get_year(release.get("date", "0"))
+    track = int(release.get("media", [{}])[0].get("track-offset", 0)) + 1
+    release_group = release.get("release-group", {})
+    r_type = release_group.get("primary-type", "")
+    key = (album, year, artist, r_type.lower(), track)
+    candidate = candidates.get(key)
+    if candidate is not None:
+        candidate[1] += 1
+        return
+    candidates[key] = [
+        ReleaseRecording(
+            album,
+            year,
+            artist=artist,
+            track=track,
+            r_type=r_type,
+            title=title,
+            status=release.get("status", ""),
+            release_group_id=release_group.get("id", ""),
+        ),
+        1,
+    ]
 
 
 def _overwrite_artist_name(json_data: Any, artist_name: str):
@@ -189,35 +494,84 @@ def _overwrite_artist_name(json_data: Any, artist_name: str):
         recording["artist-credit"][0]["artist"]["name"] = artist_name
 
 
-def _get_track_info_fallback(artist: str, title: str) -> List[ReleaseRecording]:
+def _empty_search() -> Any:
+    """Returns a response of a recording search that found nothing"""
+    return {"count": 0, "recordings": []}
+
+
+def _get_page_album_candidates(
+    json_data: Any, artist: str, title: str, overwrite_artist_name: bool = False
+) -> List[ReleaseRecording]:
+    """Returns the album candidates in a page of a recording search (see `_search_album_candidates`)"""
+    if overwrite_artist_name:
+        _overwrite_artist_name(json_data, artist)
+    recordings = get_album_candidates(json_data, artist, title)
+    if not recordings:
+        logger.debug("No album candidates in page at offset %s", json_data.get("offset", 0))
+    return recordings
+
+
+def _find_artist_id(json_data: Any) -> Optional[str]:
+    """Returns the ID of the best match of an artist search, or None if no artist was found"""
+    if not json_data["artists"]:
+        return None
+    return json_data["artists"][0]["id"]
+
+
+def _search_album_candidates(
+    get_url: Callable[[int, int], str], artist: str, title: str, overwrite_artist_name: bool = False
+) -> Tuple[Any, List[ReleaseRecording]]:
+    """Searches recordings page by page, until a page has album candidates (see `_get_pages`).
+
+    Args:
+        get_url (Callable[[int, int], str]): Returns the URL of a page of the search, given a limit and an offset.
+        artist (str): name of the artist associated with the title.
+        title (str): name of the title.
+        overwrite_artist_name (bool, optional): Patch the artist name of the recordings to `artist`. Defaults to False.
+
+    Returns:
+        Tuple[Any, List[ReleaseRecording]]: The last page that was requested, and its album candidates
+    """
+    data = _empty_search()
+    for data in _get_pages(get_url):
+        recordings = _get_page_album_candidates(data, artist, title, overwrite_artist_name)
+        if recordings:
+            return data, recordings
+    return data, []
+
+
+def _get_track_info_fallback(artist: str, title: str) -> Tuple[Any, List[ReleaseRecording]]:
     """Performs a more robust query to musicbrainz.org (in comparison to `get_track_info`).
     Useful for foreign artists, such as Daisuke Ishiwatari which will yield 0 results,
     since his official artist name is 石渡太輔.
 
-    First query for the artist using the wanted alias, and then use the artist ID
-    to search for the actual track. Patch the artist name to the wanted alias.
+    First query for the artist using the wanted alias (unless its artist ID is already in `artist_ids`),
+    and then use the artist ID to search for the actual track. Patch the artist name to the wanted alias.
 
     Args:
         artist (str): name of the artist associated with the title.
         title (str): name of the title.
 
     Returns:
-        List[ReleaseRecording]: List of ReleaseRecording with possible candidates for album track info.
+        Tuple[Any, List[ReleaseRecording]]: The response, and the possible candidates for album track info.
     """
-    # MusicBrainz API request URL
-    url = f"https://musicbrainz.org/ws/2/artist/?query=artist:{artist}&fmt=json"
-
-    data = _get_request(url)
+    artist_id = artist_ids.get(artist_key(artist))
+    if artist_id is None:
+        if negative_cache.is_miss("artist", artist_key(artist)):
+            logger.debug("Artist %s wasn't found recently, skipping fallback search", artist)
+            return _empty_search(), []
 
-    if not data["artists"]:
-        return data
-    artist_id = data["artists"][0]["id"]
-    url = f"https://musicbrainz.org/ws/2/recording/?query=arid:{artist_id} AND recording:{title}&fmt=json"
+        data = _get_request(_artist_search_url(artist))
 
-    data = _get_request(url)
-    _overwrite_artist_name(data, artist)
+        artist_id = _find_artist_id(data)
+        if artist_id is None:
+            negative_cache.record_miss("artist", artist_key(artist))
+            return data, []
+        artist_ids.set(artist_key(artist), artist_id)
 
-    return data
+    return _search_album_candidates(
+        functools.partial(_artist_recording_search_url, artist_id, title), artist, title, overwrite_artist_name=True
+    )
 
 
 def get_track_info(artist: str, title: str) -> List[ReleaseRecording]:
@@ -230,25 +584,37 @@ def get_track_info(artist: str, title: str) -> List[ReleaseRecording]:
     Returns:
         List[ReleaseRecording]: List of ReleaseRecording with possible candidates for album track info.
     """
-    # MusicBrainz API request URL
-    url = f"https://musicbrainz.org/ws/2/recording/?query=artist:{artist} AND recording:{title}&fmt=json"
+    key = track_key(artist, title)
+    if negative_cache.is_miss("recording", key):
+        logger.debug("%s - %s wasn't found recently, skipping lookup", artist, title)
+        return []
 
-    data = _get_request(url)
+    data, recordings = _search_album_candidates(functools.partial(_recording_search_url, artist, title), artist, title)
 
     # If the response is empty, try a more robust search
     if data["count"] == 0:
         logger.debug("No recordings found - initiating fallback search")
-        data = _get_track_info_fallback(artist, title)
+        data, recordings = _get_track_info_fallback(artist, title)
 
-    # TODO - if env is dev / prod
-    if IS_DEBUG:
-        if data is not None and data.get("created"):
-            del data["created"]
+    _save_debug_response(data, artist, title)
+
+    _record_lookup_result(key, recordings)
+    return recordings
 
-        save_response_as_json(data, artist, title)
 
-    # Extract candidates
-    return get_album_candidates(data, artist, title)
+def _record_lookup_result(key: str, recordings: List[ReleaseRecording]):
+    """Records a track lookup in the negative cache (as a miss if no candidates were found)"""
+    if recordings:
+        negative_cache.record_hit("recording", key)
+    else:
+        negative_cache.record_miss("recording", key)
+
+
+def get_unresolved_tracks(min_misses: int = 2) -> List[MissEntry]:
+    """Returns the tracks (artist and title) that weren't found in at least `min_misses` lookups,
+    the most missed first. Such tracks are usually covers, remixes or titles that need fixing.
+    """
+    return negative_cache.unresolved(min_misses, kind="recording")
 
 
 def get_release_group_id(artist: str, album: str) -> Optional[str]:
@@ -261,24 +627,49 @@ def get_release_group_id(artist: str, album: str) -> Optional[str]:
     Returns:
         Optional[str]: the id of the release group, or None in the case of failure
     """
-    url = f"https://musicbrainz.org/ws/2/release/?query=artist:{artist} AND release:{album}&fmt=json"
-    try:
-        logger.debug("Sending GET request to %s", url)
-        response = requests.get(url, headers=headers, timeout=3)
-        response.raise_for_status()
-        data = response.json()
-        if "releases" in data and data["releases"]:
-            releases = data["releases"]
-            for release in releases:
-                if "release-group" in release and album.lower() == release["release-group"]["title"].lower():
-                    logger.debug(" > Found release group")
-                    return release["release-group"]["id"]
-
-        logger.debug(" > Haven't found release group")
+
+    def find_release_group_id() -> Optional[str]:
+        try:
+            for data in _get_pages(functools.partial(_release_search_url, artist, album)):
+                release_group_id = _find_release_group_id(data, album)
+                if release_group_id is not None:
+                    return release_group_id
+        except requests.exceptions.RequestException as err:
+            logger.error("An error occurred: %s", err)
         return None
+
+    return release_group_ids.get_or_compute(release_group_key(artist, album), find_release_group_id)
+
+
+def get_album_tracks(artist: str, album: str, year: int = 0) -> List[ReleaseRecording]:
+    """Gets the track list of an album, with a release search and a single release lookup.
+
+    Args:
+        artist (str): the artist associated with the album
+        album (str): the name of the album
+        year (int, optional): the release year of the album, used to choose between releases. Defaults to 0.
+
+    Returns:
+        List[ReleaseRecording]: A recording per track of the album, empty if the album wasn't found
+    """
+    try:
+        release_id = None
+        for data in _get_pages(functools.partial(_release_search_url, artist, album)):
+            release_id = _find_album_release(data, album, year)
+            if release_id is not None:
+                break
+        if release_id is None:
+            return []
+        data = _get_request(_release_url(release_id))
     except requests.exceptions.RequestException as err:
         logger.error("An error occurred: %s", err)
-        return None
+        return []
+
+    tracks = _get_release_tracks(data, artist)
+    logger.debug("Found %d tracks of %s - %s", len(tracks), artist, album)
+    if tracks and tracks[0].release_group_id:
+        release_group_ids.set(release_group_key(artist, album), tracks[0].release_group_id)
+    return tracks
 
 
 def download_album_artwork_from_release_id(release_group_id: str, filepath: str):
@@ -288,11 +679,11 @@ def download_album_artwork_from_release_id(release_group_id: str, filepath: str)
         release_group_id (str): the id of the release group
         filepath (str): path for the outputed image file
     """
-    url = f"https://coverartarchive.org/release-group/{release_group_id}/front-500"
+    url = _cover_art_url(release_group_id)
 
     try:
         logger.debug("Sending GET request to %s", url)
-        response = requests.get(url, headers, timeout=3)
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
         if response.status_code == 200:
             with open(filepath, "wb") as file:
                 file.write(response.content)
@@ -309,7 +700,6 @@ def download_album_artwork(artist: str, album: str, filepath: str):
         filepath (str): path for the outputed image file
     """
     release_group_id = get_release_group_id(artist, album)
-    print(release_group_id)
     if release_group_id is None:
         logger.debug("Couldn't find release group for '%s - %s', aborting album art download", artist, album)
         return
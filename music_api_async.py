@@ -0,0 +1,289 @@
+"""Asynchronous (asyncio) counterparts of the functions in music_api.
+Parsing of responses is shared with music_api, and the caches (SQLite) are accessed in worker threads,
+so the event loop is never blocked by the disk.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import HTTP_POOL_MAXSIZE, HTTP_TIMEOUT, IS_DEBUG, MUSICBRAINZ_SEARCH_LIMIT, MUSICBRAINZ_SEARCH_MAX_PAGES
+import music_api
+from music_api import (
+    RATE_LIMITED_HOSTS,
+    ReleaseRecording,
+    _artist_recording_search_url,
+    _artist_search_url,
+    _cover_art_url,
+    _empty_search,
+    _find_artist_id,
+    _find_release_group_id,
+    _get_page_album_candidates,
+    _is_last_page,
+    _record_lookup_result,
+    _recording_search_url,
+    _release_search_url,
+    _save_debug_response,
+    artist_key,
+    headers,
+    release_group_key,
+    track_key,
+)
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+def _write_file(file_path: str, content: bytes):
+    with open(file_path, "wb") as file:
+        file.write(content)
+
+
+class AsyncMusicClient:
+    """Asyncio client for MusicBrainz and Cover Art Archive.
+    Shares the response cache, the rate limit and the other caches with the blocking functions of music_api.
+
+    Example:
+        async with AsyncMusicClient() as client:
+            async for artist, title, recordings in client.get_track_info_many(pairs):
+                ...
+    """
+
+    def __init__(self, max_concurrency: int = HTTP_POOL_MAXSIZE, timeout: float = HTTP_TIMEOUT) -> None:
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        # A lock per release group key, so concurrent lookups of the same album send a single request
+        self._release_group_locks: Dict[str, asyncio.Lock] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit_per_host=self.max_concurrency),
+            )
+        return self._session
+
+    async def close(self):
+        """Closes the underlying HTTP session"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get_request(self, url: str, max_retries: int = 3, initial_delay: float = 0.5, use_cache: bool = True):
+        """Performs GET request to a URL with retry logic for transient errors, see music_api._get_request
+
+        Returns: A JSON of the response
+
+        Raises:
+            aiohttp.ClientError: If all retries fail
+        """
+        if use_cache:
+            data = await asyncio.to_thread(music_api.response_cache.get, url)
+            if data is not None:
+                return data
+
+        logger.debug("Sending GET request to %s", url)
+        is_rate_limited = urlsplit(url).hostname in RATE_LIMITED_HOSTS
+        for attempt in range(max_retries + 1):
+            try:
+                if is_rate_limited:
+                    await music_api.request_scheduler.acquire_async()
+                async with self._get_session().get(url) as response:
+                    if response.status == 503:
+                        # MusicBrainz responds with 503 when it throttles the client
+                        response.raise_for_status()
+                    data = await response.json(content_type=None)
+                    if use_cache and response.status == 200:
+                        await asyncio.to_thread(music_api.response_cache.set, url, data)
+                    return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < max_retries:
+                    delay = initial_delay * (2**attempt)  # Exponential backoff
+                    logger.warning(
+                        "Request failed (attempt %d/%d): %s. Retrying in %.1fs...",
+                        attempt + 1,
+                        max_retries + 1,
+                        type(e).__name__,
+                        delay,
+                    )
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error("Request failed after %d attempts: %s", max_retries + 1, type(e).__name__)
+                    raise
+
+    async def _get_pages(
+        self,
+        get_url: Callable[[int, int], str],
+        limit: int = MUSICBRAINZ_SEARCH_LIMIT,
+        max_pages: int = MUSICBRAINZ_SEARCH_MAX_PAGES,
+    ) -> AsyncIterator[Any]:
+        """Asynchronous counterpart of music_api._get_pages"""
+        for page in range(max_pages):
+            data = await self._get_request(get_url(limit, page * limit))
+            yield data
+            if _is_last_page(data, page, limit):
+                return
+
+    async def _search_album_candidates(
+        self, get_url: Callable[[int, int], str], artist: str, title: str, overwrite_artist_name: bool = False
+    ) -> Tuple[Any, List[ReleaseRecording]]:
+        """Asynchronous counterpart of music_api._search_album_candidates"""
+        data = _empty_search()
+        async for data in self._get_pages(get_url):
+            recordings = _get_page_album_candidates(data, artist, title, overwrite_artist_name)
+            if recordings:
+                return data, recordings
+        return data, []
+
+    async def _get_track_info_fallback(self, artist: str, title: str) -> Tuple[Any, List[ReleaseRecording]]:
+        """Asynchronous counterpart of music_api._get_track_info_fallback"""
+        key = artist_key(artist)
+        artist_id = await asyncio.to_thread(music_api.artist_ids.get, key)
+        if artist_id is None:
+            if await asyncio.to_thread(music_api.negative_cache.is_miss, "artist", key):
+                logger.debug("Artist %s wasn't found recently, skipping fallback search", artist)
+                return _empty_search(), []
+
+            data = await self._get_request(_artist_search_url(artist))
+
+            artist_id = _find_artist_id(data)
+            if artist_id is None:
+                await asyncio.to_thread(music_api.negative_cache.record_miss, "artist", key)
+                return data, []
+            await asyncio.to_thread(music_api.artist_ids.set, key, artist_id)
+
+        return await self._search_album_candidates(
+            functools.partial(_artist_recording_search_url, artist_id, title), artist, title, overwrite_artist_name=True
+        )
+
+    async def get_track_info(self, artist: str, title: str) -> List[ReleaseRecording]:
+        """Queries musicbrainz.org for candidates (album, year, track number) for the track.
+
+        Args:
+            artist (str): name of the artist associated with the title.
+            title (str): name of the title.
+
+        Returns:
+            List[ReleaseRecording]: List of ReleaseRecording with possible candidates for album track info.
+        """
+        key = track_key(artist, title)
+        if await asyncio.to_thread(music_api.negative_cache.is_miss, "recording", key):
+            logger.debug("%s - %s wasn't found recently, skipping lookup", artist, title)
+            return []
+
+        data, recordings = await self._search_album_candidates(
+            functools.partial(_recording_search_url, artist, title), artist, title
+        )
+
+        # If the response is empty, try a more robust search
+        if data["count"] == 0:
+            logger.debug("No recordings found - initiating fallback search")
+            data, recordings = await self._get_track_info_fallback(artist, title)
+
+        await asyncio.to_thread(_save_debug_response, data, artist, title)
+
+        await asyncio.to_thread(_record_lookup_result, key, recordings)
+        return recordings
+
+    async def get_track_info_many(
+        self, pairs: Iterable[Tuple[str, str]]
+    ) -> AsyncIterator[Tuple[str, str, List[ReleaseRecording]]]:
+        """Queries musicbrainz.org for candidates of many tracks concurrently (within the rate limit).
+
+        Args:
+            pairs (Iterable[Tuple[str, str]]): (artist, title) of the tracks.
+
+        Yields:
+            Tuple[str, str, List[ReleaseRecording]]: artist, title and its candidates, in the order they resolve.
+                                                     Tracks whose lookup failed have no candidates.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def resolve(artist: str, title: str) -> Tuple[str, str, List[ReleaseRecording]]:
+            async with semaphore:
+                try:
+                    return artist, title, await self.get_track_info(artist, title)
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError) as err:
+                    logger.error("Failed to get track info for %s - %s: %s", artist, title, err)
+                    return artist, title, []
+
+        tasks = [asyncio.ensure_future(resolve(artist, title)) for artist, title in pairs]
+        try:
+            for next_resolved in asyncio.as_completed(tasks):
+                yield await next_resolved
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_release_group_id(self, artist: str, album: str) -> Optional[str]:
+        """Auxilary function to get group_id (used for album art)
+
+        Args:
+            artist (str): the artist associated with the album
+            album (str): the name of the album
+
+        Returns:
+            Optional[str]: the id of the release group, or None in the case of failure
+        """
+        key = release_group_key(artist, album)
+        async with self._release_group_locks.setdefault(key, asyncio.Lock()):
+            release_group_id = await asyncio.to_thread(music_api.release_group_ids.get, key)
+            if release_group_id is not None:
+                return release_group_id
+            try:
+                async for data in self._get_pages(functools.partial(_release_search_url, artist, album)):
+                    release_group_id = _find_release_group_id(data, album)
+                    if release_group_id is not None:
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                logger.error("An error occurred: %s", err)
+                return None
+            if release_group_id is not None:
+                await asyncio.to_thread(music_api.release_group_ids.set, key, release_group_id)
+            return release_group_id
+
+    async def download_album_artwork_from_release_id(self, release_group_id: str, filepath: str):
+        """Downloads album artwork from coverartarchive.org, given a release group id
+
+        Args:
+            release_group_id (str): the id of the release group
+            filepath (str): path for the outputed image file
+        """
+        url = _cover_art_url(release_group_id)
+
+        try:
+            logger.debug("Sending GET request to %s", url)
+            async with self._get_session().get(url) as response:
+                if response.status == 200:
+                    content = await response.read()
+                    await asyncio.to_thread(_write_file, filepath, content)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            logger.error("An error occurred: %s", err)
+
+    async def download_album_artwork(self, artist: str, album: str, filepath: str):
+        """Downloads album artwork from coverartarchive.org
+
+        Args:
+            artist (str): the artist associated with the album
+            album (str): the name of the album
+            filepath (str): path for the outputed image file
+        """
+        release_group_id = await self.get_release_group_id(artist, album)
+        if release_group_id is None:
+            logger.debug("Couldn't find release group for '%s - %s', aborting album art download", artist, album)
+            return
+
+        await self.download_album_artwork_from_release_id(release_group_id, filepath)
@@ -0,0 +1,251 @@
+"""Rate limiting of requests to web APIs, with priorities (used by music_api for MusicBrainz)"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional
+
+from config import IS_DEBUG
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+class Priority(IntEnum):
+    """Priority classes of requests. Lower values are served first."""
+
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("priority", default=Priority.DEFAULT)
+
+
+@contextlib.contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Context manager that sets the priority of the requests sent within it (in the current thread / task)
+
+    Example:
+        with request_priority(Priority.BACKGROUND):
+            get_track_info(artist, title)
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def get_request_priority() -> Priority:
+    """Returns the priority of requests sent from the current context"""
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Token bucket shared by all processes on the host through an SQLite file.
+    If `db_path` is None, the bucket is local to the process.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1, db_path: Optional[str] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.db_path = db_path
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            assert self.db_path is not None
+            self._connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS bucket (
+                    id INTEGER PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+        return self._connection
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+    def try_take(self) -> float:
+        """Attempts to take a single token from the bucket.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the number of seconds until a token will be available.
+        """
+        if self.db_path is None:
+            now = time.monotonic()
+            self._tokens = self._refill(self._tokens, self._updated, now)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+        # Wall clock time, since the state is shared with other processes
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute("SELECT tokens, updated FROM bucket WHERE id = 0").fetchone()
+            tokens = self.capacity if row is None else self._refill(row[0], row[1], now)
+            delay = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                delay = (1 - tokens) / self.rate
+            connection.execute("INSERT OR REPLACE INTO bucket VALUES (0, ?, ?)", (tokens, now))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return delay
+
+
+class RequestScheduler:
+    """Lets requests through at the rate of a token bucket, serving higher priority requests first.
+    Waiting requests of the same priority are served in arrival order.
+    Priorities apply within the process, while the rate is shared with other processes that use the same bucket.
+    """
+
+    def __init__(self, bucket: TokenBucket, enabled: bool = True) -> None:
+        self.bucket = bucket
+        self.enabled = enabled
+        self._queue: List[List[float]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._served = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def enqueue(self, priority: Optional[Priority] = None) -> List[float]:
+        """Adds a request to the queue. Use `poll` to find out when it may be sent.
+
+        Args:
+            priority (Priority, optional): Priority of the request. Defaults to the priority of the current context.
+
+        Returns:
+            List[float]: A ticket representing the request in the queue
+        """
+        priority = get_request_priority() if priority is None else priority
+        ticket = [int(priority), next(self._counter), time.monotonic()]
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self._condition.notify_all()
+        return ticket
+
+    def poll(self, ticket: List[float]) -> float:
+        """Checks whether the request of a ticket may be sent.
+
+        Returns:
+            float: 0 if the request may be sent now (and it was removed from the queue),
+                   otherwise the number of seconds it's worth waiting before polling again.
+        """
+        with self._condition:
+            if self._queue[0] is not ticket:
+                return 1 / self.bucket.rate
+            delay = self.bucket.try_take()
+            if delay == 0:
+                heapq.heappop(self._queue)
+                waited = time.monotonic() - ticket[2]
+                self._served += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+                self._condition.notify_all()
+            return delay
+
+    def cancel(self, ticket: List[float]):
+        """Removes a request from the queue, e.g. if the waiting caller was interrupted"""
+        with self._condition:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+
+    def acquire(self, priority: Optional[Priority] = None) -> float:
+        """Blocks until a request of the given priority may be sent.
+
+        Args:
+            priority (Priority, optional): Priority of the request. Defaults to the priority of the current context.
+
+        Returns:
+            float: Time (in seconds) the request waited in the queue
+        """
+        if not self.enabled:
+            return 0
+
+        ticket = self.enqueue(priority)
+        start = ticket[2]
+        try:
+            with self._condition:
+                while True:
+                    delay = self.poll(ticket) if self._queue[0] is ticket else None
+                    if delay == 0:
+                        break
+                    # Woken up early if the queue changes (e.g. a higher priority request arrived)
+                    self._condition.wait(delay)
+        except BaseException:
+            self.cancel(ticket)
+            raise
+
+        waited = time.monotonic() - start
+        if waited > 0.01:
+            logger.debug("Request waited %.2fs for the rate limit", waited)
+        return waited
+
+    async def acquire_async(self, priority: Optional[Priority] = None) -> float:
+        """Asynchronous counterpart of `acquire`, waits without blocking the event loop.
+        The queue and the bucket are accessed in a worker thread, since they're guarded by a lock
+        (held by other threads while they take a token) and the bucket may be an SQLite transaction.
+
+        Args:
+            priority (Priority, optional): Priority of the request. Defaults to the priority of the current context.
+
+        Returns:
+            float: Time (in seconds) the request waited in the queue
+        """
+        if not self.enabled:
+            return 0
+
+        priority = get_request_priority() if priority is None else priority
+        ticket = await asyncio.to_thread(self.enqueue, priority)
+        try:
+            delay = await asyncio.to_thread(self.poll, ticket)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = await asyncio.to_thread(self.poll, ticket)
+        except BaseException:
+            await asyncio.to_thread(self.cancel, ticket)
+            raise
+
+        return time.monotonic() - ticket[2]
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests currently waiting"""
+        with self._condition:
+            return len(self._queue)
+
+    def stats(self) -> Dict[str, float]:
+        """Returns statistics of the scheduler - queue depth (total and per priority) and wait times"""
+        with self._condition:
+            stats: Dict[str, float] = {
+                "queue_depth": len(self._queue),
+                "served": self._served,
+                "total_wait": self._total_wait,
+                "average_wait": self._total_wait / self._served if self._served else 0.0,
+                "max_wait": self._max_wait,
+            }
+            for priority in Priority:
+                stats[f"waiting_{priority.name.lower()}"] = sum(1 for ticket in self._queue if ticket[0] == priority)
+        return stats
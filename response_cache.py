@@ -0,0 +1,378 @@
+"""Persistent on-disk cache for JSON responses of web APIs (used by music_api)"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import IS_DEBUG
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+DAY = 24 * 60 * 60
+
+# Time to live (in seconds) of a cached response, by the endpoint that was queried
+DEFAULT_TTLS = {
+    "recording": 30 * DAY,
+    "release": 30 * DAY,
+    "artist": 90 * DAY,
+}
+DEFAULT_TTL = 7 * DAY
+# Time to live of searches that found nothing (results may be added to MusicBrainz)
+DEFAULT_NEGATIVE_TTL = 3 * DAY
+# Accesses of cache hits are written (for LRU eviction) once this many are pending
+ACCESS_FLUSH_SIZE = 256
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so that equivalent queries share a cache key.
+    Scheme and host are lowercased, query parameters are sorted and their whitespace is collapsed.
+    Values are kept as they are, since case may matter (e.g. `AND` is an operator of search queries, `and` isn't).
+
+    Args:
+        url (str): The URL to normalize
+
+    Returns:
+        str: The normalized URL
+    """
+    parts = urlsplit(url.strip())
+    params = []
+    for key, value in parse_qsl(parts.query, keep_blank_values=True):
+        params.append((key, " ".join(value.split())))
+    params.sort()
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(params), ""))
+
+
+def get_endpoint(url: str) -> str:
+    """Returns the endpoint (entity) a URL queries, e.g. `recording` for `.../ws/2/recording/?query=...`"""
+    path_parts = [part for part in urlsplit(url).path.split("/") if part]
+    if "ws" in path_parts and path_parts.index("ws") + 2 < len(path_parts):
+        return path_parts[path_parts.index("ws") + 2]
+    return path_parts[0] if path_parts else ""
+
+
+def is_empty_response(data: Any) -> bool:
+    """Returns true if and only if the response is a search that found nothing"""
+    return isinstance(data, dict) and data.get("count") == 0
+
+
+class ResponseCache:
+    """SQLite backed cache of JSON responses, keyed by the normalized URL of the request.
+    Entries expire according to a per-endpoint TTL (or a shorter TTL for searches that found nothing),
+    and the least recently used entries are evicted
+    once the cache holds more than `max_entries` entries or `max_bytes` bytes.
+    The number of entries and their size are counted once, when the database is opened, and kept up to date in memory
+    (entries written by other processes are counted once the cache is opened again).
+    Accesses of hits are written in batches (see ACCESS_FLUSH_SIZE), rather than on every hit.
+    """
+
+    def __init__(  # pylint: disable=R0917
+        self,
+        db_path: str,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        max_entries: int = 100000,
+        max_bytes: int = 512 * 1024 * 1024,
+        enabled: bool = True,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+    ) -> None:
+        self.db_path = db_path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._entries = 0
+        self._total_size = 0
+        self._pending_accesses: Dict[str, float] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the database lazily, so that importing the module doesn't touch the disk"""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    expires REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)")
+            self._connection.commit()
+            self._entries, self._total_size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return self._connection
+
+    def get_ttl(self, url: str) -> float:
+        """Returns the time to live (in seconds) for responses of the given URL"""
+        return self.ttls.get(get_endpoint(url), self.default_ttl)
+
+    def get(self, url: str) -> Optional[Any]:
+        """Returns the cached response of a URL, or None if it's not cached (or has expired)"""
+        if not self.enabled:
+            return None
+
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT body, expires, size FROM responses WHERE url = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    connection.execute("DELETE FROM responses WHERE url = ?", (key,))
+                    connection.commit()
+                    self._entries -= 1
+                    self._total_size -= row[2]
+                self.misses += 1
+                return None
+            self._pending_accesses[key] = now
+            if len(self._pending_accesses) >= ACCESS_FLUSH_SIZE:
+                self._flush_accesses(connection)
+                connection.commit()
+            self.hits += 1
+
+        logger.debug("Cache hit for %s", url)
+        return json.loads(row[0])
+
+    def set(self, url: str, data: Any, ttl: Optional[float] = None):
+        """Stores the response of a URL in the cache
+
+        Args:
+            url (str): The URL of the request.
+            data (Any): The JSON response.
+            ttl (float, optional): Time to live in seconds. Defaults to the TTL of the endpoint
+                                   (or the negative TTL, if the response is a search that found nothing).
+        """
+        if not self.enabled:
+            return
+
+        key = normalize_url(url)
+        body = json.dumps(data)
+        now = time.time()
+        if ttl is None:
+            ttl = self.negative_ttl if is_empty_response(data) else self.get_ttl(url)
+        with self._lock:
+            connection = self._connect()
+            self._pending_accesses.pop(key, None)
+            row = connection.execute("SELECT size FROM responses WHERE url = ?", (key,)).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, get_endpoint(url), body, len(body), now, now + ttl, now),
+            )
+            if row is None:
+                self._entries += 1
+            self._total_size += len(body) - (row[0] if row else 0)
+            self._evict(connection)
+            connection.commit()
+
+    def _is_full(self) -> bool:
+        return self._entries > self.max_entries or self._total_size > self.max_bytes
+
+    def _flush_accesses(self, connection: sqlite3.Connection):
+        """Writes the pending accesses of hits"""
+        connection.executemany(
+            "UPDATE responses SET last_access = ? WHERE url = ?",
+            [(last_access, key) for key, last_access in self._pending_accesses.items()],
+        )
+        self._pending_accesses.clear()
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Removes expired entries, then the least recently used ones until the cache is within its bounds.
+        Both are found through an index, so only the removed entries are read.
+        """
+        if not self._is_full():
+            return
+
+        now = time.time()
+        expired, expired_size = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE expires < ?", (now,)
+        ).fetchone()
+        if expired:
+            connection.execute("DELETE FROM responses WHERE expires < ?", (now,))
+            self._entries -= expired
+            self._total_size -= expired_size
+        if not self._is_full():
+            return
+
+        logger.debug("Response cache is full (%d entries, %d bytes), evicting", self._entries, self._total_size)
+        self._flush_accesses(connection)
+        evicted = []
+        for url, size in connection.execute("SELECT url, size FROM responses ORDER BY last_access"):
+            if not self._is_full():
+                break
+            evicted.append((url,))
+            self._entries -= 1
+            self._total_size -= size
+        connection.executemany("DELETE FROM responses WHERE url = ?", evicted)
+
+    def invalidate(self, url: Optional[str] = None, endpoint: Optional[str] = None) -> int:
+        """Removes entries from the cache.
+        If `url` is given, only its entry is removed. If `endpoint` is given, all entries of that endpoint are removed.
+        If neither is given, the whole cache is cleared.
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            connection = self._connect()
+            if url is not None:
+                cursor = connection.execute("DELETE FROM responses WHERE url = ?", (normalize_url(url),))
+            elif endpoint is not None:
+                cursor = connection.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+            else:
+                cursor = connection.execute("DELETE FROM responses")
+            connection.commit()
+            self._entries, self._total_size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters (of this process) and the current size of the cache"""
+        with self._lock:
+            entries, total_size = (
+                self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            )
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total_size}
+
+    def close(self):
+        """Writes the pending accesses, and closes the underlying database connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._flush_accesses(self._connection)
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
+
+
+class MissEntry:
+    """A lookup that found nothing, and how many times it did"""
+
+    def __init__(  # pylint: disable=R0917
+        self, kind: str, key: str, misses: int, first_seen: float, last_seen: float, expires: float
+    ) -> None:
+        self.kind = kind
+        self.key = key
+        self.misses = misses
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.expires = expires
+
+    def __repr__(self):
+        return f"{self.kind}: {self.key!r} (missed {self.misses} times)"
+
+
+class NegativeCache:
+    """SQLite backed cache of lookups that found nothing (such as tracks without any recording),
+    so they aren't repeated until their (shorter than usual) TTL expires.
+    Keeps counting misses of the same lookup, to report lookups that persistently find nothing.
+    """
+
+    def __init__(self, db_path: str, ttl: float = DEFAULT_NEGATIVE_TTL, enabled: bool = True) -> None:
+        self.db_path = db_path
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS misses (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    misses INTEGER NOT NULL,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    expires REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )""")
+            self._connection.commit()
+        return self._connection
+
+    def is_miss(self, kind: str, key: str) -> bool:
+        """Returns true if and only if the lookup found nothing, and its entry hasn't expired yet"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            row = (
+                self._connect().execute("SELECT expires FROM misses WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            )
+        return row is not None and row[0] >= time.time()
+
+    def record_miss(self, kind: str, key: str):
+        """Records that a lookup found nothing"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                """INSERT INTO misses VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET misses = misses + 1, last_seen = ?, expires = ?""",
+                (kind, key, now, now, now + self.ttl, now, now + self.ttl),
+            )
+            connection.commit()
+
+    def record_hit(self, kind: str, key: str):
+        """Records that a lookup found something (so it's no longer a miss)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM misses WHERE kind = ? AND key = ?", (kind, key))
+            connection.commit()
+
+    def unresolved(self, min_misses: int = 2, kind: Optional[str] = None) -> List[MissEntry]:
+        """Returns the lookups that found nothing at least `min_misses` times, the most missed first
+
+        Args:
+            min_misses (int, optional): Minimal number of misses. Defaults to 2.
+            kind (str, optional): Only lookups of this kind. Defaults to all kinds.
+        """
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT * FROM misses WHERE misses >= ? AND (? IS NULL OR kind = ?) ORDER BY misses DESC, key",
+                    (min_misses, kind, kind),
+                )
+                .fetchall()
+            )
+        return [MissEntry(*row) for row in rows]
+
+    def invalidate(self, kind: Optional[str] = None) -> int:
+        """Removes the misses of a kind (or all misses), so they're looked up again
+
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            connection = self._connect()
+            if kind is None:
+                cursor = connection.execute("DELETE FROM misses")
+            else:
+                cursor = connection.execute("DELETE FROM misses WHERE kind = ?", (kind,))
+            connection.commit()
+            return cursor.rowcount
+
+    def close(self):
+        """Closes the underlying database connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
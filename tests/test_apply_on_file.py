@@ -0,0 +1,60 @@
+"""Tests that MP3MetaData.apply_on_file writes tags only when they change"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+
+import music_tag
+import utils
+
+from mp3_metadata import MP3MetaData
+
+ARTWORK_PATH = join(os.path.dirname(__file__), "outputs", "img", "Avenged Sevenfold - Nightmare.png")
+
+
+class TestApplyOnFile(unittest.TestCase):
+    """Tests MP3MetaData.apply_on_file"""
+
+    def setUp(self):
+        """Creates an untagged mp3 file"""
+        self.directory = tempfile.mkdtemp()
+        self.file_path = join(self.directory, "Avenged Sevenfold - Buried Alive.mp3")
+        utils.create_silent_mp3(self.file_path)
+        self.metadata = MP3MetaData(
+            band="Avenged Sevenfold", song="Buried Alive", album="Nightmare", year=2010, track=4, art_path=ARTWORK_PATH
+        )
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the mp3 file"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def test_skip_unchanged(self):
+        """Tests that applying the same metadata again doesn't save the file"""
+        self.assertTrue(self.metadata.apply_on_file(self.file_path))
+        mtime_ns = os.stat(self.file_path).st_mtime_ns
+
+        self.assertFalse(self.metadata.apply_on_file(self.file_path))
+        self.assertEqual(os.stat(self.file_path).st_mtime_ns, mtime_ns)
+
+        mp3_file = music_tag.load_file(self.file_path)
+        self.assertEqual(str(mp3_file["album"]), "Nightmare")
+        self.assertEqual(int(mp3_file["tracknumber"]), 4)
+        self.assertEqual(utils.get_file_md5_hash(ARTWORK_PATH), utils.get_md5_hash(mp3_file["artwork"].first.raw))
+
+    def test_in_place_update(self):
+        """Tests that changes after the first save fit in the reserved padding, so the file keeps its size"""
+        self.assertTrue(self.metadata.apply_on_file(self.file_path))
+        size = os.path.getsize(self.file_path)
+
+        self.metadata.album = "Nightmare (Deluxe Edition)"
+        self.assertTrue(self.metadata.apply_on_file(self.file_path))
+        self.assertEqual(os.path.getsize(self.file_path), size)
+        self.assertEqual(str(music_tag.load_file(self.file_path)["album"]), "Nightmare (Deluxe Edition)")
+
+
+if __name__ == "__main__":
+    unittest.main()
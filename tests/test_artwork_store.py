@@ -0,0 +1,138 @@
+"""Tests the content-addressed artwork store"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+from unittest.mock import patch
+
+import artwork_store
+from artwork_store import ArtworkStore, artwork_alias, detect_image_format, process_artwork, release_group_alias
+from mp3_metadata import MP3MetaData
+
+ARTWORK_PATH = join(os.path.dirname(__file__), "outputs", "img", "Avenged Sevenfold - Nightmare.png")
+
+
+class TestArtworkStore(unittest.TestCase):
+    """Tests ArtworkStore"""
+
+    def setUp(self):
+        """Creates an empty store"""
+        self.directory = tempfile.mkdtemp()
+        self.store = ArtworkStore(join(self.directory, "by-hash"), join(self.directory, "index.sqlite3"), cache_size=2)
+        with open(ARTWORK_PATH, "rb") as file:
+            self.artwork = file.read()
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the store"""
+        self.store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def test_deduplication(self):
+        """Tests that identical images are stored once, under all their aliases"""
+        path = self.store.put(self.artwork, [artwork_alias("Avenged Sevenfold", "Nightmare")])
+        other_path = self.store.put(self.artwork, [release_group_alias("1234")])
+        self.assertEqual(path, other_path)
+        self.assertEqual(os.listdir(join(self.directory, "by-hash")), [os.path.basename(path)])
+
+        self.assertEqual(self.store.get_path_by_alias(artwork_alias(" avenged  sevenfold", "NIGHTMARE")), path)
+        self.assertEqual(self.store.get_path_by_alias("missing", release_group_alias("1234")), path)
+        self.assertIsNone(self.store.get_path_by_alias("missing"))
+
+    def test_read_cache(self):
+        """Tests that reading the same image again is served from memory, and that the cache is bounded"""
+        path = self.store.put(self.artwork)
+        first = self.store.read(path)
+        assert first is not None
+        self.assertEqual(first.data, self.artwork)
+        self.assertIs(self.store.read(path), first)
+        self.assertEqual(self.store.stats(), {"hits": 1, "misses": 1, "cached": 1})
+
+        for index in range(3):
+            self.store.read(self.store.put(bytes([index])))
+        self.assertEqual(self.store.stats()["cached"], 2)
+        self.assertIsNone(self.store.read(join(self.directory, "missing.png")))
+
+    def test_detect_format(self):
+        """Tests that images are stored with the extension of their real format"""
+        self.assertEqual(detect_image_format(self.artwork), "jpg")
+        self.assertEqual(detect_image_format(b"\x89PNG\r\n\x1a\n"), "png")
+        self.assertEqual(detect_image_format(b"RIFF\0\0\0\0WEBPVP8 "), "webp")
+        self.assertIsNone(detect_image_format(b"not an image"))
+
+        self.assertTrue(self.store.put(self.artwork).endswith(".jpg"))
+        self.assertTrue(self.store.put(b"not an image").endswith(".png"))
+
+    def test_processed_once(self):
+        """Tests that each source image is processed once"""
+        with patch("artwork_store.process_artwork", side_effect=lambda data, *_: data) as mock_process:
+            path = self.store.put(self.artwork, [artwork_alias("Avenged Sevenfold", "Nightmare")])
+            self.assertEqual(self.store.put(self.artwork), path)
+            self.assertEqual(mock_process.call_count, 1)
+
+    @unittest.skipIf(artwork_store.Image is None, "Pillow is not installed")
+    def test_downscale(self):
+        """Tests that large images are downscaled"""
+        image = artwork_store.Image.new("RGB", (1200, 800), color=(200, 40, 40))
+        with tempfile.SpooledTemporaryFile() as file:
+            image.save(file, format="PNG")
+            file.seek(0)
+            data = file.read()
+
+        processed = process_artwork(data, max_size=600, quality=0)
+        self.assertEqual(detect_image_format(processed), "jpg")
+        with artwork_store.Image.open(self.store.get_path(os.path.basename(self.store.put(processed)))) as stored:
+            self.assertEqual(stored.size, (600, 400))
+        self.assertEqual(process_artwork(processed, max_size=600, quality=0), processed)
+
+    def test_album_downloaded_once(self):
+        """Tests that the artwork of an album is downloaded once for all of its tracks"""
+
+        def download(release_group_id, filepath):
+            shutil.copy(ARTWORK_PATH, filepath)
+
+        with patch("mp3_metadata.artwork_store", self.store), patch(
+            "mp3_metadata.download_album_artwork_from_release_id", side_effect=download
+        ) as mock_download, patch("mp3_metadata.TMP_DIR", self.directory):
+            art_paths = set()
+            for track in range(1, 16):
+                metadata = MP3MetaData(band="Avenged Sevenfold", song=f"Song {track}", album="Nightmare", track=track)
+                metadata.release_group_id = "1234"
+                metadata.update_album_art()
+                art_paths.add(metadata.art_path)
+
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(len(art_paths), 1)
+        self.assertEqual(os.path.dirname(art_paths.pop()), join(self.directory, "by-hash"))
+
+    def test_release_group_resolved_once(self):
+        """Tests that songs of an album without a release group share a single download"""
+
+        def download(release_group_id, filepath):
+            shutil.copy(ARTWORK_PATH, filepath)
+
+        def update_album_art(track: int) -> str:
+            metadata = MP3MetaData(band="Avenged Sevenfold", song=f"Song {track}", album="Nightmare", track=track)
+            metadata.update_album_art()
+            return metadata.art_path
+
+        with patch("mp3_metadata.artwork_store", self.store), patch(
+            "mp3_metadata.download_album_artwork_from_release_id", side_effect=download
+        ) as mock_download, patch("mp3_metadata.get_release_group_id", return_value="1234") as mock_lookup, patch(
+            "mp3_metadata.TMP_DIR", self.directory
+        ):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                art_paths = set(executor.map(update_album_art, range(1, 13)))
+
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertLessEqual(mock_lookup.call_count, 4)  # Only songs that started before the artwork was stored
+        self.assertEqual(len(art_paths), 1)
+        self.assertEqual(self.store.get_path_by_alias(release_group_alias("1234")), art_paths.pop())
+
+
+if __name__ == "__main__":
+    unittest.main()
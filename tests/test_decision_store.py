@@ -0,0 +1,108 @@
+"""Tests that interactive decisions are remembered, replayed without asking again, and can be revoked"""
+
+import shutil
+import tempfile
+import unittest
+from os.path import join
+from unittest.mock import patch
+
+import utils
+
+import music_api
+from decision_store import DecisionStore
+from kv_store import KeyValueStore
+from mp3_metadata import MP3MetaData, get_title_suggestion
+from music_api import ReleaseRecording
+
+
+class TestDecisionStore(unittest.TestCase):
+    """Tests DecisionStore, and the prompts that use it"""
+
+    def setUp(self):
+        """Creates an empty store, used instead of the real one"""
+        self.directory = tempfile.mkdtemp()
+        self.decisions = DecisionStore(join(self.directory, "decisions.sqlite3"))
+        self.artist_ids = KeyValueStore(join(self.directory, "artist_ids.sqlite3"))
+
+        # Responses are mocked, don't cache them or wait for the rate limit
+        for patcher in (
+            patch.object(music_api.response_cache, "enabled", False),
+            patch.object(music_api.negative_cache, "enabled", False),
+            patch.object(music_api.request_scheduler, "enabled", False),
+            patch.object(music_api, "artist_ids", self.artist_ids),
+            patch("mp3_metadata.decisions", new=self.decisions),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the store"""
+        self.decisions.close()
+        self.artist_ids.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def test_review_and_revoke(self):
+        """Tests that decisions are kept across instances, and that revoked decisions are forgotten"""
+        recording = ReleaseRecording("Phobia", 2006, "Breaking Benjamin", 2, "Album", release_group_id="1234")
+        self.decisions.set_title("Linkin Park: Papercut", "", "Linkin Park - Papercut")
+        self.decisions.set_recording("Breaking Benjamin", "The Diary of Jane", recording)
+        self.decisions.set_recording("Skillet", "Dominion", None)
+        self.decisions.set_recording("", "Dominion", recording)
+
+        other = DecisionStore(self.decisions.db_path)
+        self.addCleanup(other.close)
+        self.assertEqual(other.get_title("Linkin Park: Papercut"), "Linkin Park - Papercut")
+        self.assertIsNone(other.get_title("Linkin Park: Papercut", "Linkin Park"))
+        has_decision, decided_recording = other.get_recording("breaking  benjamin", "The Diary Of Jane")
+        self.assertTrue(has_decision)
+        self.assertEqual(
+            (decided_recording.album, decided_recording.year, decided_recording.track, decided_recording.type),
+            ("Phobia", 2006, 2, "album"),
+        )
+        self.assertEqual(decided_recording.release_group_id, "1234")
+        self.assertEqual(other.get_recording("Skillet", "Dominion"), (True, None))
+        self.assertEqual(other.get_recording("Skillet", "Monster"), (False, None))
+
+        descriptions = dict(other.review())
+        self.assertEqual(len(descriptions), 3)
+        key = other.recording_key("Breaking Benjamin", "The Diary of Jane")
+        self.assertEqual(descriptions[key], "Album: Breaking Benjamin - The Diary of Jane -> Phobia:2 (2006)")
+        self.assertTrue(other.revoke(key))
+        self.assertFalse(other.revoke(key))
+        self.assertEqual(other.get_recording("Breaking Benjamin", "The Diary of Jane"), (False, None))
+
+    @patch(target="mp3_metadata.get_user_input", side_effect=[False, "Starset - Monster"])
+    def test_title_decision(self, mocked_get_user_input):
+        """Tests that a title is asked about once"""
+        self.assertEqual(
+            get_title_suggestion("Monster", channel="starsetonline", interactive=True), ("Starset", "Monster")
+        )
+        self.assertEqual(mocked_get_user_input.call_count, 2)
+
+        self.assertEqual(
+            get_title_suggestion("Monster", channel="starsetonline", interactive=True), ("Starset", "Monster")
+        )
+        self.assertEqual(mocked_get_user_input.call_count, 2)
+
+    @patch(target="mp3_metadata.print_suggestions")
+    @patch(target="requests.Session.get", side_effect=utils.mocked_requests_get)
+    def test_recording_decision(self, mocked_requests, _):
+        """Tests that a recording is chosen once, and that the choice is replayed without any lookup"""
+        with patch("mp3_metadata.choose_recording", side_effect=lambda recordings, index, title: recordings[-1]):
+            metadata = MP3MetaData.from_title(title="Skillet - Dominion")
+            metadata.update_missing_fields(interactive=True)
+        requests_count = mocked_requests.call_count
+        chosen = (metadata.album, metadata.year, metadata.track)
+
+        with patch("mp3_metadata.choose_recording") as mocked_choose_recording:
+            metadata = MP3MetaData.from_title(title="Skillet - Dominion")
+            metadata.update_missing_fields(interactive=True)
+        mocked_choose_recording.assert_not_called()
+        self.assertEqual(mocked_requests.call_count, requests_count)
+        self.assertEqual((metadata.album, metadata.year, metadata.track), chosen)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,39 @@
 """Tests functions related to songs downloading """
 
 import os
+import shutil
+import tempfile
+import threading
 import unittest
+from os.path import isfile, join
+from typing import Any, Dict, List, Tuple
+from unittest.mock import MagicMock, patch
 
-from mp3_download import download_song, get_playlist_songs
+import utils
+
+from decision_store import decisions
+from mp3_download import (
+    FFmpegExtractTaggedAudioPP,
+    SongDownloader,
+    download_song,
+    download_songs,
+    download_xprimental,
+    get_playlist_songs,
+    iter_playlist_songs,
+)
 from mp3_metadata import MP3MetaData
 
 
 class TestDownloadSong(unittest.TestCase):
     """Tests songs downloading and playlist retrieval"""
 
+    def setUp(self):
+        """Don't use (or remember) title decisions of the library"""
+        patcher = patch.object(decisions, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return super().setUp()
+
     def test_get_playlist_songs1(self):
         """Tests the get_playlist_songs function"""
         playlist_url = "https://www.youtube.com/playlist?list=PLGN96WAC2Fv2DNdIbAHQsGVO3IxNawtu4"
@@ -78,6 +102,25 @@ class TestDownloadSong(unittest.TestCase):
         self.assertEqual(song.year, 2016)
         self.assertEqual(song.track, 5)
 
+    @patch("mp3_download.youtube_dl.YoutubeDL")
+    def test_iter_playlist_songs(self, mocked_youtube_dl):
+        """Tests that songs are yielded as soon as they're resolved, before the next songs are looked up"""
+        entries = [
+            {"title": f"Artist - Song {index}", "uploader": "Artist", "url": f"https://www.youtube.com/watch?v={index}"}
+            for index in range(1, 6)
+        ]
+        ydl = MagicMock()
+        ydl.extract_info.return_value = {"entries": entries}
+        mocked_youtube_dl.return_value.__enter__.return_value = ydl
+
+        with patch("mp3_download.MP3MetaData.from_video", wraps=MP3MetaData.from_video) as mocked_from_video:
+            songs = iter_playlist_songs(start_index=2, end_index=4, interactive=False, update_album=False)
+            metadata, url = next(songs)
+            self.assertEqual(mocked_from_video.call_count, 1)
+            self.assertEqual((metadata.title, url), ("Artist - Song 2", "https://www.youtube.com/watch?v=2"))
+            self.assertEqual([metadata.song for metadata, _ in songs], ["Song 3", "Song 4"])
+            self.assertEqual(mocked_from_video.call_count, 3)
+
     @unittest.skip("Fails on CI due to bot suspicion")
     def test_download_song(self):
         """Tests the download_song function"""
@@ -94,3 +137,232 @@ class TestDownloadSong(unittest.TestCase):
         self.assertEqual(metadata.track, 1)
 
         os.remove(file_path)
+
+
+class TestDownloadSongs(unittest.TestCase):
+    """Tests concurrent downloading of many songs, with fetching and transcoding mocked"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.out_path = join(self.directory, "mp3")
+        os.mkdir(self.out_path)
+        self.fetched_paths = []
+        self.fetch_threads = set()
+        self.transcode_threads = set()
+
+        # Don't use (or remember) title decisions of the library
+        patcher = patch.object(decisions, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def fetch(self, song_url: str) -> Tuple[str, Dict[str, Any]]:
+        """Fakes fetching the audio of a song, failing for URLs of missing videos"""
+        self.fetch_threads.add(threading.get_ident())
+        if "missing" in song_url:
+            raise ValueError("Video unavailable")
+        audio_path = join(self.directory, song_url.rsplit("=", 1)[-1] + ".webm")
+        utils.create_silent_mp3(audio_path)
+        self.fetched_paths.append(audio_path)
+        return audio_path, {}
+
+    def transcode_to_mp3(self, audio_path: str, mp3_path: str, _quality: str, **_):
+        """Fakes transcoding, the fetched audio is already an mp3"""
+        self.transcode_threads.add(threading.get_ident())
+        shutil.move(audio_path, mp3_path)
+
+    def test_download_songs(self):
+        """Tests that songs are downloaded and tagged, and that failures don't stop the other songs"""
+        songs = (
+            (MP3MetaData(band="Artist", song=f"Song {index}", track=index), url)
+            for index, url in enumerate(
+                [
+                    "https://www.youtube.com/watch?v=1",
+                    "https://www.youtube.com/watch?v=missing",
+                    "not a url",
+                    "https://www.youtube.com/watch?v=3",
+                    "https://www.youtube.com/watch?v=4",
+                ],
+                start=1,
+            )
+        )
+        with patch.object(SongDownloader, "fetch", side_effect=self.fetch), patch(
+            "mp3_download.transcode_to_mp3", side_effect=self.transcode_to_mp3
+        ):
+            results = download_songs(songs, out_path=self.out_path, fetch_workers=2, transcode_workers=2, queue_size=1)
+
+        self.assertEqual([result.succeeded for result in results], [True, False, False, True, True])
+        self.assertEqual([result.metadata.track for result in results], [1, 2, 3, 4, 5])
+        self.assertIn("Video unavailable", str(results[1].error))
+        self.assertIsInstance(results[2].error, ValueError)
+        for result in (results[0], results[3], results[4]):
+            self.assertEqual(result.file_path, join(self.out_path, f"{result.metadata.title}.mp3"))
+            metadata = MP3MetaData.from_file(result.file_path)
+            self.assertEqual((metadata.band, metadata.song), ("Artist", result.metadata.song))
+            self.assertEqual(metadata.track, result.metadata.track)
+
+        self.assertFalse(any(isfile(audio_path) for audio_path in self.fetched_paths))
+        self.assertNotIn(threading.get_ident(), self.fetch_threads | self.transcode_threads)
+
+    def test_transcode_failure(self):
+        """Tests that audio that failed to be transcoded is removed"""
+        songs = [(MP3MetaData(band="Artist", song="Song"), "https://www.youtube.com/watch?v=1")]
+        with patch.object(SongDownloader, "fetch", side_effect=self.fetch), patch(
+            "mp3_download.transcode_to_mp3", side_effect=OSError("ffmpeg not found")
+        ):
+            results = download_songs(songs, out_path=self.out_path)
+
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0].succeeded)
+        self.assertEqual(results[0].file_path, "")
+        self.assertFalse(any(isfile(audio_path) for audio_path in self.fetched_paths))
+        self.assertEqual(os.listdir(self.out_path), [])
+
+    def test_prompts_before_downloading(self):
+        """Tests that in interactive mode, the songs of a playlist are resolved before the downloads start"""
+        songs = [(MP3MetaData(band="Artist", song="Song"), "https://www.youtube.com/watch?v=1")]
+        for interactive in (True, False):
+            with patch("mp3_download.iter_playlist_songs", return_value=iter(songs)), patch(
+                "mp3_download.download_songs"
+            ) as mocked_download_songs:
+                download_xprimental(interactive=interactive)
+            with self.subTest(interactive=interactive):
+                self.assertEqual(isinstance(mocked_download_songs.call_args.args[0], list), interactive)
+
+    @patch("mp3_download.youtube_dl.YoutubeDL")
+    def test_song_downloader(self, mocked_youtube_dl):
+        """Tests that a downloader reuses its YoutubeDL, and takes the metadata from the video when it's not given"""
+        ydl = mocked_youtube_dl.return_value
+        ydl.extract_info.side_effect = lambda url, download: {"title": "Song", "uploader": "Artist - Topic"}
+
+        def prepare_filename(info, outtmpl=None):
+            if outtmpl is not None:
+                return outtmpl.replace("%(title)s", info["title"])
+            return self.fetch(f"https://www.youtube.com/watch?v={info['title']}")[0]
+
+        ydl.prepare_filename.side_effect = prepare_filename
+
+        with patch("mp3_download.transcode_to_mp3", side_effect=self.transcode_to_mp3):
+            with SongDownloader(
+                out_path=self.out_path, audio_format="worstaudio", fetch_path=self.directory
+            ) as downloader:
+                first_path = downloader.download(
+                    "https://www.youtube.com/watch?v=1", interactive=False, update_album=False
+                )
+                second_path = downloader.download(
+                    "https://www.youtube.com/watch?v=2", metadata=MP3MetaData(band="Other Artist", song="Other Song")
+                )
+
+        mocked_youtube_dl.assert_called_once()
+        self.assertEqual(mocked_youtube_dl.call_args.args[0]["format"], "worstaudio")
+        self.assertTrue(mocked_youtube_dl.call_args.args[0]["outtmpl"].startswith(self.directory))
+        ydl.close.assert_called_once()
+        self.assertEqual(first_path, join(self.out_path, "Song.mp3"))
+        self.assertEqual(second_path, join(self.out_path, "Other Artist - Other Song.mp3"))
+        self.assertEqual(MP3MetaData.from_file(first_path).band, "Artist")
+        self.assertFalse(any(isfile(audio_path) for audio_path in self.fetched_paths))
+
+    @patch("mp3_download.transcode_to_mp3")
+    def test_illegal_characters(self, mocked_transcode_to_mp3):
+        """Tests that downloads are named after the title, with characters that are illegal in file names replaced"""
+        audio_path, _ = self.fetch("https://www.youtube.com/watch?v=1")
+        metadata = MP3MetaData(band="AC/DC", song="Who Made Who?")
+        mocked_transcode_to_mp3.side_effect = self.transcode_to_mp3
+        with SongDownloader(out_path=self.out_path, embed_tags=True) as downloader:
+            mp3_path = downloader.transcode(audio_path, metadata)
+        self.assertEqual(mp3_path, join(self.out_path, "AC_DC - Who Made Who_.mp3"))
+        self.assertTrue(isfile(mp3_path))
+
+    def run_tagged_postprocessor(self, ext: str, codec: str, **kwargs) -> Tuple[List[str], List[str]]:
+        """Runs FFmpegExtractTaggedAudioPP on fetched audio (without ffmpeg),
+        and returns the ffmpeg inputs and options
+        """
+        audio_path = join(self.directory, f"1.{ext}")
+        utils.create_silent_mp3(audio_path)
+        postprocessor = FFmpegExtractTaggedAudioPP(**kwargs)
+        with patch.object(postprocessor, "get_audio_codec", return_value=codec), patch.object(
+            postprocessor,
+            "run_ffmpeg_multiple_files",
+            side_effect=lambda inputs, out_path, opts: shutil.copy(inputs[0], out_path),
+        ) as mocked_run_ffmpeg:
+            files_to_delete, info = postprocessor.run({"filepath": audio_path, "ext": ext})
+
+        self.assertEqual(info["filepath"], join(self.directory, "1.mp3"))
+        self.assertTrue(isfile(info["filepath"]))
+        self.assertEqual(files_to_delete, [] if ext == "mp3" else [audio_path])
+        mocked_run_ffmpeg.assert_called_once()
+        inputs, _, options = mocked_run_ffmpeg.call_args.args
+        self.assertEqual(inputs[0], audio_path)
+        return inputs, options
+
+    def test_tagged_postprocessor(self):
+        """Tests that tags and artwork are written while transcoding"""
+        art_path = join(self.directory, "cover.png")
+        shutil.copy(join(os.path.dirname(__file__), "outputs", "img", "Avenged Sevenfold - Nightmare.png"), art_path)
+        metadata = MP3MetaData(band="Artist", song="Song", album="Album", year=2020, track=3, art_path=art_path)
+
+        inputs, options = self.run_tagged_postprocessor("webm", "opus", metadata=metadata, preferredquality="320")
+        self.assertEqual(inputs[1:], [art_path])
+        self.assertEqual(options[options.index("-acodec") + 1], "libmp3lame")
+        self.assertEqual(options[options.index("-b:a") + 1], "320.0k")
+        tags = [options[index + 1] for index, option in enumerate(options) if option == "-metadata"]
+        self.assertEqual(
+            tags, ["title=Song", "artist=Artist", "album_artist=Artist", "date=2020", "album=Album", "track=3"]
+        )
+        self.assertIn("attached_pic", options)
+        self.assertEqual(options[options.index("-id3v2_version") + 1], "3")
+
+    def test_tagged_postprocessor_artwork_format(self):
+        """Tests that artwork that isn't JPEG or PNG is converted to PNG, and that unknown formats aren't embedded"""
+        art_path = join(self.directory, "cover.webp")
+        metadata = MP3MetaData(band="Artist", song="Song", art_path=art_path)
+        with open(art_path, "wb") as art_file:
+            art_file.write(b"RIFF\x00\x00\x00\x00WEBPVP8 ")
+        inputs, options = self.run_tagged_postprocessor("webm", "opus", metadata=metadata)
+        self.assertEqual(inputs[1:], [art_path])
+        self.assertEqual(options[options.index("-c:v") + 1], "png")
+
+        with open(art_path, "wb") as art_file:
+            art_file.write(b"\xff\xd8\xff\xe0")
+        _, options = self.run_tagged_postprocessor("webm", "opus", metadata=metadata)
+        self.assertEqual(options[options.index("-c:v") + 1], "copy")
+
+        with open(art_path, "wb") as art_file:
+            art_file.write(b"not an image")
+        inputs, options = self.run_tagged_postprocessor("webm", "opus", metadata=metadata)
+        self.assertEqual(len(inputs), 1)
+        self.assertNotIn("attached_pic", options)
+        self.assertIn("artist=Artist", options)
+
+    def test_tagged_postprocessor_mp3(self):
+        """Tests that mp3 audio is copied (or re-encoded), and tagged"""
+        metadata = MP3MetaData(band="Artist", song="Song")
+        inputs, options = self.run_tagged_postprocessor("mp3", "mp3", metadata=metadata)
+        self.assertEqual(len(inputs), 1)
+        self.assertEqual(options[options.index("-acodec") + 1], "copy")
+        self.assertNotIn("-map 1:0", " ".join(options))
+        self.assertIn("artist=Artist", options)
+
+        _, options = self.run_tagged_postprocessor("mp3", "mp3", metadata=metadata, keep_codec=False)
+        self.assertEqual(options[options.index("-acodec") + 1], "libmp3lame")
+
+        _, options = self.run_tagged_postprocessor("webm", "opus")
+        self.assertNotIn("-metadata", options)
+
+    @patch("mp3_download.transcode_to_mp3")
+    def test_embed_tags(self, mocked_transcode_to_mp3):
+        """Tests that songs aren't rewritten to tag them when tags are embedded while transcoding"""
+        audio_path, _ = self.fetch("https://www.youtube.com/watch?v=1")
+        metadata = MP3MetaData(band="Artist", song="Song")
+        mocked_transcode_to_mp3.side_effect = self.transcode_to_mp3
+        with SongDownloader(out_path=self.out_path, embed_tags=True) as downloader, patch.object(
+            MP3MetaData, "apply_on_file"
+        ) as mocked_apply_on_file:
+            mp3_path = downloader.transcode(audio_path, metadata)
+        mocked_apply_on_file.assert_not_called()
+        self.assertIs(mocked_transcode_to_mp3.call_args.kwargs["metadata"], metadata)
+        self.assertEqual(mp3_path, join(self.out_path, "Artist - Song.mp3"))
@@ -1,12 +1,28 @@
 """Tests that the method used to suggest a fixed title works as expected"""
+
+import json
 import unittest
+from os.path import abspath, dirname, join
+from unittest.mock import patch
 
+from decision_store import decisions
 from mp3_metadata import MP3MetaData
+from title_normalizer import suggest_titles
+
+# Real video titles (and their channels), with the titles suggested for them by the previous implementation
+CORPUS_PATH = join(dirname(abspath(__file__)), "outputs", "title_suggestions.json")
 
 
 class TestFixTitle(unittest.TestCase):
     """Tests that verify title fixing on creation"""
 
+    def setUp(self):
+        """Don't use (or remember) title decisions of the library"""
+        patcher = patch.object(decisions, "enabled", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return super().setUp()
+
     def test_fix_title_no_changes(self):
         """Tests valid metadata creation"""
         m1 = MP3MetaData.from_video(title="Band - Title", channel="Evil Channel >=D")
@@ -84,6 +100,20 @@ class TestFixTitle(unittest.TestCase):
         )
         self.assertEqual(m2.title, "My Chemical Romance - Dead!")
 
+    def test_suggest_titles(self):
+        """Tests that the batch API suggests the same titles as the previous implementation"""
+        with open(CORPUS_PATH, "r", encoding="utf-8") as file:
+            corpus = json.load(file)
+        expected = [(entry["band"], entry["song"]) for entry in corpus]
+        self.assertEqual(suggest_titles([(entry["title"], entry["channel"]) for entry in corpus]), expected)
+        self.assertEqual(
+            suggest_titles(["Linkin Park - Papercut (Official HD Video)", "No Artist"]),
+            [
+                ("Linkin Park", "Papercut"),
+                ("", ""),
+            ],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+"""Tests the fast ID3 reader against music_tag"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+from unittest.mock import patch
+
+import music_tag
+import utils
+
+from id3_reader import read_id3_tags
+from mp3_metadata import MP3MetaData
+
+ARTWORK_PATH = join(os.path.dirname(__file__), "outputs", "img", "Rise Against - Appeal to Reason.png")
+
+
+class TestID3Reader(unittest.TestCase):
+    """Tests read_id3_tags"""
+
+    def setUp(self):
+        """Creates a tagged mp3 file"""
+        self.directory = tempfile.mkdtemp()
+        self.file_path = join(self.directory, "Rise Against - Audience of One.mp3")
+        utils.create_silent_mp3(self.file_path)
+        mp3_file = music_tag.load_file(self.file_path)
+        mp3_file["title"] = "Audience of One"
+        mp3_file["artist"] = "Rise Against"
+        mp3_file["album"] = "Appeal to Reason"
+        mp3_file["year"] = 2008
+        mp3_file["tracknumber"] = 8
+        with open(ARTWORK_PATH, "rb") as img:
+            mp3_file["artwork"] = img.read()
+        mp3_file.save()
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the mp3 file"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def test_read_tags(self):
+        """Tests that the fast reader reads the same tags as music_tag"""
+        tags = read_id3_tags(self.file_path)
+        self.assertIsNotNone(tags)
+        mp3_file = music_tag.load_file(self.file_path)
+        self.assertEqual(tags.title, str(mp3_file["title"]))
+        self.assertEqual(tags.artist, str(mp3_file["artist"]))
+        self.assertEqual(tags.album, str(mp3_file["album"]))
+        self.assertEqual(tags.year, int(mp3_file["year"]))
+        self.assertEqual(tags.track, int(mp3_file["tracknumber"]))
+        self.assertTrue(tags.has_artwork)
+
+    def test_from_file(self):
+        """Tests that MP3MetaData.from_file gets the same metadata with and without the fast reader"""
+        fast = MP3MetaData.from_file(self.file_path)
+        with patch("mp3_metadata.read_id3_tags", return_value=None):
+            full = MP3MetaData.from_file(self.file_path)
+        self.assertEqual(
+            (fast.band, fast.song, fast.album, fast.year, fast.track, fast.art_configured),
+            (full.band, full.song, full.album, full.year, full.track, full.art_configured),
+        )
+
+    def test_fallback(self):
+        """Tests that files without a (supported) ID3v2 tag are left for music_tag"""
+        untagged_path = join(self.directory, "untagged.mp3")
+        utils.create_silent_mp3(untagged_path)
+        self.assertIsNone(read_id3_tags(untagged_path))
+
+        # ID3v2.2
+        with open(self.file_path, "r+b") as file:
+            file.seek(3)
+            file.write(b"\x02")
+        self.assertIsNone(read_id3_tags(self.file_path))
+
+    def test_id3v1_fallback(self):
+        """Tests that files missing ID3v2 fields that the ID3v1 tag may have are left for music_tag"""
+        mp3_file = music_tag.load_file(self.file_path)
+        del mp3_file["album"]
+        mp3_file.save()
+        self.assertIsNotNone(read_id3_tags(self.file_path))
+
+        with open(self.file_path, "ab") as file:
+            file.write(
+                b"TAG"
+                + b"Audience of One".ljust(30, b"\0")
+                + b"Rise Against".ljust(30, b"\0")
+                + b"Appeal to Reason".ljust(30, b"\0")
+                + b"2008"
+                + b"\0" * 28
+                + b"\0\x08\xff"
+            )
+        self.assertIsNone(read_id3_tags(self.file_path))
+        self.assertEqual(MP3MetaData.from_file(self.file_path).album, "Appeal to Reason")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Tests the persistent key-value store, and the lookups memoized with it"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+from unittest.mock import patch
+
+import music_api
+from kv_store import KeyValueStore
+
+
+class TestKeyValueStore(unittest.TestCase):
+    """Tests KeyValueStore"""
+
+    def setUp(self):
+        """Creates an empty store"""
+        self.directory = tempfile.mkdtemp()
+        self.store = KeyValueStore(join(self.directory, "store.sqlite3"))
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the store"""
+        self.store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def test_persistence(self):
+        """Tests that values are kept across instances, and can be exported and loaded"""
+        self.store.set("b", {"id": "1234"})
+        self.store.set("a", ["x", 1])
+        self.assertTrue(self.store.delete("b"))
+        self.assertFalse(self.store.delete("b"))
+        self.store.set("b", "5678")
+
+        other = KeyValueStore(self.store.db_path)
+        self.addCleanup(other.close)
+        self.assertEqual(other.items(), [("a", ["x", 1]), ("b", "5678")])
+        self.assertEqual(other.get("missing", "default"), "default")
+
+        export_path = join(self.directory, "export.json")
+        self.assertEqual(other.export(export_path), 2)
+        self.assertEqual(self.store.clear(), 2)
+        self.assertIsNone(self.store.get("a"))
+        self.assertEqual(self.store.load(export_path), 2)
+        self.assertEqual(self.store.get("a"), ["x", 1])
+
+    def test_get_or_compute(self):
+        """Tests that concurrent lookups of the same key are computed once, and that None isn't stored"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            values = list(executor.map(lambda _: self.store.get_or_compute("key", compute), range(8)))
+        self.assertEqual(values, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+
+        self.assertIsNone(self.store.get_or_compute("none", lambda: None))
+        self.assertEqual(self.store.get_or_compute("none", compute), "value")
+
+
+class TestReleaseGroupMemo(unittest.TestCase):
+    """Tests that release groups are looked up once per album"""
+
+    def test_get_release_group_id(self):
+        """Tests that looking up the release group of the same album again doesn't send a request"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        store = KeyValueStore(join(directory, "release_groups.sqlite3"))
+        self.addCleanup(store.close)
+        response = {"releases": [{"release-group": {"id": "1234", "title": "Nightmare"}}]}
+
+        with patch.object(music_api, "release_group_ids", store), patch(
+            "music_api._get_request", return_value=response
+        ) as mock_request:
+            self.assertEqual(music_api.get_release_group_id("Avenged Sevenfold", "Nightmare"), "1234")
+            self.assertEqual(music_api.get_release_group_id("avenged sevenfold ", "NIGHTMARE"), "1234")
+            self.assertIsNone(music_api.get_release_group_id("Avenged Sevenfold", "Missing"))
+            self.assertEqual(mock_request.call_count, 2)
+
+        self.assertTrue(os.path.isfile(store.db_path))
+        self.assertEqual(store.items(), [(music_api.release_group_key("Avenged Sevenfold", "Nightmare"), "1234")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Tests the staged (scan, resolve, review, apply) metadata update of a directory"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join
+from unittest.mock import patch
+
+import utils
+
+import music_api
+from decision_store import DecisionStore, decisions
+from kv_store import KeyValueStore
+from library_manifest import LibraryManifest
+from library_pipeline import update_library
+from mp3_metadata import MP3MetaData
+
+SONGS = {
+    "Skillet - Dominion": ("Dominion", 2022, 3),
+    "Smash Into Pieces - Wake Up": ("Arcadia", 2020, 2),
+    "Dragonforce - Cry Thunder": ("The Power Within", 2012, 3),
+}
+
+
+class TestLibraryPipeline(unittest.TestCase):
+    """Tests update_library"""
+
+    def setUp(self):
+        """Creates a directory with untagged mp3 files"""
+        self.base_path = tempfile.mkdtemp()
+        for song in SONGS:
+            utils.create_silent_mp3(join(self.base_path, f"{song}.mp3"))
+        self.manifest = LibraryManifest(join(self.base_path, "manifest.sqlite3"))
+        self.artist_ids = KeyValueStore(join(self.base_path, "artist_ids.sqlite3"))
+
+        # Responses are mocked, don't cache them or wait for the rate limit
+        for patcher in (
+            patch.object(music_api.response_cache, "enabled", False),
+            patch.object(music_api.negative_cache, "enabled", False),
+            patch.object(decisions, "enabled", False),
+            patch.object(music_api.request_scheduler, "enabled", False),
+            patch(target="requests.Session.get", side_effect=utils.mocked_requests_get),
+            patch("library_pipeline.library_manifest", new=self.manifest),
+            patch.object(music_api, "artist_ids", self.artist_ids),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the directory"""
+        self.manifest.close()
+        self.artist_ids.close()
+        shutil.rmtree(self.base_path, ignore_errors=True)
+        return super().tearDown()
+
+    def assert_tags(self):
+        """Asserts that the files were tagged as expected"""
+        for song, (album, year, track) in SONGS.items():
+            metadata = MP3MetaData.from_file(join(self.base_path, f"{song}.mp3"))
+            self.assertEqual((metadata.album, metadata.year, metadata.track), (album, year, track))
+
+    def test_non_interactive(self):
+        """Tests that all the files are updated without review"""
+        results = update_library(self.base_path, interactive=False)
+        self.assertEqual(len(results), len(SONGS))
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assert_tags()
+
+        # Nothing changed since the last run
+        results = update_library(self.base_path, interactive=False)
+        self.assertTrue(all(result.skipped for result in results))
+
+    def test_skip_unchanged(self):
+        """Tests that files are skipped if their tags haven't changed, and they're processed with the same options"""
+        update_library(self.base_path, interactive=False)
+
+        # Touched, but the tags are the same
+        for song in SONGS:
+            os.utime(join(self.base_path, f"{song}.mp3"), ns=(0, 0))
+        results = update_library(self.base_path, interactive=False)
+        self.assertTrue(all(result.skipped for result in results))
+
+        # Other options
+        results = update_library(self.base_path, interactive=False, keep_current_metadata=True)
+        self.assertFalse(any(result.skipped for result in results))
+
+    def test_deferred_review(self):
+        """Tests that only ambiguous files are reviewed, after all the files were resolved"""
+        lookups_before_review = []
+
+        with patch("library_pipeline.get_track_info", wraps=music_api.get_track_info) as mocked_get_track_info:
+
+            def choose_suggested(recordings, suggested_recording_index, title=""):
+                lookups_before_review.append(mocked_get_track_info.call_count)
+                return recordings[suggested_recording_index]
+
+            with patch("library_pipeline.choose_recording", side_effect=choose_suggested), patch(
+                "library_pipeline.print_suggestions"
+            ), patch("library_pipeline.is_suggestion_ambiguous", side_effect=lambda recordings, index: index == 0):
+                update_library(self.base_path, interactive=True)
+
+        self.assertTrue(0 < len(lookups_before_review) < len(SONGS))
+        self.assertTrue(all(lookups == len(SONGS) for lookups in lookups_before_review))
+        self.assert_tags()
+
+    def test_review_with_recorded_responses(self):
+        """Tests which files are reviewed with the actual heuristic, and that files that can't be looked up aren't"""
+        base_path = join(self.base_path, "review")
+        os.mkdir(base_path)
+        for song in (
+            "Bad Wolves - Zombie",
+            "Avenged Sevenfold - Carry On",
+            "Untitled",
+            "Rise Against - Audience of One",
+        ):
+            utils.create_silent_mp3(join(base_path, f"{song}.mp3"))
+        utils.create_silent_mp3(join(base_path, "Skillet - Dominion.mp3"))
+        MP3MetaData("Skillet", "Dominion", album="Old Album", year=2000, track=9).apply_on_file(
+            join(base_path, "Skillet - Dominion.mp3")
+        )
+        store = DecisionStore(join(self.base_path, "decisions.sqlite3"))
+        self.addCleanup(store.close)
+        reviewed = []
+
+        def choose(recordings, suggested_recording_index, title=""):
+            reviewed.append(title)
+            return None if title == "Dominion" else recordings[suggested_recording_index]
+
+        def get_track_info(artist, title):
+            return [] if title == "Audience of One" else music_api.get_track_info(artist, title)
+
+        with patch("library_pipeline.choose_recording", side_effect=choose), patch(
+            "library_pipeline.print_suggestions"
+        ), patch("library_pipeline.get_track_info", side_effect=get_track_info), patch(
+            "library_pipeline.decisions", new=store
+        ), patch(
+            "music_api._save_debug_response"
+        ):
+            results = update_library(base_path, interactive=True)
+
+        self.assertTrue(all(result.succeeded for result in results))
+        # Zombie is ambiguous, and Dominion already has (different) album metadata
+        self.assertEqual(sorted(reviewed), ["Dominion", "Zombie"])
+        self.assertEqual(MP3MetaData.from_file(join(base_path, "Skillet - Dominion.mp3")).album, "Old Album")
+        self.assertEqual(MP3MetaData.from_file(join(base_path, "Avenged Sevenfold - Carry On.mp3")).album, "Carry On")
+        self.assertEqual(MP3MetaData.from_file(join(base_path, "Untitled.mp3")).album, "")
+        self.assertEqual(len(store.review()), 2)
+        # Files that weren't resolved are processed again on the next run
+        self.assertIsNone(self.manifest.get(join(base_path, "Untitled.mp3")))
+        self.assertIsNone(self.manifest.get(join(base_path, "Rise Against - Audience of One.mp3")))
+        self.assertIsNotNone(self.manifest.get(join(base_path, "Avenged Sevenfold - Carry On.mp3")))
+        self.assertEqual(store.get_recording("Skillet", "Dominion"), (True, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,350 @@
+"""Tests the plumbing of requests to MusicBrainz (sessions, artist ID index, asyncio client),
+and the parsing of responses into album candidates
+"""
+
+import asyncio
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from os.path import abspath, basename, dirname, join
+from unittest.mock import patch
+
+import utils
+
+import music_api
+from config import MUSICBRAINZ_SEARCH_LIMIT
+from kv_store import KeyValueStore
+from mp3_metadata import MP3MetaData
+from music_api_async import AsyncMusicClient
+from request_scheduler import RequestScheduler, TokenBucket
+from response_cache import NegativeCache, ResponseCache
+
+
+class TestSession(unittest.TestCase):
+    """Tests the shared HTTP session used for API requests"""
+
+    def test_session_per_thread(self):
+        """Tests that each thread gets its own session, all sharing the same connection pools"""
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(music_api.get_session()))
+        thread.start()
+        thread.join()
+
+        session = music_api.get_session()
+        self.assertIs(session, music_api.get_session())
+        self.assertIsNot(session, sessions[0])
+        self.assertIs(
+            session.get_adapter("https://musicbrainz.org"), sessions[0].get_adapter("https://musicbrainz.org")
+        )
+        self.assertEqual(session.headers["User-Agent"], music_api.headers["User-Agent"])
+
+    def test_configure_session(self):
+        """Tests that reconfiguring the pools replaces the session of the thread"""
+        session = music_api.get_session()
+        music_api.configure_session(pool_connections=2, pool_maxsize=2)
+        self.addCleanup(music_api.configure_session)
+        self.assertIsNot(session, music_api.get_session())
+
+
+class TestArtistIds(unittest.TestCase):
+    """Tests the artist ID index used by the fallback search"""
+
+    def setUp(self):
+        """Creates an empty index"""
+        self.directory = tempfile.mkdtemp()
+        self.artist_ids = KeyValueStore(join(self.directory, "artist_ids.sqlite3"))
+        for patcher in (
+            patch.object(music_api, "artist_ids", self.artist_ids),
+            patch.object(music_api.negative_cache, "enabled", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the index"""
+        self.artist_ids.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    @staticmethod
+    def fake_get_request(url: str, *args, **kwargs):
+        """Finds the artist only by ID, as for artists whose official name is in another language"""
+        if "/artist/" in url:
+            return {"count": 1, "artists": [{"id": "ishiwatari-id"}]}
+        fields = utils.parse_search_query(url)
+        if "arid" not in fields:
+            return {"count": 0, "recordings": []}
+        title = fields["recording"]
+        return {
+            "count": 1,
+            "recordings": [
+                {
+                    "title": title,
+                    "artist-credit": [{"artist": {"name": "石渡太輔"}}],
+                    "releases": [{"title": "Guilty Gear", "date": "1998", "release-group": {"id": "rg"}}],
+                }
+            ],
+        }
+
+    def test_fallback_uses_index(self):
+        """Tests that the artist is searched once, and later fallbacks use its stored ID"""
+        with patch("music_api._get_request", side_effect=self.fake_get_request) as mock_request:
+            recordings = music_api.get_track_info("Daisuke Ishiwatari", "Keep Yourself Alive")
+            self.assertEqual([recording.album for recording in recordings], ["Guilty Gear"])
+            self.assertEqual(recordings[0].artist, "Daisuke Ishiwatari")
+            self.assertEqual(mock_request.call_count, 3)
+
+            music_api.get_track_info("daisuke  ishiwatari", "Holy Orders")
+            self.assertEqual(mock_request.call_count, 5)
+
+        export_path = join(self.directory, "artist_ids.json")
+        self.assertEqual(self.artist_ids.export(export_path), 1)
+        other = KeyValueStore(join(self.directory, "other.sqlite3"))
+        self.addCleanup(other.close)
+        self.assertEqual(other.load(export_path), 1)
+        self.assertEqual(other.get("daisuke ishiwatari"), "ishiwatari-id")
+        self.assertTrue(os.path.isfile(export_path))
+
+
+class TestAsyncMusicClient(unittest.IsolatedAsyncioTestCase):
+    """Tests the asyncio client, with the HTTP session mocked (so requests go through its caches and rate limit)"""
+
+    def setUp(self):
+        """Creates empty caches and a local rate limit, used instead of the real ones"""
+        self.directory = tempfile.mkdtemp()
+        self.response_cache = ResponseCache(join(self.directory, "responses.sqlite3"))
+        self.negative_cache = NegativeCache(join(self.directory, "misses.sqlite3"))
+        self.artist_ids = KeyValueStore(join(self.directory, "artist_ids.sqlite3"))
+        self.release_group_ids = KeyValueStore(join(self.directory, "release_groups.sqlite3"))
+        self.request_scheduler = RequestScheduler(TokenBucket(rate=1000, capacity=1000))
+        self.session = utils.MockedAsyncSession()
+        self.cache_threads = set()
+        cache_get = self.response_cache.get
+
+        def get_from_cache(url: str):
+            self.cache_threads.add(threading.get_ident())
+            return cache_get(url)
+
+        for patcher in (
+            patch.object(music_api, "response_cache", self.response_cache),
+            patch.object(music_api, "negative_cache", self.negative_cache),
+            patch.object(music_api, "artist_ids", self.artist_ids),
+            patch.object(music_api, "release_group_ids", self.release_group_ids),
+            patch.object(music_api, "request_scheduler", self.request_scheduler),
+            patch.object(self.response_cache, "get", side_effect=get_from_cache),
+            patch.object(AsyncMusicClient, "_get_session", return_value=self.session),
+            patch("music_api._save_debug_response"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the caches"""
+        for store in (self.response_cache, self.negative_cache, self.artist_ids, self.release_group_ids):
+            store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    async def test_get_track_info_many(self):
+        """Tests that the batch lookup returns the same candidates as single lookups, from the response cache"""
+        pairs = [("Skillet", "Dominion"), ("Smash Into Pieces", "Wake Up"), ("Dragonforce", "Cry Thunder")]
+        async with AsyncMusicClient() as client:
+            expected = {(artist, title): await client.get_track_info(artist, title) for artist, title in pairs}
+            requests_count = len(self.session.urls)
+            resolved = {
+                (artist, title): recordings async for artist, title, recordings in client.get_track_info_many(pairs)
+            }
+
+        self.assertEqual(resolved, expected)
+        self.assertIn("Dominion", [recording.album for recording in resolved[("Skillet", "Dominion")]])
+        self.assertGreaterEqual(requests_count, len(pairs))
+        self.assertEqual(len(self.session.urls), requests_count)
+        self.assertEqual(self.request_scheduler.stats()["served"], requests_count)
+        self.assertEqual(self.response_cache.stats()["hits"], len(pairs))
+
+    async def test_release_group_looked_up_once(self):
+        """Tests that concurrent lookups of the release group of the same album send a single request"""
+        response = {"releases": [{"release-group": {"id": "1234", "title": "Nightmare"}}]}
+
+        async def get_request(*_, **__):
+            await asyncio.sleep(0.01)
+            return response
+
+        async with AsyncMusicClient() as client:
+            with patch.object(client, "_get_request", side_effect=get_request) as mock_request:
+                release_group_ids = await asyncio.gather(
+                    *(client.get_release_group_id("Avenged Sevenfold", "Nightmare") for _ in range(12))
+                )
+        self.assertEqual(set(release_group_ids), {"1234"})
+        self.assertEqual(mock_request.call_count, 1)
+
+    async def test_caches_off_the_event_loop(self):
+        """Tests that the caches are accessed in worker threads, rather than in the thread of the event loop"""
+        async with AsyncMusicClient() as client:
+            await client.get_track_info("Skillet", "Dominion")
+        self.assertTrue(self.cache_threads)
+        self.assertNotIn(threading.get_ident(), self.cache_threads)
+
+
+class TestSearchQueries(unittest.TestCase):
+    """Tests the search queries sent to MusicBrainz, and paging through their results"""
+
+    def setUp(self):
+        """Creates an empty artist ID index, used instead of the real one"""
+        self.directory = tempfile.mkdtemp()
+        self.artist_ids = KeyValueStore(join(self.directory, "artist_ids.sqlite3"))
+        for patcher in (
+            patch.object(music_api, "artist_ids", self.artist_ids),
+            patch.object(music_api.negative_cache, "enabled", False),
+            patch("music_api._save_debug_response"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the index"""
+        self.artist_ids.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return super().tearDown()
+
+    def test_search_query(self):
+        """Tests that fields are quoted as phrases, and that the URL is encoded"""
+        self.assertEqual(music_api.lucene_phrase('Say "Hi" \\o/'), '"Say \\"Hi\\" \\\\o/"')
+        self.assertEqual(
+            music_api.search_query(artist="AC/DC", recording="Rock & Roll Train"),
+            'artist:"AC/DC" AND recording:"Rock & Roll Train"',
+        )
+        with patch("music_api._get_request", side_effect=self.fake_get_request) as mock_request:
+            music_api.get_track_info('Guns N" Roses', "Paradise City (Live)")
+        self.assertEqual(
+            utils.parse_search_query(mock_request.call_args_list[0].args[0]),
+            {
+                "artist": 'Guns N" Roses',
+                "recording": "Paradise City (Live)",
+                "limit": str(MUSICBRAINZ_SEARCH_LIMIT),
+                "offset": "0",
+                "fmt": "json",
+            },
+        )
+
+    @staticmethod
+    def fake_get_request(url: str, *args, **kwargs):
+        """Responds with 60 recordings, of which only the 30th is of the searched title"""
+        fields = utils.parse_search_query(url)
+        offset, limit = int(fields["offset"]), int(fields["limit"])
+        recordings = [
+            {
+                "title": "Song" if index == 30 else f"Other Song {index}",
+                "artist-credit": [{"artist": {"name": fields["artist"]}}],
+                "releases": [{"title": "Album", "date": "2020"}],
+            }
+            for index in range(offset, min(offset + limit, 60))
+        ]
+        return {"count": 60, "offset": offset, "recordings": recordings}
+
+    def test_paging(self):
+        """Tests that further pages are requested only until a page has album candidates"""
+        with patch("music_api._get_request", side_effect=self.fake_get_request) as mock_request:
+            recordings = music_api.get_track_info("Band", "Song")
+        self.assertEqual([recording.album for recording in recordings], ["Album"])
+        self.assertEqual(
+            [utils.parse_search_query(call.args[0])["offset"] for call in mock_request.call_args_list], ["0", "25"]
+        )
+
+        with patch("music_api._get_request", side_effect=self.fake_get_request) as mock_request:
+            self.assertEqual(music_api.get_track_info("Band", "Missing"), [])
+        self.assertEqual(mock_request.call_count, 3)
+
+
+class TestAlbumCandidates(unittest.TestCase):
+    """Tests get_album_candidates"""
+
+    RECORDING = {"title": "Song", "releases": [{"title": "Album", "status": "Official"}]}
+
+    @staticmethod
+    def describe(recordings):
+        """Returns all the attributes of the recordings, sorted"""
+        return sorted(
+            (str(recording), recording.type, recording.title, recording.status, recording.release_group_id)
+            for recording in recordings
+        )
+
+    def test_recorded_responses(self):
+        """Tests that the candidates of the recorded responses are ranked as by the previous implementation"""
+        outputs_dir = join(dirname(abspath(__file__)), "outputs")
+        with open(join(outputs_dir, "album_candidates.json"), "r", encoding="utf-8") as file:
+            expected_candidates = json.load(file)
+        for path in sorted(glob.glob(join(outputs_dir, "json", "*.json"))):
+            artist, title = basename(path)[: -len(".json")].split(" - ", 1)
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            with self.subTest(artist=artist, title=title):
+                expected = expected_candidates[f"{artist} - {title}"]
+                actual = music_api.get_album_candidates(data, artist, title)
+                # The previous implementation ordered candidates that tie (e.g. an album and a single of the same
+                # name, year and track) by their hash, so only the ranking and the candidates themselves are compared
+                self.assertEqual(
+                    [[recording.album, recording.year, recording.track] for recording in actual], expected["ranking"]
+                )
+                self.assertEqual(self.describe(actual), [tuple(candidate) for candidate in expected["candidates"]])
+
+    def test_compact_recordings(self):
+        """Tests that recordings have no __dict__, that repeated strings are shared, and that equality is unchanged"""
+        data = {"recordings": json.loads(json.dumps([self.RECORDING] * 2))}
+        first, second = [
+            music_api.ReleaseRecording(release["title"], 2020, "Band", 1, "Album", status=release["status"])
+            for recording in data["recordings"]
+            for release in recording["releases"][:1]
+        ]
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIsNot(data["recordings"][0]["releases"][0]["title"], data["recordings"][1]["releases"][0]["title"])
+        self.assertIs(first.album, second.album)
+        self.assertIs(first.status, second.status)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(first, music_api.ReleaseRecording("B", 2020, "Band", 1, "Album"))
+
+    def test_non_string_fields(self):
+        """Tests that fields that aren't strings (such as manually entered answers) are kept as they are"""
+        recording = music_api.ReleaseRecording(True, 2020, "Band", 1, "Album", title="Song")
+        self.assertIs(recording.album, True)
+        metadata = MP3MetaData("Band", "Song", album=True)
+        self.assertIs(metadata.album, True)
+
+    def test_duplicates(self):
+        """Tests that releases that appear more are ranked first, and that duplicates keep their first release"""
+        releases = [
+            {"title": "B", "date": "2001-05-01", "status": "Official", "release-group": {"id": "b1"}},
+            {"title": "A", "date": "2000", "release-group": {"id": "a1", "primary-type": "Album"}},
+            {"title": "B", "date": "2001", "status": "Bootleg", "release-group": {"id": "b2"}},
+            {"title": "C", "date": "????"},
+            {"title": ""},
+        ]
+        data = {
+            "recordings": [{"title": "Song", "artist-credit": [{"artist": {"name": "Band"}}], "releases": releases}]
+        }
+        candidates = music_api.get_album_candidates(data, "band", "song")
+        self.assertEqual(
+            [(recording.album, recording.year) for recording in candidates], [("B", 2001), ("A", 2000), ("C", 0)]
+        )
+        self.assertEqual((candidates[0].status, candidates[0].release_group_id), ("official", "b1"))
+        self.assertEqual(candidates[1].type, "album")
+
+    def test_unknown_year(self):
+        """Tests that releases with dates that don't start with a year are candidates with no year (0)"""
+        for date in ("????", "", "unknown-05-01"):
+            with self.subTest(date=date):
+                data = {"recordings": [{"title": "Song", "releases": [{"title": "Album", "date": date}]}]}
+                candidates = music_api.get_album_candidates(data, "Unknown", "Song")
+                self.assertEqual([(recording.album, recording.year) for recording in candidates], [("Album", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
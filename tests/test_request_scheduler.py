@@ -0,0 +1,65 @@
+"""Tests the rate limiting of requests"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from request_scheduler import Priority, RequestScheduler, TokenBucket, request_priority
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Tests the token bucket and the priorities of the request scheduler"""
+
+    def test_token_bucket(self):
+        """Tests that tokens are taken up to the capacity, and refilled according to the rate"""
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.try_take(), 0)
+        self.assertEqual(bucket.try_take(), 0)
+        delay = bucket.try_take()
+        self.assertGreater(delay, 0)
+        self.assertLessEqual(delay, 0.1)
+        time.sleep(delay)
+        self.assertEqual(bucket.try_take(), 0)
+
+    def test_shared_token_bucket(self):
+        """Tests that buckets using the same file share their tokens"""
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir, ignore_errors=True)
+        db_path = os.path.join(state_dir, "rate_limit.sqlite3")
+
+        self.assertEqual(TokenBucket(rate=1, capacity=1, db_path=db_path).try_take(), 0)
+        self.assertGreater(TokenBucket(rate=1, capacity=1, db_path=db_path).try_take(), 0)
+
+    def test_priorities(self):
+        """Tests that interactive requests are served before background requests that waited longer"""
+        scheduler = RequestScheduler(TokenBucket(rate=4, capacity=1))
+        scheduler.acquire()  # Empty the bucket
+        served = []
+
+        def send(priority: Priority):
+            with request_priority(priority):
+                scheduler.acquire()
+            served.append(priority)
+
+        threads = [threading.Thread(target=send, args=(Priority.BACKGROUND,)) for _ in range(2)]
+        threads.append(threading.Thread(target=send, args=(Priority.INTERACTIVE,)))
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        self.assertEqual(scheduler.queue_depth, 3)
+        self.assertEqual(scheduler.stats()["waiting_background"], 2)
+
+        for thread in threads:
+            thread.join()
+        self.assertEqual(served, [Priority.INTERACTIVE, Priority.BACKGROUND, Priority.BACKGROUND])
+        stats = scheduler.stats()
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["served"], 4)
+        self.assertGreater(stats["max_wait"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
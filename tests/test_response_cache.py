@@ -0,0 +1,207 @@
+"""Tests the persistent response cache used for MusicBrainz requests"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from unittest.mock import patch
+
+import music_api
+from kv_store import KeyValueStore
+from response_cache import NegativeCache, ResponseCache, get_endpoint, normalize_url
+
+RECORDING_URL = "https://musicbrainz.org/ws/2/recording/?query=artist:Skillet AND recording:Dominion&fmt=json"
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests storing, expiring, evicting and invalidating cached responses"""
+
+    def setUp(self):
+        """Creates a temporary directory for the cache database"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ResponseCache(os.path.join(self.cache_dir, "responses.sqlite3"))
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the cache database"""
+        self.cache.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        return super().tearDown()
+
+    def test_normalize_url(self):
+        """Tests that equivalent URLs share a cache key, and that queries that differ in case don't"""
+        self.assertEqual(
+            normalize_url(RECORDING_URL),
+            normalize_url(
+                "https://MusicBrainz.org/ws/2/recording/?fmt=json&query=artist:Skillet  AND recording:Dominion"
+            ),
+        )
+        self.assertNotEqual(
+            normalize_url(RECORDING_URL),
+            normalize_url(
+                "https://musicbrainz.org/ws/2/recording/?query=artist:Skillet and recording:Dominion&fmt=json"
+            ),
+        )
+        self.assertEqual(get_endpoint(RECORDING_URL), "recording")
+        self.assertEqual(get_endpoint("https://musicbrainz.org/ws/2/artist/?query=artist:Skillet"), "artist")
+
+    def test_hit_and_miss(self):
+        """Tests that stored responses are returned, and counted as hits"""
+        self.assertIsNone(self.cache.get(RECORDING_URL))
+        self.cache.set(RECORDING_URL, {"count": 1})
+        self.assertEqual(self.cache.get(RECORDING_URL), {"count": 1})
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_expiration(self):
+        """Tests that entries expire according to the TTL of their endpoint"""
+        self.cache.ttls["recording"] = 10
+        with patch("response_cache.time.time", return_value=1000):
+            self.cache.set(RECORDING_URL, {"count": 1})
+        with patch("response_cache.time.time", return_value=1005):
+            self.assertIsNotNone(self.cache.get(RECORDING_URL))
+        with patch("response_cache.time.time", return_value=1011):
+            self.assertIsNone(self.cache.get(RECORDING_URL))
+
+    def test_negative_ttl(self):
+        """Tests that searches that found nothing expire sooner"""
+        self.cache.ttls["recording"] = 100
+        self.cache.negative_ttl = 10
+        with patch("response_cache.time.time", return_value=1000):
+            self.cache.set(RECORDING_URL, {"count": 0, "recordings": []})
+        with patch("response_cache.time.time", return_value=1011):
+            self.assertIsNone(self.cache.get(RECORDING_URL))
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used entries are evicted once the cache is full"""
+        self.cache.max_entries = 2
+        urls = [f"https://musicbrainz.org/ws/2/recording/?query=recording:{index}&fmt=json" for index in range(3)]
+        with patch("response_cache.time.time", return_value=1000):
+            self.cache.set(urls[0], {"index": 0})
+        with patch("response_cache.time.time", return_value=1001):
+            self.cache.set(urls[1], {"index": 1})
+        with patch("response_cache.time.time", return_value=1002):
+            self.cache.get(urls[0])
+        with patch("response_cache.time.time", return_value=1003):
+            self.cache.set(urls[2], {"index": 2})
+            self.assertIsNotNone(self.cache.get(urls[0]))
+            self.assertIsNone(self.cache.get(urls[1]))
+            self.assertIsNotNone(self.cache.get(urls[2]))
+
+    def test_size_eviction(self):
+        """Tests that entries are evicted once the cache is too big, and that totals survive reopening the cache"""
+        urls = [f"https://musicbrainz.org/ws/2/recording/?query=recording:{index}&fmt=json" for index in range(4)]
+        for index, url in enumerate(urls):
+            with patch("response_cache.time.time", return_value=1000 + index):
+                self.cache.set(url, {"data": "x" * 100})
+        size = self.cache.stats()["bytes"] // len(urls)
+        self.cache.close()
+
+        self.cache.max_bytes = size * 2
+        with patch("response_cache.time.time", return_value=1010):
+            self.cache.get(urls[0])
+            self.cache.set(urls[0], {"data": "x" * 100})
+            self.assertEqual(self.cache.stats()["entries"], 2)
+            self.assertIsNotNone(self.cache.get(urls[0]))
+            self.assertIsNotNone(self.cache.get(urls[3]))
+
+    def test_batched_accesses(self):
+        """Tests that hits are written in batches, and when the cache is closed"""
+
+        def written_last_access() -> float:
+            with closing(sqlite3.connect(self.cache.db_path)) as connection:
+                return connection.execute("SELECT last_access FROM responses").fetchone()[0]
+
+        with patch("response_cache.time.time", return_value=1000):
+            self.cache.set(RECORDING_URL, {"count": 1})
+        with patch("response_cache.time.time", return_value=1010):
+            for _ in range(3):
+                self.cache.get(RECORDING_URL)
+        self.assertEqual(written_last_access(), 1000)
+        with patch("response_cache.time.time", return_value=1020), patch("response_cache.ACCESS_FLUSH_SIZE", 1):
+            self.cache.get(RECORDING_URL)
+        self.assertEqual(written_last_access(), 1020)
+
+        with patch("response_cache.time.time", return_value=1030):
+            self.cache.get(RECORDING_URL)
+        self.cache.close()
+        self.assertEqual(written_last_access(), 1030)
+
+    def test_invalidate_and_bypass(self):
+        """Tests invalidation of entries and disabling the cache"""
+        artist_url = "https://musicbrainz.org/ws/2/artist/?query=artist:Skillet&fmt=json"
+        self.cache.set(RECORDING_URL, {"count": 1})
+        self.cache.set(artist_url, {"count": 2})
+        self.assertEqual(self.cache.invalidate(endpoint="artist"), 1)
+        self.assertIsNone(self.cache.get(artist_url))
+
+        self.cache.enabled = False
+        self.assertIsNone(self.cache.get(RECORDING_URL))
+        self.cache.enabled = True
+        self.assertEqual(self.cache.invalidate(), 1)
+        self.assertIsNone(self.cache.get(RECORDING_URL))
+
+
+class TestNegativeCache(unittest.TestCase):
+    """Tests caching lookups that found nothing"""
+
+    def setUp(self):
+        """Creates a temporary directory for the cache database"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = NegativeCache(os.path.join(self.cache_dir, "misses.sqlite3"), ttl=10)
+        self.artist_ids = KeyValueStore(os.path.join(self.cache_dir, "artist_ids.sqlite3"))
+        patcher = patch.object(music_api, "artist_ids", self.artist_ids)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the cache database"""
+        self.cache.close()
+        self.artist_ids.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        return super().tearDown()
+
+    def test_misses(self):
+        """Tests that misses expire, are counted across expirations, and are cleared by a hit"""
+        with patch("response_cache.time.time", return_value=1000):
+            self.cache.record_miss("recording", "a")
+            self.cache.record_miss("recording", "b")
+            self.assertTrue(self.cache.is_miss("recording", "a"))
+            self.assertFalse(self.cache.is_miss("artist", "a"))
+        with patch("response_cache.time.time", return_value=1011):
+            self.assertFalse(self.cache.is_miss("recording", "a"))
+            self.cache.record_miss("recording", "a")
+            self.assertTrue(self.cache.is_miss("recording", "a"))
+
+        self.assertEqual([(entry.key, entry.misses) for entry in self.cache.unresolved()], [("a", 2)])
+        self.assertEqual(len(self.cache.unresolved(min_misses=1)), 2)
+        self.cache.record_hit("recording", "a")
+        self.assertFalse(self.cache.is_miss("recording", "a"))
+        self.assertEqual(self.cache.invalidate(), 1)
+
+    def test_get_track_info(self):
+        """Tests that a track that wasn't found (including the fallback search) isn't looked up again"""
+        responses = {
+            "recording": {"count": 0, "recordings": []},
+            "artist": {"count": 0, "artists": []},
+        }
+        with patch.object(music_api, "negative_cache", self.cache), patch(
+            "music_api._get_request", side_effect=lambda url, *args, **kwargs: responses[get_endpoint(url)]
+        ) as mock_request:
+            self.assertEqual(music_api.get_track_info("Unknown Artist", "Unknown Song"), [])
+            self.assertEqual(mock_request.call_count, 2)
+            self.assertEqual(music_api.get_track_info("unknown artist", "Unknown Song "), [])
+            self.assertEqual(mock_request.call_count, 2)
+
+            # Another song of the same artist skips the fallback search
+            self.assertEqual(music_api.get_track_info("Unknown Artist", "Other Song"), [])
+            self.assertEqual(mock_request.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,24 @@
 """Tests that the MP3MetaData class updates the missing fields correctly using an external API"""
 
+import glob
+import json
 import os
 import shutil
+import tempfile
 import unittest
-from os.path import dirname, join
+from os.path import abspath, basename, dirname, isfile, join
 from unittest.mock import patch
 
 import utils
 
+import music_api
+from artwork_store import ArtworkStore
 from config import TMP_DIR
-from mp3_metadata import MP3MetaData
+from decision_store import decisions
+from kv_store import KeyValueStore
+from mp3_metadata import MP3MetaData, extract_date_from_string, get_suggested_recording
+
+ARTWORK_PATH = join(dirname(__file__), "outputs", "img", "Rise Against - Appeal to Reason.png")
 
 
 class TestUpdateAlbum(unittest.TestCase):
@@ -23,15 +32,38 @@ class TestUpdateAlbum(unittest.TestCase):
         os.makedirs(dirname(self.song_path), exist_ok=True)
         open(self.song_path, "x", encoding="utf-8").close()  # pylint: disable=consider-using-with
 
+        # Resolved IDs and artwork are kept in a temporary directory, instead of the cache of the library
+        self.directory = tempfile.mkdtemp()
+        self.artist_ids = KeyValueStore(join(self.directory, "artist_ids.sqlite3"))
+        self.release_group_ids = KeyValueStore(join(self.directory, "release_groups.sqlite3"))
+        self.artwork_store = ArtworkStore(join(self.directory, "by-hash"), join(self.directory, "artwork.sqlite3"))
+
+        # Responses are mocked, don't cache them or wait for the rate limit
+        for patcher in (
+            patch.object(music_api.response_cache, "enabled", False),
+            patch.object(music_api.negative_cache, "enabled", False),
+            patch.object(decisions, "enabled", False),
+            patch.object(music_api.request_scheduler, "enabled", False),
+            patch.object(music_api, "artist_ids", self.artist_ids),
+            patch.object(music_api, "release_group_ids", self.release_group_ids),
+            patch("mp3_metadata.artwork_store", new=self.artwork_store),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
         return super().setUp()
 
     def tearDown(self) -> None:
         """Removes files created for testing purposes"""
         shutil.rmtree(self.bb_path, ignore_errors=True)
+        self.artist_ids.close()
+        self.release_group_ids.close()
+        self.artwork_store.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
 
         return super().tearDown()
 
-    @patch(target="requests.get", side_effect=utils.mocked_requests_get)
+    @patch(target="requests.Session.get", side_effect=utils.mocked_requests_get)
     def test_update_album1(self, mocked_requests):
         """Tests the update_missing_fields method"""
         m1 = MP3MetaData.from_title(title="Skillet - Dominion")
@@ -46,7 +78,7 @@ class TestUpdateAlbum(unittest.TestCase):
         self.assertEqual(m2.year, 2020)
         self.assertEqual(m2.track, 2)
 
-    @patch(target="requests.get", side_effect=utils.mocked_requests_get)
+    @patch(target="requests.Session.get", side_effect=utils.mocked_requests_get)
     def test_update_album2(self, mocked_requests):
         """Tests the update_missing_fields method"""
         m1 = MP3MetaData.from_title("Smash Into Pieces-All Eyes on You")
@@ -118,7 +150,39 @@ class TestUpdateAlbum(unittest.TestCase):
 
         os.remove(m1.art_path)
 
-    @patch(target="requests.get", side_effect=utils.mocked_requests_get)
+    @patch(target="mp3_metadata.download_album_artwork_from_release_id")
+    def test_failed_image_download(self, mocked_download):
+        """Tests that a failed download of the album art of a release group isn't retried by other songs of the run"""
+        failed_release_groups = set()
+        for song in ("Audience of One", "Savior"):
+            metadata = MP3MetaData("Rise Against", song, album="Appeal to Reason", release_group_id="appeal-to-reason")
+            metadata.update_album_art(failed_release_groups=failed_release_groups)
+            self.assertEqual(metadata.art_path, "")
+        self.assertEqual(mocked_download.call_count, 1)
+        self.assertEqual(failed_release_groups, {"appeal-to-reason"})
+
+    def test_failed_image_download_retried(self):
+        """Tests that a failed download of the album art is retried when forced, or on the next run"""
+
+        def download(release_group_id, filepath):
+            shutil.copy(ARTWORK_PATH, filepath)
+
+        metadata = MP3MetaData("Rise Against", "Savior", album="Appeal to Reason", release_group_id="appeal-to-reason")
+        failed_release_groups = set()
+        with patch("mp3_metadata.download_album_artwork_from_release_id") as mocked_download:
+            metadata.update_album_art(failed_release_groups=failed_release_groups)
+            metadata.update_album_art(failed_release_groups=failed_release_groups)
+            self.assertEqual(mocked_download.call_count, 1)
+            metadata.update_album_art(force_download=True, failed_release_groups=failed_release_groups)
+            self.assertEqual(mocked_download.call_count, 2)
+        self.assertEqual(metadata.art_path, "")
+
+        with patch("mp3_metadata.download_album_artwork_from_release_id", side_effect=download) as mocked_download:
+            metadata.update_album_art(failed_release_groups=set())
+        self.assertEqual(mocked_download.call_count, 1)
+        self.assertTrue(isfile(metadata.art_path))
+
+    @patch(target="requests.Session.get", side_effect=utils.mocked_requests_get)
     def test_from_file1(self, mocked_requests):
         """Tests MP3MetaData.from_file(...)"""
         m1 = MP3MetaData.from_file(file_path=self.song_path)
@@ -127,7 +191,7 @@ class TestUpdateAlbum(unittest.TestCase):
         self.assertEqual(m1.album, "Phobia")
         self.assertEqual(m1.year, 2006)
 
-    @patch(target="requests.get", side_effect=utils.mocked_requests_get)
+    @patch(target="requests.Session.get", side_effect=utils.mocked_requests_get)
     def test_update_album_singles1(self, mocked_requests):
         """
         Edge cases where singles were released, and later added to an album.
@@ -153,7 +217,7 @@ class TestUpdateAlbum(unittest.TestCase):
         self.assertEqual(m2.year, 2018)
         self.assertEqual(m2.track, 4)
 
-    @patch(target="requests.get", side_effect=utils.mocked_requests_get)
+    @patch(target="requests.Session.get", side_effect=utils.mocked_requests_get)
     def test_update_album_singles2(self, mocked_requests):
         """
         Actual singles that were release as singles, and should be treated as such
@@ -173,5 +237,43 @@ class TestUpdateAlbum(unittest.TestCase):
         self.assertEqual(m2.track, 1)
 
 
+class TestSuggestedRecording(unittest.TestCase):
+    """Tests the heuristics that suggest a recording out of the album candidates"""
+
+    def test_extract_date_from_string(self):
+        """Tests that dates are found in the same strings as by parsing every string"""
+        for string, has_date in [
+            ("Nightmare", False),
+            ("Hail to the King", False),
+            ("May Death Never Stop You", True),
+            ("Live in the LBC & Diamonds in the Rough", False),
+            ("Sunday Morning", True),
+            ("Monster", False),
+            ("The Stage (Deluxe Edition)", False),
+            ("2005-03-01", True),
+            ("Waking the Fallen: Resurrected", False),
+            ("am / pm", False),
+            ("Sept.", True),
+            ("", False),
+        ]:
+            with self.subTest(string=string):
+                self.assertEqual(extract_date_from_string(string.lower()) is not None, has_date)
+
+    def test_recorded_responses(self):
+        """Tests that the same recordings are suggested as by the previous implementation"""
+        outputs_dir = join(dirname(abspath(__file__)), "outputs")
+        with open(join(outputs_dir, "suggested_recordings.json"), "r", encoding="utf-8") as file:
+            expected = json.load(file)
+        for path in sorted(glob.glob(join(outputs_dir, "json", "*.json"))):
+            artist, title = basename(path)[: -len(".json")].split(" - ", 1)
+            with open(path, "r", encoding="utf-8") as file:
+                recordings = music_api.get_album_candidates(json.load(file), artist, title)
+            recordings.sort(key=lambda recording: (recording.year, len(recording.album)))
+            with self.subTest(artist=artist, title=title):
+                self.assertEqual(get_suggested_recording(recordings), expected[f"{artist} - {title}"]["all"])
+                singles = [recording for recording in recordings if recording.type in ("single", "ep")]
+                self.assertEqual(get_suggested_recording(singles), expected[f"{artist} - {title}"]["singles"])
+
+
 if __name__ == "__main__":
     unittest.main()
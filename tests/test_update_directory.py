@@ -0,0 +1,212 @@
+"""Tests updating the metadata of all files in a directory"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from os.path import join
+from unittest.mock import patch
+
+import music_tag
+import utils
+
+from decision_store import decisions
+from kv_store import KeyValueStore
+from library_manifest import LibraryManifest
+from mp3_metadata import MP3MetaData, update_metadata_for_directory
+
+SONGS = ["Skillet - Dominion", "Smash Into Pieces - Wake Up", "Dragonforce - Cry Thunder", "Bad Wolves - Zombie"]
+
+
+def fake_update_metadata_for_file(file_path: str, *args, **kwargs) -> MP3MetaData:
+    """Pretends to update a file, slower for earlier files (so they finish last).
+    Fails for Dragonforce, and doesn't resolve Bad Wolves
+    """
+    metadata = MP3MetaData.from_title(os.path.basename(file_path)[:-4])
+    time.sleep(0.01 * (len(SONGS) - SONGS.index(metadata.title)))
+    if metadata.band == "Dragonforce":
+        raise ValueError("Too fast")
+    if metadata.band != "Bad Wolves":
+        metadata.album, metadata.year, metadata.track = "Album", 2020, 1
+    return metadata
+
+
+class TestUpdateDirectory(unittest.TestCase):
+    """Tests update_metadata_for_directory"""
+
+    def setUp(self):
+        """Creates a directory with (empty) mp3 files"""
+        self.base_path = tempfile.mkdtemp()
+        for song in SONGS:
+            open(join(self.base_path, f"{song}.mp3"), "x", encoding="utf-8").close()  # pylint: disable=R1732
+
+        self.manifest_dir = tempfile.mkdtemp()
+        self.manifest = LibraryManifest(join(self.manifest_dir, "manifest.sqlite3"))
+        # Titles are suggested without the decisions of the library
+        for patcher in (
+            patch("mp3_metadata.library_manifest", new=self.manifest),
+            patch.object(decisions, "enabled", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the directory and the manifest"""
+        self.manifest.close()
+        shutil.rmtree(self.base_path, ignore_errors=True)
+        shutil.rmtree(self.manifest_dir, ignore_errors=True)
+        return super().tearDown()
+
+    @patch(target="mp3_metadata.update_metadata_for_file", side_effect=fake_update_metadata_for_file)
+    def test_parallel_results(self, mocked_update):
+        """Tests that parallel runs return a result per file, in the order of the files, including failures"""
+        sequential_results = update_metadata_for_directory(self.base_path, interactive=False)
+        parallel_results = update_metadata_for_directory(self.base_path, interactive=False, jobs=4, full_pass=True)
+
+        self.assertEqual(len(parallel_results), len(SONGS))
+        self.assertEqual(
+            [result.file_path for result in parallel_results], [result.file_path for result in sequential_results]
+        )
+        for result in parallel_results:
+            self.assertEqual(result.succeeded, "Dragonforce" not in result.file_path)
+            if result.succeeded:
+                self.assertEqual(result.metadata.title, os.path.basename(result.file_path)[:-4])
+
+    def test_interactive_on_calling_thread(self):
+        """Tests that in interactive mode, files are processed (and prompted for) on the calling thread"""
+        threads = set()
+
+        def update_file(file_path: str, *args, **kwargs) -> MP3MetaData:
+            threads.add(threading.get_ident())
+            return fake_update_metadata_for_file(file_path, *args, **kwargs)
+
+        with patch("mp3_metadata.update_metadata_for_file", side_effect=update_file):
+            update_metadata_for_directory(self.base_path, interactive=True, jobs=4)
+        self.assertEqual(threads, {threading.get_ident()})
+
+    @patch(target="mp3_metadata.update_metadata_for_file", side_effect=fake_update_metadata_for_file)
+    def test_skip_unchanged(self, mocked_update):
+        """Tests that files are skipped on re-runs, unless they were modified (or failed, or weren't resolved)"""
+        update_metadata_for_directory(self.base_path, interactive=False)
+        self.assertEqual(mocked_update.call_count, len(SONGS))
+
+        with open(join(self.base_path, f"{SONGS[0]}.mp3"), "a", encoding="utf-8") as file:
+            file.write("modified")
+        results = update_metadata_for_directory(self.base_path, interactive=False)
+        updated = {os.path.basename(result.file_path)[:-4] for result in results if not result.skipped}
+        self.assertEqual(updated, {SONGS[0], "Dragonforce - Cry Thunder", "Bad Wolves - Zombie"})
+
+        update_metadata_for_directory(self.base_path, interactive=False, full_pass=True)
+        self.assertEqual(mocked_update.call_count, 2 * len(SONGS) + 3)
+
+    @patch(target="mp3_metadata.update_metadata_for_file", side_effect=fake_update_metadata_for_file)
+    def test_skip_with_same_options(self, mocked_update):
+        """Tests that files are skipped only on re-runs with the same options"""
+        update_metadata_for_directory(self.base_path, interactive=False)
+        results = update_metadata_for_directory(self.base_path, interactive=False, update_album_art=True)
+        self.assertFalse(any(result.skipped for result in results))
+
+        # Files without album art aren't resolved when album art is updated
+        results = update_metadata_for_directory(self.base_path, interactive=False, update_album_art=True)
+        self.assertFalse(any(result.skipped for result in results))
+        self.assertEqual(mocked_update.call_count, 3 * len(SONGS))
+
+
+ALBUM_SEARCH_RESPONSE = {
+    "releases": [
+        {"id": "bootleg", "title": "Nightmare", "date": "2009", "status": "Bootleg"},
+        {"id": "official", "title": "Nightmare", "date": "2010-07-23", "status": "Official"},
+        {"id": "live", "title": "Live in the LBC", "date": "2008", "status": "Official"},
+    ]
+}
+ALBUM_RELEASE_RESPONSE = {
+    "id": "official",
+    "title": "Nightmare",
+    "date": "2010-07-23",
+    "status": "Official",
+    "artist-credit": [{"artist": {"name": "Avenged Sevenfold"}}],
+    "release-group": {"id": "nightmare-release-group", "primary-type": "Album"},
+    "media": [
+        {
+            "tracks": [
+                {"position": 1, "title": "Nightmare"},
+                {"position": 2, "title": "Welcome to the Family"},
+                {"position": 3, "title": "Danger Line"},
+                {"position": 4, "title": "Buried Alive"},
+            ]
+        }
+    ],
+}
+
+
+def fake_get_request(url: str, *args, **kwargs):
+    """Responds to the album search and the lookup of its release"""
+    if "/release/official?" in url:
+        return ALBUM_RELEASE_RESPONSE
+    return ALBUM_SEARCH_RESPONSE
+
+
+class TestUpdateAlbumDirectory(unittest.TestCase):
+    """Tests update_metadata_for_directory with album directories"""
+
+    def setUp(self):
+        """Creates an album directory with (silent) mp3 files"""
+        self.base_path = tempfile.mkdtemp()
+        self.album_path = join(self.base_path, "Avenged Sevenfold", "Nightmare (2010)")
+        os.makedirs(self.album_path)
+        for song in ["Nightmare", "Buried Alive", "Bonus Track"]:
+            utils.create_silent_mp3(join(self.album_path, f"Avenged Sevenfold - {song}.mp3"))
+
+        self.manifest = LibraryManifest(join(self.base_path, "manifest.sqlite3"))
+        self.release_group_ids = KeyValueStore(join(self.base_path, "release_groups.sqlite3"))
+        self.artist_ids = KeyValueStore(join(self.base_path, "artist_ids.sqlite3"))
+        for patcher in [
+            patch("mp3_metadata.library_manifest", new=self.manifest),
+            patch("music_api.release_group_ids", new=self.release_group_ids),
+            patch("music_api.artist_ids", new=self.artist_ids),
+            patch.object(decisions, "enabled", False),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return super().setUp()
+
+    def tearDown(self):
+        """Removes the directory"""
+        self.manifest.close()
+        self.release_group_ids.close()
+        self.artist_ids.close()
+        shutil.rmtree(self.base_path, ignore_errors=True)
+        return super().tearDown()
+
+    @patch(target="mp3_metadata.get_track_info", return_value=[])
+    @patch(target="music_api._get_request", side_effect=fake_get_request)
+    def test_by_album(self, mocked_request, mocked_get_track_info):
+        """Tests that the album is resolved once for all of its files, and files that aren't on it are looked up"""
+        results = update_metadata_for_directory(
+            self.base_path, interactive=False, recursive=True, jobs=3, by_album=True
+        )
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(mocked_request.call_count, 2)
+        mocked_get_track_info.assert_called_once_with("Avenged Sevenfold", "Bonus Track")
+
+        for song, track in [("Nightmare", 1), ("Buried Alive", 4)]:
+            mp3_file = music_tag.load_file(join(self.album_path, f"Avenged Sevenfold - {song}.mp3"))
+            self.assertEqual(str(mp3_file["album"]), "Nightmare")
+            self.assertEqual(int(mp3_file["year"]), 2010)
+            self.assertEqual(int(mp3_file["tracknumber"]), track)
+        self.assertEqual(self.release_group_ids.items(), [("avenged sevenfold\0nightmare", "nightmare-release-group")])
+
+    def test_extract_album_info_from_path(self):
+        """Tests that album directories are recognized"""
+        self.assertEqual(
+            MP3MetaData.extract_album_info_from_path(join(self.album_path, "Avenged Sevenfold - Nightmare.mp3")),
+            ("Avenged Sevenfold", "Nightmare", 2010),
+        )
+        self.assertIsNone(MP3MetaData.extract_album_info_from_path(join(self.base_path, "song.mp3")))
+
+
+if __name__ == "__main__":
+    unittest.main()
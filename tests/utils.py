@@ -4,6 +4,8 @@ import hashlib
 import os
 import re
 import shutil
+from typing import Dict
+from urllib.parse import parse_qs, urlsplit
 
 from config import TMP_DIR
 from file_operations import load_json_response
@@ -20,8 +22,27 @@ def get_file_md5_hash(filepath: str) -> str:
     """
     with open(filepath, "rb") as file:
         data = file.read()
-        file_md5 = hashlib.md5(data, usedforsecurity=False).hexdigest()
-    return file_md5
+    return get_md5_hash(data)
+
+
+def get_md5_hash(data: bytes) -> str:
+    """Gets the md5 hash of data
+
+    Args:
+        data (bytes): The data
+
+    Returns:
+        str: The md5 hash of the data
+    """
+    return hashlib.md5(data, usedforsecurity=False).hexdigest()
+
+
+def create_silent_mp3(file_path: str, frames: int = 20):
+    """Creates a valid (silent) mp3 file without tags"""
+    # MPEG-1 Layer III frame header (128kbps, 44.1kHz), followed by an empty frame body
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+    with open(file_path, "wb") as file:
+        file.write(frame * frames)
 
 
 def mock_artwork_downloader(artist: str, album: str):
@@ -32,6 +53,19 @@ def mock_artwork_downloader(artist: str, album: str):
     shutil.copyfile(src=png_path, dst=target_path)
 
 
+def parse_search_query(url: str) -> Dict[str, str]:
+    """Parses the fields of a MusicBrainz search URL (see music_api.search_query), along with its limit and offset.
+    For example, `.../recording/?query=artist:"Skillet" AND recording:"Dominion"&offset=0` ->
+    `{"artist": "Skillet", "recording": "Dominion", "offset": "0"}`
+    """
+    params = {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+    fields = {
+        field: re.sub(r"\\(.)", r"\1", value)
+        for field, value in re.findall(r'(\w+):"((?:[^"\\]|\\.)*)"', params.pop("query", ""))
+    }
+    return {**params, **fields}
+
+
 def mocked_requests_get(*args, **kwargs):
     """Used for testing to avoid API calls"""
 
@@ -47,13 +81,13 @@ def mocked_requests_get(*args, **kwargs):
             return self.json_data
 
     url = args[0]
-    url_match = re.match(r".*artist:(?P<artist>.+) AND recording:(?P<title>.*)&fmt=json", url)
-
-    if url_match:
-        artist = url_match.group("artist")
-        title = url_match.group("title")
+    fields = parse_search_query(url)
 
-        data = load_json_response(artist, title)
+    if "artist" in fields and "recording" in fields:
+        data = load_json_response(fields["artist"], fields["recording"])
+        # Recorded responses are of the first page
+        if int(fields.get("offset", 0)) > 0:
+            data = {**data, "offset": int(fields["offset"]), "recordings": []}
         return MockResponse(data, 200)
 
     # https://coverartarchive.org/release-group/46303229-3ef4-480d-b648-a78e1c64c911/front-500
@@ -73,3 +107,37 @@ def mocked_requests_get(*args, **kwargs):
 
     data = load_json_response(artist, title)
     return MockResponse(data, 200)
+
+
+class MockedAsyncSession:
+    """Mocked aiohttp session, used for testing to avoid API calls (responds as `mocked_requests_get`)"""
+
+    class MockResponse:
+        """Mocked class of an aiohttp response"""
+
+        def __init__(self, response):
+            self.response = response
+            self.status = response.status_code
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def json(self, content_type=None):  # pylint: disable=unused-argument
+            """json..."""
+            return self.response.json()
+
+    def __init__(self):
+        self.urls = []
+        self.closed = False
+
+    def get(self, url: str):
+        """Records the URL, and responds with its recorded response"""
+        self.urls.append(url)
+        return self.MockResponse(mocked_requests_get(url))
+
+    async def close(self):
+        """Closes the session"""
+        self.closed = True
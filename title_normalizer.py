@@ -0,0 +1,103 @@
+"""Normalization of titles (such as titles of YouTube videos or names of files) into an artist and a song.
+Patterns are compiled once, and each title is cleaned up in as few passes as possible.
+"""
+
+import logging
+import re
+from typing import Iterable, List, Tuple, Union
+
+from config import IS_DEBUG, PATTERN_ILLEGAL_CHARS
+
+logging.basicConfig()
+logger = logging.getLogger("XP3")
+logger.setLevel(logging.DEBUG if IS_DEBUG else logging.INFO)
+
+
+STRINGS_TO_REMOVE = ["with Lyrics", "Lyrics", "720p", "1080p", "Video", "LYRICS"]
+
+# Parentheses (and their content) are removed along with illegal characters, in a single pass.
+# Brackets are removed in a second pass, since they may overlap parentheses (e.g. `[Live (2019]`)
+PATTERN_PARENTHESES_OR_ILLEGAL_CHARS = re.compile(rf"\([^)]*\)|{PATTERN_ILLEGAL_CHARS}")
+PATTERN_BRACKETS = re.compile(r"\[[^]]*\]")
+PATTERN_DASH = re.compile(r"\s?-\s?")
+
+# Suffixes of channel names that aren't part of the artist name, removed in this order
+CHANNEL_SUFFIXES = (
+    " - Topic",
+    " official YouTube channel",
+    " Official YouTube Channel",
+    " YouTube Channel",
+    " Official",
+)
+# Artist names of channels that aren't named after the artist
+CHANNEL_ARTISTS = {
+    "IPrevailBand": "I Prevail",
+    "starsetonline": "Starset",
+    "ReoNa official YouTube channel": "ReoNa",
+    "Aimer YouTube Channel": "Aimer",
+    "EGOIST Official YouTube Channel": "EGOIST",
+    "Ayase / YOASOBI": "YOASOBI",
+}
+
+
+def get_channel_artist(channel: str) -> str:
+    """Returns the artist name of a channel (e.g. `Chasen - Topic` -> `Chasen`)"""
+    for suffix in CHANNEL_SUFFIXES:
+        channel = channel.replace(suffix, "")
+    return CHANNEL_ARTISTS.get(channel, channel)
+
+
+def normalize_title(title: str, channel: str = "") -> str:
+    """Cleans up a title into an `<artist> - <song>` form (when possible).
+    Removes illegal characters, parentheses, brackets and strings such as `Lyrics`,
+    and prepends the artist name of the channel if the title doesn't contain one.
+
+    Args:
+        title (str): The title (e.g. `Linkin Park - Papercut (Official Video)`).
+        channel (str, optional): Name of channel the title was taken from. Defaults to "".
+
+    Returns:
+        str: The normalized title
+    """
+    # Swap colon (:) with hyphen (-)
+    if ":" in title and "-" not in title:
+        title = title.replace(":", "-")
+
+    title = PATTERN_BRACKETS.sub("", PATTERN_PARENTHESES_OR_ILLEGAL_CHARS.sub("", title))
+    title = " ".join(title.split())
+
+    if "-" in title:
+        title = " ".join(PATTERN_DASH.sub(" - ", title).split())
+    elif channel:
+        title = get_channel_artist(channel) + " - " + title
+
+    for string in STRINGS_TO_REMOVE:
+        if string in title:
+            title = title.replace(string, "")
+    return title.strip()
+
+
+def split_title(title: str) -> Tuple[str, str]:
+    """Splits a normalized title into an artist and a song (empty if the title isn't `<artist> - <song>`)"""
+    if " - " not in title:
+        return "", ""
+    band, song = title.split(" - ", 1)
+    return band.strip(), song.strip()
+
+
+def suggest_titles(titles: Iterable[Union[str, Tuple[str, str]]]) -> List[Tuple[str, str]]:
+    """Suggests an artist and a song for many titles, without user interaction
+
+    Args:
+        titles (Iterable[Union[str, Tuple[str, str]]]): Titles, or (title, channel) pairs.
+
+    Returns:
+        List[Tuple[str, str]]: Suggested (artist, song) per title, in the same order
+    """
+    suggestions = []
+    for title in titles:
+        if isinstance(title, str):
+            suggestions.append(split_title(normalize_title(title)))
+        else:
+            suggestions.append(split_title(normalize_title(*title)))
+    return suggestions